@@ -0,0 +1,198 @@
+# Devon White, PPD 2024
+# AT Commander - asyncio API for sending AT commands and awaiting responses
+#
+# Example:
+#   async def identify(port):
+#       async with AsyncATSession(port) as modem:
+#           response = await modem.send("AT+CGMI", timeout_s=2)
+#           async for urc in modem.urcs("+CEREG"):
+#               ...
+#   await asyncio.gather(*(identify(port) for port in ports))
+
+import asyncio
+import os
+import time
+from typing import AsyncIterator, List, Optional, Tuple
+
+import serial
+from engine import (ATResponse, ATScript, LineSplitter, SerialReader, SessionLogger, URCDispatcher,
+                    DEFAULT_BAUD, READ_TIMEOUT_S, RESPONSE_TIMEOUT_S, response_prefix)
+
+URC_QUEUE_MAX = 1000    # Unsolicited lines buffered per urcs() iterator before the oldest are dropped
+
+
+class AsyncATSession():
+    """A connection to one serial modem driven from an asyncio event loop
+
+    On POSIX the port's file descriptor is registered with the loop (loop.add_reader), so any number of
+    sessions share the loop's thread. Where that is not possible (Windows COM ports) a single
+    SerialReader thread per port forwards lines into the loop. Either way, no thread is started per
+    command: send() only awaits a future that is resolved when the final result code arrives.
+    Writes never block the loop either: a port that cannot take more bytes (e.g. held back by flow
+    control) is waited on with loop.add_writer, or, in the fallback, written from the loop's executor.
+
+    Args:
+        port (str): Serial port name (e.g. "COM21" or "/dev/ttyACM0")
+        baudrate (int): Serial baud rate
+        logger (SessionLogger): Optional log sink receiving every TX/RX line
+    """
+    def __init__(self, port:str, baudrate:int=DEFAULT_BAUD, logger:SessionLogger=None) -> None:
+        self.device = serial.Serial()
+        self.device.port = port
+        self.device.baudrate = baudrate
+        self.logger = logger
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.reader: Optional[SerialReader] = None  # Only used when the loop cannot watch the port
+        self.splitter = LineSplitter()
+        self.urc_queues: List[Tuple[Optional[str], asyncio.Queue]] = []
+        self.urc_dispatcher = URCDispatcher()   # Handlers run on the loop for every matching URC
+        self._lock: Optional[asyncio.Lock] = None   # Serializes commands on this port
+        self._pending: Optional[Tuple[ATResponse, asyncio.Future, float, Tuple[str, ...]]] = None
+
+    async def __aenter__(self) -> "AsyncATSession":
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.close()
+
+    @property
+    def is_open(self) -> bool:
+        return self.device.is_open
+
+    async def open(self) -> None:
+        """Opens the port and starts delivering received lines to the event loop
+
+        Raises:
+            serial.SerialException: If the port cannot be opened
+        """
+        self.loop = asyncio.get_running_loop()
+        self._lock = asyncio.Lock()
+        self.device.timeout = 0     # Non-blocking reads; the loop tells us when bytes are waiting
+        self.device.open()
+        try:
+            self.loop.add_reader(self.device.fileno(), self._on_readable)
+        except (NotImplementedError, AttributeError, ValueError):
+            # The loop cannot watch this port: fall back to one reader thread for the port
+            self.device.timeout = READ_TIMEOUT_S
+            self.reader = SerialReader(self.device)
+            self.reader.subscribe(lambda line, solicited: self.loop.call_soon_threadsafe(self._on_line, line))
+            self.reader.start()
+
+    def close(self) -> None:
+        if self.reader is not None:
+            self.reader.stop()
+            self.reader = None
+        elif self.loop is not None and self.device.is_open:
+            self.loop.remove_reader(self.device.fileno())
+        if self.device.is_open:
+            self.device.close()
+        if self._pending is not None and not self._pending[1].done():
+            self._pending[1].cancel()
+
+    def _on_readable(self) -> None:
+        try:
+            chunk = self.device.read(self.device.in_waiting or 1)
+        except (serial.SerialException, OSError) as e:
+            print(f"Serial reader stopped: {e}")
+            self.loop.remove_reader(self.device.fileno())
+            return
+        for line in self.splitter.feed(chunk):
+            self._on_line(line)
+
+    def _on_line(self, line:str) -> None:
+        pending = self._pending
+        if pending is not None and self.urc_dispatcher.is_urc(line, pending[3]):
+            pending = None  # A URC arriving mid-command is not part of the response
+        if self.logger is not None:
+            self.logger.log("RX" if pending is not None else "URC", line)
+        if pending is not None:
+            response, future, start, _ = pending
+            if response.feed(line) and not future.done():
+                response.latency_s = time.monotonic() - start
+                future.set_result(response)
+            return
+        self.urc_dispatcher.dispatch(line)
+        for prefix, urc_queue in self.urc_queues:
+            if prefix is None or line.startswith(prefix):
+                if urc_queue.full():
+                    urc_queue.get_nowait()  # Drop the oldest so a slow consumer never stalls the reader
+                urc_queue.put_nowait(line)
+
+    async def send(self, cmd_s:str, timeout_s:float=RESPONSE_TIMEOUT_S) -> ATResponse:
+        """Writes a command and waits for its final result code
+
+        Commands on the same session are serialized; commands on different sessions run concurrently.
+        Cancelling the awaiting task abandons the command and frees the session for the next one.
+
+        Args:
+            cmd_s (str): The command, without line termination
+            timeout_s (float): Maximum time to wait for the final result code
+
+        Returns:
+            ATResponse: The response. If no final result code arrived in time, timed_out is True.
+        """
+        async with self._lock:
+            response = ATResponse(cmd_s)
+            future = self.loop.create_future()
+            if self.logger is not None:
+                self.logger.log("TX", cmd_s)
+            start = time.monotonic()
+            self._pending = (response, future, start, tuple(filter(None, [response_prefix(cmd_s)])))
+            try:
+                await asyncio.wait_for(self._write(f"{cmd_s}\r\n".encode()), timeout_s)
+                return await asyncio.wait_for(future, start + timeout_s - time.monotonic())
+            except asyncio.TimeoutError:
+                response.timed_out = True
+                return response
+            finally:
+                self._pending = None
+
+    async def _write(self, data:bytes) -> None:
+        """Writes data to the port without blocking the event loop, however slowly the port drains"""
+        if self.reader is not None:
+            await self.loop.run_in_executor(None, self.device.write, data)
+            return
+        fd = self.device.fileno()   # Opened non-blocking by pyserial
+        view = memoryview(data)
+        while view:
+            try:
+                view = view[os.write(fd, view):]
+            except BlockingIOError:
+                writable = self.loop.create_future()
+                self.loop.add_writer(fd, lambda: writable.done() or writable.set_result(None))
+                try:
+                    await writable
+                finally:
+                    self.loop.remove_writer(fd)
+
+    async def run_script(self, script:ATScript) -> List[ATResponse]:
+        """Runs every line of a script, advancing as soon as each command completes
+
+        Returns:
+            List[ATResponse]: One response per command, in order
+        """
+        responses = []
+        for cmd in script.commands:
+            if cmd in ("[GROUP]", "[ENDGROUP]"):
+                continue    # Grouped commands are sent one at a time here
+            if "[WAIT]" in cmd:
+                await asyncio.sleep(int(cmd.split("[WAIT]")[1].strip()))
+                continue
+            responses.append(await self.send(cmd, timeout_s=script.timeout_s))
+        return responses
+
+    async def urcs(self, prefix:str=None, maxsize:int=URC_QUEUE_MAX) -> AsyncIterator[str]:
+        """Iterates over unsolicited lines (those received while no command is pending)
+
+        Args:
+            prefix (str): Only yield lines starting with this prefix (e.g. "+CEREG"); None for all
+            maxsize (int): Lines buffered for this iterator; the oldest are dropped when it is full
+        """
+        entry = (prefix, asyncio.Queue(maxsize=maxsize))
+        self.urc_queues.append(entry)
+        try:
+            while True:
+                yield await entry[1].get()
+        finally:
+            self.urc_queues.remove(entry)
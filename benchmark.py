@@ -0,0 +1,206 @@
+# Devon White, PPD 2024
+# AT Commander - Latency/throughput benchmarks against the virtual modem (simulator.py)
+#
+# Usage:
+#   python benchmark.py [--iterations 500] [--delay 0] [--baud 115200] [--json]
+#   python benchmark.py --port /dev/ttyACM0 --only roundtrip script    (real hardware)
+# No devices are needed: by default every benchmark runs against a ModemSimulator on a pty.
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from engine import ATCommand, ATScript, ATSession, Replay, DEFAULT_BAUD
+
+BENCHMARKS = ("roundtrip", "script", "batch", "urc", "replay", "monitor")
+
+
+def summarize(samples_s:List[float]) -> Dict[str, float]:
+    """Returns mean and percentiles, in milliseconds, of a list of durations in seconds"""
+    ms = sorted(s * 1000 for s in samples_s)
+    cuts = statistics.quantiles(ms, n=100, method="inclusive") if len(ms) > 1 else ms * 99
+    return {
+        "n": len(ms),
+        "mean_ms": statistics.fmean(ms),
+        "p50_ms": cuts[49],
+        "p95_ms": cuts[94],
+        "p99_ms": cuts[98],
+        "max_ms": ms[-1],
+    }
+
+def bench_roundtrip(session:ATSession, iterations:int) -> dict:
+    """Round-trip time of a single command, from calling send_command() to getting its response back"""
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        response = session.send_command("AT+CGMI")
+        elapsed = time.perf_counter() - start
+        if response.timed_out:
+            raise RuntimeError("AT+CGMI timed out")
+        latencies.append(elapsed)
+    return summarize(latencies)
+
+def bench_script(session:ATSession, iterations:int) -> dict:
+    """Commands per second through ATSession.run_script()"""
+    script = ATScript("<benchmark>")
+    script.commands = ["AT+CGMI", "AT+CFUN?", "AT+CEREG?", "AT%XSYSTEMMODE?"] * max(1, iterations // 4)
+    start = time.perf_counter()
+    responses = session.run_script(script)
+    elapsed = time.perf_counter() - start
+    return {"commands": len(responses), "seconds": elapsed, "commands_per_s": len(responses) / elapsed}
+
+def bench_batch(session:ATSession, iterations:int) -> dict:
+    """Commands per second through ATSession.send_batch(), 20 commands per batch"""
+    commands = [ATCommand(c) for c in ["AT+CGMI", "AT+CFUN?", "AT+CEREG?", "AT%XSYSTEMMODE?"] * 5]
+    count = 0
+    start = time.perf_counter()
+    for _ in range(max(1, iterations // len(commands))):
+        count += len(session.send_batch(commands))
+    elapsed = time.perf_counter() - start
+    return {"commands": count, "seconds": elapsed, "commands_per_s": count / elapsed}
+
+def bench_urc(session:ATSession, sim, iterations:int) -> dict:
+    """Unsolicited lines per second from the port to a URC dispatcher handler"""
+    count = iterations * 20
+    received = [0]
+    done = threading.Event()
+    def on_urc(line:str) -> None:
+        received[0] += 1
+        if received[0] >= count:
+            done.set()
+    token = session.urc_dispatcher.subscribe("+CEREG", on_urc)
+    try:
+        start = time.perf_counter()
+        sim.burst("+CEREG: 1,\"0A0B\",\"01020304\",7", count=count)
+        complete = done.wait(timeout=60)
+        elapsed = time.perf_counter() - start
+    finally:
+        session.urc_dispatcher.unsubscribe(token)
+    return {"lines": received[0], "complete": complete, "seconds": elapsed, "lines_per_s": received[0] / elapsed}
+
+def bench_replay(session:ATSession, sim, iterations:int) -> dict:
+    """Lines per second replayed at full speed from a recording of commands and a URC burst"""
+    fd, filename = tempfile.mkstemp(suffix=".atrec")
+    os.close(fd)
+    try:
+        session.start_recording(filename)
+        try:
+            bench_batch(session, iterations)
+            bench_urc(session, sim, iterations)
+        finally:
+            session.stop_recording()
+        lines = [0]
+        def count(line:str, solicited:bool) -> None:
+            lines[0] += 1
+        session.subscribe(count)
+        try:
+            replay = Replay(session, filename, speed=None)
+            start = time.perf_counter()
+            replay.start()
+            replay.device.finished.wait(timeout=60)
+            elapsed = time.perf_counter() - start
+            replay.stop()
+        finally:
+            session.unsubscribe(count)
+    finally:
+        os.remove(filename)
+    return {"lines": lines[0], "responses": replay.responses, "seconds": elapsed, "lines_per_s": lines[0] / elapsed}
+
+def bench_monitor(iterations:int) -> dict:
+    """Lines per second through the serial monitor: serprint()'s queue, drain_monitor()'s batches and the scrollback
+
+    Needs a display. Drives monitor.MonitorQueue and MonitorScrollback, as main.py does, on a bare Text
+    widget (main.py itself builds its window on import). A producer thread queues command and response
+    lines while the main thread drains and renders them back-to-back; past SCROLLBACK_MAX_LINES every
+    batch also evicts and spills to disk, and lines dropped on a full queue are counted.
+    """
+    import tkinter as tk
+    from monitor import MonitorQueue, MonitorScrollback
+    root = tk.Tk()
+    try:
+        root.withdraw()
+        widget = tk.Text(root)
+        for color in ("light blue", "white"):
+            widget.tag_config(color, foreground=color)
+        scrollback = MonitorScrollback(widget)
+        monitor = MonitorQueue()
+        lines = iterations * 100
+
+        def produce() -> None:
+            for i in range(0, lines, 2):
+                monitor.put(f"12:00:00.000 -> AT+CGMI {i}")
+                monitor.put(f"Nordic Semiconductor ASA {i}", response=True)
+
+        producer = threading.Thread(target=produce, daemon=True)
+        start = time.perf_counter()
+        producer.start()
+        while producer.is_alive() or monitor.qsize():
+            runs = monitor.drain()
+            if runs:
+                scrollback.append(runs)
+                root.update_idletasks()
+            else:
+                time.sleep(0.001)
+        elapsed = time.perf_counter() - start
+        spilled = scrollback.spilled
+        scrollback.close()
+    finally:
+        root.destroy()
+    return {"lines": lines, "dropped": monitor.dropped_total, "spilled": spilled, "seconds": elapsed,
+            "lines_per_s": lines / elapsed}
+
+def main(argv:Optional[List[str]]=None) -> int:
+    parser = argparse.ArgumentParser(prog="benchmark", description="Measure AT Commander latency and throughput.")
+    parser.add_argument("--iterations", type=int, default=500, help="Commands per benchmark (default 500)")
+    parser.add_argument("--delay", type=float, default=0, help="Simulated modem response delay in seconds")
+    parser.add_argument("--baud", type=int, default=None, help="Pace simulated modem output to this baud rate")
+    parser.add_argument("--port", default=None, help="Benchmark a real device instead of the simulator")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, default=list(BENCHMARKS), help="Benchmarks to run")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    sim = None
+    if args.port is None:
+        from simulator import ModemSimulator
+        sim = ModemSimulator(delay_s=args.delay, baudrate=args.baud)
+        sim.start()
+    results = {}
+    session = ATSession(args.port or sim.port, baudrate=args.baud or DEFAULT_BAUD)
+    try:
+        session.open()
+        runs: Dict[str, Callable[[], dict]] = {
+            "roundtrip": lambda: bench_roundtrip(session, args.iterations),
+            "script": lambda: bench_script(session, args.iterations),
+            "batch": lambda: bench_batch(session, args.iterations),
+            "urc": lambda: bench_urc(session, sim, args.iterations),
+            "replay": lambda: bench_replay(session, sim, args.iterations),
+            "monitor": lambda: bench_monitor(args.iterations),
+        }
+        for name in args.only:
+            if name in ("urc", "replay") and sim is None:
+                results[name] = {"skipped": "needs the simulator"}
+                continue
+            try:
+                results[name] = runs[name]()
+            except Exception as e:
+                results[name] = {"skipped": f"{type(e).__name__}: {e}"}
+            if not args.json:
+                fields = ", ".join(f"{k}={v:.3f}" if isinstance(v, float) else f"{k}={v}" for k, v in results[name].items())
+                print(f"{name:10} {fields}", flush=True)
+    finally:
+        session.close()
+        if sim is not None:
+            sim.stop()
+    if args.json:
+        print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
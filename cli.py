@@ -0,0 +1,348 @@
+# Devon White, PPD 2024
+# AT Commander - Command-line runner for headless test rigs
+#
+# Usage:
+#   python cli.py run  --port /dev/ttyACM0 [--baud 115200] [--timeout 5] [--json] [--stats stats.csv] script.txt
+#   python cli.py send --port /dev/ttyACM0 [--timeout 5] [--json] [--batch] AT+CGMI AT+CGMR
+#   python cli.py capture --port /dev/ttyACM1 [--baud 1000000] [--output trace.bin] [--duration 60]
+#   python cli.py provision --port /dev/ttyACM0 [--flow rtscts] --sec-tag 42 [--type 0] ca.pem
+#   python cli.py poll --port /dev/ttyACM0 [--interval 10] [--duration 3600] AT+CESQ AT+CEREG?
+#   python cli.py replay [--speed 10|max] logs/session_2024-01-01_12-00-00.atrec
+#   python cli.py bridge --port /dev/ttyACM0 [--listen 127.0.0.1:7700 | --listen unix:/tmp/modem.sock] [--slow skip]
+# Add --record FILE to any device command to record the session for replay, and --signal FILE to save
+# the RSRP/RSRQ/SNR/registration samples it saw (e.g. poll AT%XMONITOR during a drive test).
+# Repeat --port to run the same script or commands on several devices in parallel.
+# Running main.py with the same arguments is equivalent and never creates the GUI.
+
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import serial
+from engine import (ATCommand, ATResponse, ATScript, ATSession, RawCapture, Recording, Replay, SessionBridge,
+                    SessionManager, BRIDGE_HOST, BRIDGE_PORT, BRIDGE_SLOW_DISCONNECT, BRIDGE_SLOW_SKIP, DEFAULT_BAUD,
+                    FLOW_CONTROLS, FLOW_NONE, PAYLOAD_TIMEOUT_S, RESPONSE_TIMEOUT_S, export_stats)
+
+# Exit codes (argparse itself exits with 2 on usage errors)
+EXIT_OK             = 0
+EXIT_COMMAND_ERROR  = 1     # At least one command finished with an error result code
+EXIT_TIMEOUT        = 3     # At least one command produced no final result code in time
+EXIT_PORT_ERROR     = 4     # A serial port could not be opened (or the device failed mid-run)
+EXIT_SCRIPT_ERROR   = 5     # The script file could not be read or parsed
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="at-commander", description="Send AT commands and scripts without the GUI.")
+    subparsers = parser.add_subparsers(dest="action", required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--port", required=True, action="append", dest="ports",
+                        help="Serial port, e.g. COM21 or /dev/ttyACM0. Repeat to drive several devices at once")
+    common.add_argument("--baud", type=int, default=DEFAULT_BAUD, help=f"Baud rate (default {DEFAULT_BAUD})")
+    common.add_argument("--timeout", type=float, default=None,
+                        help=f"Seconds to wait for each final result code (default: script [TIMEOUT] or {RESPONSE_TIMEOUT_S})")
+    common.add_argument("--json", action="store_true", help="Print results as JSON once finished")
+    common.add_argument("--stats", metavar="FILE", default=None,
+                        help="Write latency/throughput stats per port to FILE (.json or .csv)")
+    common.add_argument("--flow", choices=FLOW_CONTROLS, default=FLOW_NONE, help=f"Flow control (default {FLOW_NONE})")
+    common.add_argument("--record", metavar="FILE", default=None,
+                        help="Record the session for replay (the port name is appended when there are several)")
+    common.add_argument("--signal", metavar="FILE", default=None,
+                        help="Save signal quality and registration samples to a .csv (or .parquet) file when done")
+
+    run = subparsers.add_parser("run", parents=[common], help="Run a script file")
+    run.add_argument("script", help="Path to a script file (see example_script.txt)")
+
+    send = subparsers.add_parser("send", parents=[common], help="Send one or more commands")
+    send.add_argument("commands", nargs="+", help="Commands to send, in order")
+    send.add_argument("--batch", action="store_true",
+                      help="Pipeline the commands into one round trip, joining read/test commands with ';'")
+
+    poll = subparsers.add_parser("poll", parents=[common], help="Send commands periodically until stopped")
+    poll.add_argument("commands", nargs="+", help="Commands to poll; all are sent together every interval")
+    poll.add_argument("--interval", type=float, default=10, help="Seconds between polls (default 10)")
+    poll.add_argument("--duration", type=float, default=None, help="Stop after this many seconds (default: Ctrl+C)")
+
+    bridge = subparsers.add_parser("bridge", parents=[common], help="Share the device with local socket clients until stopped")
+    bridge.add_argument("--listen", default=f"{BRIDGE_HOST}:{BRIDGE_PORT}",
+                        help=f"host:port or unix:PATH (default {BRIDGE_HOST}:{BRIDGE_PORT}); with several ports, "
+                             "each gets the next TCP port or its name appended to PATH")
+    bridge.add_argument("--slow", choices=(BRIDGE_SLOW_DISCONNECT, BRIDGE_SLOW_SKIP), default=BRIDGE_SLOW_DISCONNECT,
+                        help=f"What to do with a client that cannot keep up (default {BRIDGE_SLOW_DISCONNECT})")
+    bridge.add_argument("--duration", type=float, default=None, help="Stop after this many seconds (default: Ctrl+C)")
+
+    provision = subparsers.add_parser("provision", parents=[common], help="Store a credential file with AT%%CMNG")
+    provision.add_argument("--sec-tag", type=int, required=True, help="Security tag")
+    provision.add_argument("--type", type=int, default=0,
+                           help="Credential type: 0 CA certificate (default), 1 client certificate, 2 private key, 3 PSK")
+    provision.add_argument("file", help="The credential, e.g. a PEM file")
+
+    capture = subparsers.add_parser("capture", help="Capture a port's raw bytes (e.g. the modem trace) to a file")
+    capture.add_argument("--port", required=True, help="Serial port to capture")
+    capture.add_argument("--baud", type=int, default=1000000, help="Baud rate (default 1000000)")
+    capture.add_argument("--output", default=None, help="Capture file (default logs/capture_<timestamp>.bin)")
+    capture.add_argument("--duration", type=float, default=None, help="Stop after this many seconds (default: Ctrl+C)")
+
+    replay = subparsers.add_parser("replay", help="Play a recorded session back through the response parser")
+    replay.add_argument("file", help="A recording made with --record or the GUI's Record button")
+    replay.add_argument("--speed", default="max", help="1 for real time, N for N times faster, or max (default)")
+    replay.add_argument("--start", type=float, default=0, help="Recorded time to start from, in seconds")
+    replay.add_argument("--json", action="store_true", help="Print results as JSON once finished")
+    return parser
+
+def run_capture(args:argparse.Namespace) -> int:
+    """Captures until --duration expires or Ctrl+C, printing progress to stderr"""
+    capture = RawCapture(args.port, args.baud, args.output)
+    try:
+        capture.start()
+    except (serial.SerialException, OSError) as e:
+        print(f"Failed to open {args.port}: {e}", file=sys.stderr)
+        return EXIT_PORT_ERROR
+    deadline = time.monotonic() + args.duration if args.duration is not None else None
+    try:
+        while capture.running and (deadline is None or time.monotonic() < deadline):
+            time.sleep(1)
+            stats = capture.stats()
+            print(f"\r{stats['bytes']} bytes ({stats['bytes_per_s'] / 1024:.1f} KiB/s)", end="", file=sys.stderr, flush=True)
+    except KeyboardInterrupt:
+        pass
+    capture.stop()
+    print(f"\nSaved {capture.stats()['written']} bytes to {capture.filename}", file=sys.stderr)
+    return EXIT_PORT_ERROR if capture.error is not None else EXIT_OK
+
+def run_replay(args:argparse.Namespace) -> Optional[Dict[str, List[ATResponse]]]:
+    """Replays a recording with no device attached, streaming its commands and responses (None if unreadable)"""
+    try:
+        recording = Recording(args.file)
+        speed = None if args.speed == "max" else float(args.speed)
+    except (OSError, ValueError) as e:
+        print(f"Failed to load recording {args.file}: {e}", file=sys.stderr)
+        return None
+    port = recording.meta.get("port", args.file)
+    printer = None if args.json else Printer(port, False)
+    responses = []
+    def on_response(response:ATResponse) -> None:
+        responses.append(response)
+        if printer is not None:
+            printer.print_response(response)
+    replay = Replay(ATSession(port), recording, speed, on_tx=printer.print_command if printer else None,
+                    on_response=on_response)
+    replay.start(args.start)
+    try:
+        while not replay.wait(1):
+            pass
+    except KeyboardInterrupt:
+        replay.stop()
+    return {port: responses}
+
+def provision(session:ATSession, args:argparse.Namespace, content:bytes, printer:"Printer"=None) -> List[ATResponse]:
+    """Streams a credential file to one device with AT%CMNG=0"""
+    if printer is not None:
+        printer.print_command(f"AT%CMNG=0,{args.sec_tag},{args.type},<{len(content)} bytes of {args.file}>")
+    response = session.write_credential(args.sec_tag, args.type, content, timeout_s=args.timeout or PAYLOAD_TIMEOUT_S)
+    if printer is not None:
+        printer.print_response(response)
+    return [response]
+
+def run_poll(manager:SessionManager, args:argparse.Namespace) -> Dict[str, List[ATResponse]]:
+    """Polls every open session until --duration expires or Ctrl+C; returns the responses per port"""
+    results: Dict[str, List[ATResponse]] = {port: [] for port in manager.sessions}
+    lock = threading.Lock()     # Polls of different ports report from their own threads
+    for port, session in manager.sessions.items():
+        printer = None if args.json else Printer(port, len(args.ports) > 1)
+        for cmd_s in args.commands:
+            def on_response(response:ATResponse, port=port, printer=printer) -> None:
+                with lock:
+                    results[port].append(response)
+                    if printer is not None:
+                        printer.print_command(response.command)
+                        printer.print_response(response)
+            session.poll(ATCommand(cmd_s, timeout_s=args.timeout or RESPONSE_TIMEOUT_S), args.interval, on_response)
+    try:
+        if args.duration is not None:
+            time.sleep(args.duration)
+        else:
+            threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    for session in manager.sessions.values():
+        session.shutdown()
+    return results
+
+def port_filename(filename:str, port:str, several:bool, default_ext:str) -> str:
+    """Returns filename with the port name appended when driving several devices, e.g. trace_dev_ttyACM0.atrec"""
+    root, ext = os.path.splitext(filename)
+    suffix = "_" + re.sub(r"\W+", "_", port).strip("_") if several else ""
+    return f"{root}{suffix}{ext or default_ext}"
+
+def run_bridge(manager:SessionManager, args:argparse.Namespace) -> Dict[str, Any]:
+    """Shares every open session until --duration expires or Ctrl+C
+
+    Returns:
+        Dict[str, Any]: The responses to client commands, or the error if the port could not be shared, per port
+    """
+    results: Dict[str, Any] = {port: [] for port in manager.sessions}
+    lock = threading.Lock()     # Commands of different ports report from their own threads
+    bridges = []
+    for i, (port, session) in enumerate(manager.sessions.items()):
+        printer = None if args.json else Printer(port, len(args.ports) > 1)
+        if args.listen.startswith("unix:"):
+            address = "unix:" + port_filename(args.listen[len("unix:"):], port, len(args.ports) > 1, "")
+        else:
+            host, _, first = args.listen.rpartition(":")
+            address = f"{host}:{int(first) + i}"
+        def on_command(client:str, response:ATResponse, port=port, printer=printer) -> None:
+            with lock:
+                results[port].append(response)
+                if printer is not None:
+                    printer.print_command(f"{response.command} (from {client})")
+                    printer.print_response(response)
+        def on_client(client:str, event:str, port=port) -> None:
+            print(f"[{port}] {client}: {event}", file=sys.stderr, flush=True)
+        bridge = SessionBridge(session, address, args.slow, on_command=on_command, on_client=on_client)
+        try:
+            bridge.start()
+        except (OSError, ValueError) as e:
+            print(f"Failed to listen on {address}: {e}", file=sys.stderr)
+            results[port] = e
+            continue
+        print(f"[{port}] Listening on {bridge.address}", file=sys.stderr, flush=True)
+        bridges.append(bridge)
+    try:
+        if bridges and args.duration is not None:
+            time.sleep(args.duration)
+        elif bridges:
+            threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    for bridge in bridges:
+        bridge.stop()
+    return results
+
+def exit_code(responses:List[ATResponse]) -> int:
+    """Maps a list of responses to the runner's exit code"""
+    if any(r.timed_out for r in responses):
+        return EXIT_TIMEOUT
+    if any(not r.ok for r in responses):
+        return EXIT_COMMAND_ERROR
+    return EXIT_OK
+
+class Printer():
+    """Streams commands and responses to stdout, prefixed with the port when driving several devices"""
+    def __init__(self, port:str, prefix:bool) -> None:
+        self.prefix = f"[{port}] " if prefix else ""
+
+    def print_command(self, cmd:str) -> None:
+        print(f"{self.prefix}-> {cmd}", flush=True)
+
+    def print_response(self, response:ATResponse) -> None:
+        text = [f"{self.prefix}<- {line}" for line in response.lines]
+        if response.timed_out:
+            text.append(f"{self.prefix}!! No final result code for {response.command}")
+        else:
+            text.append(f"{self.prefix}<- {response.final} ({response.latency_s * 1000:.1f} ms)")
+        print("\n".join(text), flush=True)
+
+def run_devices(args:argparse.Namespace, script:Optional[ATScript], content:Optional[bytes]) -> Dict[str, Any]:
+    """Opens every --port and runs the action on all of them; returns the responses (or open error) per port"""
+    results: Dict[str, Any] = {}
+    with SessionManager(baudrate=args.baud, flow_control=args.flow) as manager:
+        for port, e in manager.open_all(args.ports).items():
+            print(f"Failed to open {port}: {e}", file=sys.stderr)
+            results[port] = e
+        if args.record:
+            for port, session in manager.sessions.items():
+                session.start_recording(port_filename(args.record, port, len(args.ports) > 1, ".atrec"))
+        if args.action == "poll":
+            results.update(run_poll(manager, args))
+        elif args.action == "bridge":
+            results.update(run_bridge(manager, args))
+        elif content is not None:
+            def provision_and_print(session:ATSession) -> List[ATResponse]:
+                printer = None if args.json else Printer(session.device.port, len(args.ports) > 1)
+                return provision(session, args, content, printer)
+            results.update(manager.gather(manager.map(provision_and_print)))
+        elif args.json:
+            results.update(manager.run_script(script))
+        else:
+            def run_and_print(session:ATSession) -> List[ATResponse]:
+                printer = Printer(session.device.port, len(args.ports) > 1)
+                return session.run_script(script, on_send=printer.print_command, on_response=printer.print_response)
+            results.update(manager.gather(manager.map(run_and_print)))
+        if args.stats:
+            try:
+                export_stats({port: session.stats for port, session in manager.sessions.items()}, args.stats)
+            except OSError as e:
+                print(f"Failed to write stats to {args.stats}: {e}", file=sys.stderr)
+        if args.signal:
+            for port, session in manager.sessions.items():
+                filename = port_filename(args.signal, port, len(args.ports) > 1, ".csv")
+                try:
+                    session.signal.export(filename, port)
+                except (OSError, ValueError) as e:
+                    print(f"Failed to write signal history to {filename}: {e}", file=sys.stderr)
+    return results
+
+def main(argv:Optional[List[str]]=None) -> int:
+    args = build_parser().parse_args(argv)
+
+    if args.action == "capture":
+        return run_capture(args)
+    content = None
+    script = None
+    results = {}
+    if args.action == "replay":
+        replayed = run_replay(args)
+        if replayed is None:
+            return EXIT_SCRIPT_ERROR
+        results.update(replayed)
+    elif args.action == "provision":
+        try:
+            with open(args.file, "rb") as f:
+                content = f.read()
+        except OSError as e:
+            print(f"Failed to read {args.file}: {e}", file=sys.stderr)
+            return EXIT_SCRIPT_ERROR
+    elif args.action == "run":
+        try:
+            script = ATScript(args.script)
+            script.extract_commands()
+        except (OSError, ValueError, IndexError) as e:
+            print(f"Failed to load script {args.script}: {e}", file=sys.stderr)
+            return EXIT_SCRIPT_ERROR
+        if args.timeout is not None:
+            script.timeout_s = args.timeout
+    elif args.action == "send":
+        script = ATScript("<command line>", timeout_s=args.timeout or RESPONSE_TIMEOUT_S)
+        script.commands = list(args.commands)
+        if args.batch:
+            script.commands = ["[GROUP]"] + script.commands + ["[ENDGROUP]"]
+
+    if args.action != "replay":
+        results.update(run_devices(args, script, content))
+
+    codes = {}
+    for port, result in results.items():
+        if isinstance(result, Exception):
+            codes[port] = EXIT_PORT_ERROR
+        else:
+            codes[port] = exit_code(result)
+    code = max(codes.values())
+    if args.json:
+        report = {}
+        for port, result in results.items():
+            if isinstance(result, Exception):
+                report[port] = {"exit_code": codes[port], "error": str(result), "results": []}
+            else:
+                report[port] = {"exit_code": codes[port], "results": [r.to_dict() for r in result]}
+        print(json.dumps({"exit_code": code, "devices": report}, indent=2))
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
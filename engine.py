@@ -0,0 +1,3227 @@
+# Devon White, PPD 2024
+# AT Commander - Headless serial/command/script engine
+#
+# Nothing in this module imports tkinter or PIL, so it can be used from the command line (cli.py),
+# from tests and on machines without a display.
+
+import serial
+import serial.tools.list_ports
+from typing import Union, Tuple, List, Optional, Callable, Dict, Any, Collection, Iterator, BinaryIO
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+
+import time, json, math
+import copy
+import datetime as dt
+import threading
+import queue
+import re
+import os
+import gzip
+import shutil
+import csv
+import bisect
+import select
+import selectors
+import socket
+import io
+import heapq
+import struct
+from collections import deque
+from array import array
+try:
+    import numpy as np      # Optional: vectorized signal-history decimation (see SignalHistory)
+except ImportError:
+    np = None
+
+DEFAULT_BAUD    = 115200
+READ_TIMEOUT_S  = 0.2   # Upper bound on how long the reader blocks before checking for shutdown
+RESPONSE_TIMEOUT_S = 3  # Default time to wait for a command's final result code
+LOG_DIR         = "logs"    # Directory for continuous session logs
+LOG_MAX_BYTES   = 10 * 1024 * 1024  # Rotate the session log at this size...
+LOG_MAX_AGE_S   = 60 * 60           # ...or after this many seconds
+LOG_FLUSH_INTERVAL_S = 1    # Maximum time a logged line stays in the write buffer
+LOG_BUFFER_BYTES = 64 * 1024
+LOG_QUEUE_MAX   = 100000    # Lines buffered for the log writer before new lines are dropped
+LOG_COMPRESS    = True      # Gzip rotated log segments
+
+# Final result codes (ITU-T V.250 and 3GPP TS 27.007) that terminate a command's response
+FINAL_RESULT_CODES      = ("OK", "ERROR", "NO CARRIER", "BUSY", "NO ANSWER", "NO DIALTONE")
+FINAL_RESULT_PREFIXES   = ("+CME ERROR:", "+CMS ERROR:")
+
+MODEM_UUID_COMMAND = "AT%XMODEMUUID"   # Identifies a modem for the response cache
+
+PORT_POLL_INTERVAL_S = 1    # Interval at which PortWatcher re-enumerates serial ports
+CAPTURE_RING_BYTES = 8 * 1024 * 1024  # Raw capture ring buffer (~80 s of a 1 Mbaud stream)
+CAPTURE_READ_BYTES = 64 * 1024        # Largest single read into the ring
+
+# LineStore direction codes
+DIRECTIONS = ("TX", "RX", "URC", "INFO")
+
+# Upper edges, in milliseconds, of the LatencyHistogram buckets (a final bucket catches the rest)
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000)
+
+# ATSession.send_batch() modes
+BATCH_PIPELINE  = "pipeline"    # Write every command line back-to-back, split replies by final result code
+BATCH_CONCAT    = "concat"      # Also join read/test commands into one line ("AT+CEREG?;+CFUN?")
+CONCAT_MAX_LENGTH = 256         # Longest concatenated command line sent to the modem
+
+# Flow control (ATSession.set_flow_control) and bulk payloads (ATSession.send_payload)
+FLOW_NONE       = "none"
+FLOW_RTSCTS     = "rtscts"      # Hardware handshake; the nRF9160 DK's VCOM ports support it
+FLOW_XONXOFF    = "xonxoff"     # Software handshake; only for payloads that never contain 0x11/0x13
+FLOW_CONTROLS   = (FLOW_NONE, FLOW_RTSCTS, FLOW_XONXOFF)
+PAYLOAD_CHUNK_BYTES = 1024      # Bytes per write while streaming a payload
+PAYLOAD_TIMEOUT_S = 30          # Longest wait for a prompt, a blocked write or the final result code
+SLM_DATAMODE_TERMINATOR = b"+++"    # Ends Serial LTE Modem data mode...
+SLM_DATAMODE_SILENCE_S = 1          # ...when sent alone, after this much silence
+PROMPT = object()   # Queued to a SerialReader waiter when the prompt passed to expect() arrives
+
+# Session recordings (SessionRecorder / Recording / Replay)
+RECORD_MAGIC    = b"ATREC001"   # File header, followed by a length-prefixed JSON description
+RECORD_HEADER   = struct.Struct("<dBH")     # Per chunk: seconds since start (monotonic), direction, length
+RECORD_TRAILER  = struct.Struct("<QQd8s")   # Index offset, index entries, duration, RECORD_INDEX_MAGIC
+RECORD_INDEX    = struct.Struct("<dQ")      # Per index entry: seconds since start, file offset
+RECORD_INDEX_MAGIC = b"ATRECIDX"
+RECORD_INDEX_INTERVAL_S = 1.0   # Recorded time between index entries (the seek granularity)
+RECORD_BUFFER_BYTES = 256 * 1024
+RECORD_FLUSH_INTERVAL_S = 1     # Longest time a recorded chunk stays in the write buffer
+RECORD_TX       = 0     # Command lines written to the modem
+RECORD_RX       = 1     # Bytes received
+RECORD_PAYLOAD  = 2     # Bytes written by send_payload(), never parsed as command lines on replay...
+RECORD_COMMAND  = 3     # ...which records {"command", "prompt", "done"} as JSON before them
+
+# Command scheduling (ATSession.submit / ATSession.poll): lower values run first
+PRIORITY_INTERACTIVE = 0    # Operator actions: command buttons, typed commands
+PRIORITY_NORMAL     = 1     # Scripts and batch work
+PRIORITY_BACKGROUND = 2     # Recurring polls
+POLL_COALESCE_S     = 0.5   # Polls due within this long of each other are sent in one round trip
+
+# Signal quality and registration history (see SignalHistory)
+SIGNAL_PREFIXES = ("%CESQ:", "+CESQ:", "+CEREG:", "%XMONITOR:")
+SIGNAL_FIELDS   = ("rsrp_dbm", "rsrq_db", "snr_db", "reg_status", "cell_id")
+SIGNAL_STATES   = ("reg_status", "cell_id")    # Carried forward between samples that do not report them
+SIGNAL_HISTORY_POINTS = 1 << 17 # Samples kept per device (36 hours at one per second)
+
+# Session sharing over local sockets (see SessionBridge)
+BRIDGE_HOST     = "127.0.0.1"   # Only local clients, unless an address is given explicitly
+BRIDGE_PORT     = 7700
+BRIDGE_CLIENT_BUFFER_BYTES = 1024 * 1024    # Output queued per client before it counts as too slow
+BRIDGE_SLOW_DISCONNECT = "disconnect"   # Drop a client that falls too far behind...
+BRIDGE_SLOW_SKIP    = "skip"            # ...or let it miss lines until it catches up
+BRIDGE_MAX_CLIENTS  = 16
+BRIDGE_MAX_PENDING  = 32    # Commands a client may have queued before it is no longer read from
+BRIDGE_MAX_LINE     = 4096  # Longest command line accepted from a client
+
+# Unsolicited result codes the nRF91 modem and Serial LTE Modem emit on their own. Lines with these
+# names are never treated as part of a command's response (unless the command itself queried them).
+KNOWN_URC_PREFIXES = ("+CEREG", "+CGEV", "+CSCON", "+CIEV", "+CMT", "+CMTI", "+CDS", "+CRSM",
+                      "%CESQ", "%XSIM", "%MDMEV", "%XTIME", "%XMODEMSLEEP", "%NCELLMEAS", "%XT3412",
+                      "%XVBATLOWLVL", "%XDATAPRFL", "#XGPS", "#XSMS", "#XPOLL")
+
+
+####################################################################################################
+########################################## Classes #################################################
+####################################################################################################
+class LineSplitter():
+    """Incrementally splits a received byte stream into complete, stripped, non-empty lines"""
+    def __init__(self) -> None:
+        self.buffer = bytearray()
+
+    def feed(self, chunk:bytes) -> List[str]:
+        """Appends received bytes and returns every line they complete"""
+        self.buffer.extend(chunk)
+        lines = []
+        while True:
+            end = self.buffer.find(b"\n")
+            if end < 0:
+                break
+            line = self.buffer[:end].decode("utf-8", errors="replace").strip()
+            del self.buffer[:end + 1]
+            if line:
+                lines.append(line)
+        return lines
+
+class URCDispatcher():
+    """Classifies unsolicited result codes and routes them to handlers registered by prefix or pattern
+
+    Subscriptions are compiled into a dictionary keyed by URC name (the text before the ':', e.g.
+    "+CEREG") plus, for other prefixes and regular expressions, a single combined regex. Each line is
+    therefore classified with one dictionary lookup and at most one regex match, however many handlers
+    are registered. The compiled form is rebuilt on (un)subscribe and swapped in atomically, so
+    handlers can be added from any thread while the reader is dispatching.
+
+    Args:
+        known_urcs (Tuple[str, ...]): URC names treated as unsolicited even without a handler
+    """
+    def __init__(self, known_urcs:Tuple[str, ...]=KNOWN_URC_PREFIXES) -> None:
+        self.known_urcs = tuple(known_urcs)
+        self.subscriptions: Dict[int, Tuple[str, bool, Callable[[str], None]]] = {}
+        self._next_token = 0
+        self._lock = threading.Lock()
+        self._compiled: Tuple[Dict[str, List[Callable]], Optional[re.Pattern], Dict[str, List[Callable]], frozenset] = \
+            ({}, None, {}, frozenset(self.known_urcs))
+
+    def subscribe(self, pattern:str, handler:Callable[[str], None], regex:bool=False) -> int:
+        """Registers a handler for URCs starting with a prefix (or matching a regular expression)
+
+        Args:
+            pattern (str): A URC name such as "+CEREG" or "%CESQ:" (matches exactly that URC), any other
+                literal prefix, or a regular expression if regex is True
+            handler (Callable[[str], None]): Called on the reader's thread with each matching line
+            regex (bool): Treat pattern as a regular expression matched at the start of the line
+
+        Returns:
+            int: A token for unsubscribe()
+        """
+        with self._lock:
+            token = self._next_token
+            self._next_token += 1
+            self.subscriptions[token] = (pattern, regex, handler)
+            self._compile()
+        return token
+
+    def unsubscribe(self, token:int) -> None:
+        with self._lock:
+            if self.subscriptions.pop(token, None) is not None:
+                self._compile()
+
+    def _compile(self) -> None:
+        by_name: Dict[str, List[Callable]] = {}     # Full URC names: O(1) lookup
+        by_group: Dict[str, List[Callable]] = {}    # Everything else: one alternative per pattern
+        alternatives = []
+        for pattern, regex, handler in self.subscriptions.values():
+            if not regex and urc_name(pattern) == pattern.rstrip(":"):
+                by_name.setdefault(pattern.rstrip(":"), []).append(handler)
+                continue
+            source = pattern if regex else re.escape(pattern)
+            if source not in by_group:
+                by_group[source] = []
+                alternatives.append(source)
+            by_group[source].append(handler)
+        groups = {f"g{i}": by_group[source] for i, source in enumerate(alternatives)}
+        combined = None
+        if alternatives:
+            combined = re.compile("|".join(f"(?P<g{i}>{source})" for i, source in enumerate(alternatives)))
+        self._compiled = (by_name, combined, groups, frozenset(self.known_urcs) | frozenset(by_name))
+
+    def is_urc(self, line:str, pending_prefixes:Collection[str]=()) -> bool:
+        """Decides whether a line is unsolicited
+
+        A line is a URC if its name is a known or subscribed URC name, unless it is the response
+        prefix of a command currently pending (e.g. "+CEREG: 0,1" while "AT+CEREG?" is pending).
+
+        Args:
+            line (str): A complete received line
+            pending_prefixes (Collection[str]): response_prefix() of each pending command
+        """
+        name = urc_name(line)
+        if name is None or name in pending_prefixes:
+            return False
+        return name in self._compiled[3]
+
+    def dispatch(self, line:str) -> bool:
+        """Calls every handler whose subscription matches the line
+
+        Returns:
+            bool: True if at least one handler matched
+        """
+        by_name, combined, groups, _ = self._compiled
+        handlers = list(by_name.get(urc_name(line), ()))
+        if combined is not None:
+            match = combined.match(line)
+            if match:
+                handlers.extend(groups[match.lastgroup])
+        for handler in handlers:
+            try:
+                handler(line)
+            except Exception as e:
+                print(f"ERROR: {e}\r\nAttempting to continue...\r\n")
+        return bool(handlers)
+
+class SerialReader(threading.Thread):
+    """Dedicated thread that owns the receive side of a serial device.
+
+    The thread blocks on the port until bytes arrive (bounded by the port's timeout so that it can
+    be stopped), splits the stream into complete lines and hands each line to every subscriber.
+    While a command is pending, its response lines are also routed to that command's waiter queue.
+    URCs (as classified by the dispatcher) are split off first: they go to the dispatcher's handlers
+    and are reported to subscribers as unsolicited, but never reach the waiter.
+
+    Args:
+        device (serial.Serial): An open serial device (or a ReplayDevice)
+        dispatcher (URCDispatcher): Optional URC classifier and router
+        stats (SessionStats): Optional counters receiving the number of bytes read
+        recorder (SessionRecorder): Optional recording receiving every chunk read
+    """
+    def __init__(self, device:serial.Serial, dispatcher:URCDispatcher=None, stats:"SessionStats"=None,
+                 recorder:"SessionRecorder"=None) -> None:
+        super().__init__(daemon=True)
+        self.device = device
+        self.dispatcher = dispatcher
+        self.stats = stats
+        self.recorder = recorder
+        self.first_rx: deque = deque()  # time.monotonic() at which each reply since begin_command() began arriving...
+        self.final_rx: deque = deque()  # ...and at which its final result code arrived
+        self._chunk_rx = 0.0    # time.monotonic() of the chunk being dispatched...
+        self._line_rx = 0.0     # ...and of the chunk in which the line being dispatched began
+        self._in_reply = False  # A solicited line has arrived and the final result code has not
+        self.subscribers: List[Callable[[str, bool], None]] = []
+        self.waiter: Optional[queue.Queue] = None
+        self.pending_prefixes: frozenset = frozenset()  # Response prefixes of the command line being answered
+        self._queued_prefixes: List[frozenset] = []     # Response prefixes of pipelined lines still to come
+        self._expect: Optional[bytes] = None    # Prompt that ends without a line break, see expect()
+        self._subscriber_lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def subscribe(self, callback:Callable[[str, bool], None]) -> None:
+        """Registers a callback receiving (line, solicited) for every complete line"""
+        with self._subscriber_lock:
+            self.subscribers.append(callback)
+
+    def unsubscribe(self, callback:Callable[[str, bool], None]) -> None:
+        with self._subscriber_lock:
+            if callback in self.subscribers:
+                self.subscribers.remove(callback)
+
+    def begin_command(self, *lines:str) -> queue.Queue:
+        """Routes subsequent response lines to a new waiter queue until end_command() is called
+
+        Args:
+            lines (str): The command line(s) being sent, in order, used to tell their responses apart
+                from URCs. When several lines are pipelined, each final result code moves on to the next.
+
+        Returns:
+            queue.Queue: The queue that will receive the response lines
+        """
+        prefixes = [line_prefixes(line) for line in lines if line]
+        self.pending_prefixes = prefixes[0] if prefixes else frozenset()
+        self._queued_prefixes = prefixes[1:]
+        self.first_rx.clear()
+        self.final_rx.clear()
+        self._in_reply = False
+        self.waiter = queue.Queue()
+        return self.waiter
+
+    def end_command(self) -> None:
+        self.waiter = None
+        self.pending_prefixes = frozenset()
+        self._queued_prefixes = []
+        self._expect = None
+
+    def expect(self, prompt:Optional[str]) -> None:
+        """Queues PROMPT to the waiter once prompt arrives as an unterminated line (e.g. "> ")
+
+        The prompt's bytes are consumed, so they never prefix the next line. Call with None to cancel.
+        """
+        self._expect = prompt.encode() if prompt else None
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout=2 * READ_TIMEOUT_S + 1)
+
+    def run(self) -> None:
+        splitter = LineSplitter()
+        while not self._stop_event.is_set():
+            try:
+                # Blocks until at least one byte arrives or the port timeout expires
+                chunk = self.device.read(max(1, self.device.in_waiting))
+            except (serial.SerialException, OSError, TypeError) as e:
+                if not self._stop_event.is_set():
+                    print(f"Serial reader stopped: {e}")
+                break
+            if not chunk:
+                continue
+            self._chunk_rx = time.monotonic()
+            if not splitter.buffer.strip():
+                self._line_rx = self._chunk_rx  # The next line begins in this chunk (otherwise in an earlier one)
+            if self.stats is not None:
+                self.stats.add_rx(len(chunk))
+            recorder = self.recorder
+            if recorder is not None:
+                recorder.record(RECORD_RX, chunk)
+            for line in splitter.feed(chunk):
+                self.dispatch(line)
+                self._line_rx = self._chunk_rx
+            expect, waiter = self._expect, self.waiter
+            if expect is not None and waiter is not None and splitter.buffer.rstrip().endswith(expect.rstrip()):
+                self._expect = None
+                splitter.buffer.clear()
+                waiter.put(PROMPT)
+
+    def dispatch(self, line:str) -> None:
+        waiter = self.waiter
+        solicited = waiter is not None
+        if self.dispatcher is not None:
+            if not solicited or self.dispatcher.is_urc(line, self.pending_prefixes):
+                solicited = False
+                self.dispatcher.dispatch(line)
+        if solicited:
+            if not self._in_reply:
+                # The reply's first byte is its first solicited line's, so a URC arriving first never counts
+                self.first_rx.append(self._line_rx)
+                self._in_reply = True
+            waiter.put(line)
+            if is_final_result_code(line):
+                self._in_reply = False
+                self.final_rx.append(self._chunk_rx)
+                if self._queued_prefixes:
+                    self.pending_prefixes = self._queued_prefixes.pop(0)
+        with self._subscriber_lock:
+            subscribers = list(self.subscribers)
+        for callback in subscribers:
+            try:
+                callback(line, solicited)
+            except Exception as e:
+                print(f"ERROR: {e}\r\nAttempting to continue...\r\n")
+
+class ATCommand():
+    def __init__(self, command:str, hint:str=None, ignore:str=None, one_liner:bool=False,
+                 timeout_s:float=RESPONSE_TIMEOUT_S, cacheable:bool=False, cache_ttl_s:float=None) -> None:
+        self.cmd_s    = command   # The command to be sent
+        self.hint_s   = hint      # Tooltip shown on mouse hover
+        self.ignore_s = ignore    # Responses to ignore after sending command
+        self.one_liner  = one_liner # Indicates that the response should only be one line
+        self.timeout_s  = timeout_s # Maximum time to wait for the final result code
+        self.cacheable  = cacheable # Response never changes while the device stays connected
+        self.cache_ttl_s = cache_ttl_s  # Optional expiry for cached responses; None keeps them until reconnect
+
+
+class ATResponse():
+    """Line-oriented response to a single AT command, completed by its final result code
+
+    Args:
+        command (str): The command that was sent
+    """
+    def __init__(self, command:str) -> None:
+        self.command    = command
+        self.lines: List[str]   = []    # Information text lines, excluding the final result code
+        self.stamps: List[str]  = []    # Timestamp for each entry in self.lines
+        self.final: Optional[str] = None    # Final result code ("OK", "ERROR", "+CME ERROR: 10", ...)
+        self.final_stamp: Optional[str] = None
+        self.latency_s: Optional[float] = None  # Time from write to final result code
+        self.first_byte_s: Optional[float] = None   # Time from write to the first received byte
+        self.timed_out  = False
+        self.cached     = False     # Answered from the session's ResponseCache without a round trip
+
+    @property
+    def ok(self) -> bool:
+        return self.final == "OK"
+
+    def feed(self, line:str) -> bool:
+        """Consumes one response line
+
+        Args:
+            line (str): A complete line received after the command was written
+
+        Returns:
+            bool: True once the final result code has been received
+        """
+        if is_final_result_code(line):
+            self.final = line
+            self.final_stamp = get_timestamp()
+            return True
+        self.lines.append(line)
+        self.stamps.append(get_timestamp())
+        return False
+
+    def collect(self, waiter:queue.Queue, timeout_s:float, start:float, done:str=None) -> "ATResponse":
+        """Feeds lines from a SerialReader waiter until the final result code or the timeout
+
+        Args:
+            waiter (queue.Queue): The queue returned by SerialReader.begin_command()
+            timeout_s (float): Maximum time to wait for the final result code
+            start (float): time.monotonic() at which the command was written
+            done (str): Optional line prefix that also ends the response, kept as self.final
+                (e.g. "#XDATAMODE:" when Serial LTE Modem leaves data mode)
+
+        Returns:
+            ATResponse: self, for chaining
+        """
+        deadline = start + timeout_s
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.timed_out = True
+                break
+            try:
+                line = waiter.get(timeout=remaining)
+            except queue.Empty:
+                self.timed_out = True
+                break
+            if line is PROMPT:
+                continue
+            if done is not None and line.startswith(done):
+                self.final = line
+                self.final_stamp = get_timestamp()
+            if self.final is not None or self.feed(line):
+                self.latency_s = time.monotonic() - start
+                break
+        return self
+
+    def end_report(self, done:str) -> None:
+        """Turns a status report that ended the response (see collect's done) into the final result code
+
+        The report is kept as the last line, and final becomes "OK" if its value is 0, otherwise "ERROR".
+        """
+        if self.final is not None and self.final.startswith(done):
+            self.lines.append(self.final)
+            self.stamps.append(self.final_stamp)
+            self.final = "OK" if self.final[len(done):].strip() == "0" else "ERROR"
+
+    def text(self) -> str:
+        """Returns the information lines followed by the final result code, one per line"""
+        return "\n".join(self.lines + ([self.final] if self.final else []))
+
+    def to_dict(self) -> dict:
+        """Returns the response as a JSON-serializable dictionary"""
+        return {
+            "command": self.command,
+            "lines": self.lines,
+            "final": self.final,
+            "latency_s": self.latency_s,
+            "first_byte_s": self.first_byte_s,
+            "timed_out": self.timed_out,
+            "cached": self.cached,
+        }
+
+class ATScript():
+    """A script of AT commands parsed from a text file
+
+    By default each command line is written in one call and the next line is sent as soon as the
+    previous command's final result code arrives (or its timeout expires). Scripts for modems
+    without flow control can opt in to per-character pacing with the [PACE] keyword.
+
+    The header ([NAME], [DESC], ...) can be read on its own with extract_header(); ensure_loaded()
+    parses the commands on first use and again only if the file's mtime or size changes.
+
+    Args:
+        filename (str): Path to the script file
+        delay_s (float): Delay between characters when pacing is enabled
+        timeout_s (float): Maximum time to wait for each line's final result code
+        paced (bool): Write one character at a time, sleeping delay_s between characters
+    """
+    def __init__(self, filename:str, delay_s:float=.175, timeout_s:float=RESPONSE_TIMEOUT_S, paced:bool=False) -> None:
+        self.filename = filename
+        self.delay_s = delay_s
+        self.timeout_s = timeout_s
+        self.paced = paced
+        self.commands = []
+        self.name = None
+        self.desc = None
+        self.header_key: Optional[Tuple[int, int]] = None   # (mtime_ns, size) when the header was read
+        self.loaded_key: Optional[Tuple[int, int]] = None   # (mtime_ns, size) when the commands were read
+
+    def stat_key(self) -> Tuple[int, int]:
+        st = os.stat(self.filename)
+        return (st.st_mtime_ns, st.st_size)
+
+    def extract_header(self) -> None:
+        """Reads only the lines before [START]: name, description and execution options"""
+        self.extract_commands(header_only=True)
+
+    def ensure_loaded(self) -> None:
+        """Parses the script's commands unless they are already cached for the file's current mtime and size"""
+        if self.loaded_key is None or self.loaded_key != self.stat_key():
+            self.extract_commands()
+
+    def extract_commands(self, header_only:bool=False) -> None:
+        # Keywords
+        KW_NAME = "[NAME]"
+        KW_DESC = "[DESC]"
+        KW_STRT = "[START]"
+        KW_STOP = "[END]"
+        KW_WAIT = "[WAIT]"
+        KW_PACE = "[PACE]"
+        KW_TOUT = "[TIMEOUT]"
+        running = False
+        key = self.stat_key()
+        commands = []
+        with open(self.filename, "r") as f:
+            for line in f:
+                if line.strip():
+                    if not line.strip().startswith("//"):
+                        if not running:
+                            if KW_NAME in line:
+                                line_no_cmnt = line.split("//")[0]
+                                self.name = line_no_cmnt.split(KW_NAME)[1].strip().strip("\"")
+                            elif KW_DESC in line:
+                                line_no_cmnt = line.split("//")[0]
+                                self.desc = line_no_cmnt.split(KW_DESC)[1].strip().strip("\"")
+                            elif KW_PACE in line:
+                                line_no_cmnt = line.split("//")[0]
+                                delay = line_no_cmnt.split(KW_PACE)[1].strip()
+                                self.paced = True
+                                if delay:
+                                    self.delay_s = float(delay)
+                            elif KW_TOUT in line:
+                                line_no_cmnt = line.split("//")[0]
+                                self.timeout_s = float(line_no_cmnt.split(KW_TOUT)[1].strip())
+                            elif KW_STRT in line:
+                                if header_only:
+                                    break
+                                running = True
+                        elif running:
+                            if not KW_STOP in line:
+                                line_no_cmnt = line.split("//")[0]
+                                final = line_no_cmnt.strip()
+                                commands.append(final)
+                            else:
+                                running = False
+                                break
+        self.header_key = key
+        if not header_only:
+            self.commands = commands
+            self.loaded_key = key
+
+    def print_info(self) -> None:
+        print(f"Name: {self.name}")
+        print(f"Desc: {self.desc}")
+        print(f"Commands:")
+        for cmd in self.commands:
+            print(f"\t{cmd}")
+
+class ScriptLibrary():
+    """Index of the script files in a directory
+
+    scan() only stats the directory's files and reads the header of new or changed ones, so it is cheap
+    enough to call periodically. Script bodies are parsed lazily by ATScript.ensure_loaded().
+
+    Args:
+        directory (str): Directory containing script files. It does not need to exist.
+    """
+    def __init__(self, directory:str="./scripts") -> None:
+        self.directory = directory
+        self.scripts: Dict[str, ATScript] = {}  # Keyed by path, in file name order
+
+    def scan(self) -> bool:
+        """Picks up added, changed and removed script files
+
+        Returns:
+            bool: True if the set of scripts or any script's header changed since the last scan
+        """
+        try:
+            entries = sorted((e for e in os.scandir(self.directory) if e.is_file()), key=lambda e: e.name)
+        except (FileNotFoundError, NotADirectoryError):
+            entries = []
+        changed = False
+        scripts = {}
+        for entry in entries:
+            st = entry.stat()
+            script = self.scripts.get(entry.path)
+            if script is None or script.header_key != (st.st_mtime_ns, st.st_size):
+                script = ATScript(entry.path)
+                try:
+                    script.extract_header()
+                except (OSError, ValueError, IndexError, UnicodeDecodeError) as e:
+                    print(f"Skipping script {entry.path}: {e}")
+                    continue
+                changed = True
+            scripts[entry.path] = script
+        if scripts.keys() != self.scripts.keys():
+            changed = True
+        self.scripts = scripts
+        return changed
+
+    def list(self) -> List[ATScript]:
+        return list(self.scripts.values())
+
+class ResponseCache():
+    """Responses to static commands (identification, versions, ...) for the devices seen by a session
+
+    Entries are keyed by (port, modem UUID, command). They expire after their TTL, or never if the TTL
+    is None, and the owning session clears the cache whenever the port is (re)opened or closed.
+    """
+    def __init__(self) -> None:
+        self.entries: Dict[Tuple[str, str, str], Tuple[ATResponse, Optional[float]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, port:str, device_id:str, cmd_s:str) -> Optional[ATResponse]:
+        """Returns a copy of the cached response marked cached=True, or None if missing or expired"""
+        key = (port, device_id, cmd_s)
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            response, expires = entry
+            if expires is not None and time.monotonic() >= expires:
+                del self.entries[key]
+                return None
+        cached = copy.copy(response)
+        cached.cached = True
+        return cached
+
+    def put(self, port:str, device_id:str, response:ATResponse, ttl_s:Optional[float]=None) -> None:
+        """Caches a successful response; errors and timeouts are never cached"""
+        if not response.ok:
+            return
+        expires = None if ttl_s is None else time.monotonic() + ttl_s
+        with self._lock:
+            self.entries[(port, device_id, response.command)] = (response, expires)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.entries.clear()
+
+class LatencyHistogram():
+    """Fixed-bucket histogram of durations (see LATENCY_BUCKETS_MS), cheap enough to update per command"""
+    def __init__(self) -> None:
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+
+    def add(self, duration_s:float) -> None:
+        ms = duration_s * 1000
+        i = 0
+        while i < len(LATENCY_BUCKETS_MS) and ms > LATENCY_BUCKETS_MS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.total_s += duration_s
+        self.max_s = max(self.max_s, duration_s)
+
+    def percentile_ms(self, q:float) -> Optional[float]:
+        """Returns the upper edge of the bucket holding the q-th quantile (0 < q <= 1), capped at the maximum"""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for edge, n in zip(LATENCY_BUCKETS_MS + (None,), self.counts):
+            seen += n
+            if seen >= target:
+                break
+        max_ms = self.max_s * 1000
+        return max_ms if edge is None else min(edge, max_ms)
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_ms": self.total_s * 1000 / self.count if self.count else None,
+            "p50_ms": self.percentile_ms(0.50),
+            "p95_ms": self.percentile_ms(0.95),
+            "p99_ms": self.percentile_ms(0.99),
+            "max_ms": self.max_s * 1000 if self.count else None,
+            "buckets_ms": dict(zip([str(edge) for edge in LATENCY_BUCKETS_MS] + ["inf"], self.counts)),
+        }
+
+class SessionStats():
+    """Performance counters for one session
+
+    Records, per command line, write-to-first-byte and write-to-final-result-code latencies, plus time
+    spent waiting for the session's command lock, bytes in and out of the port and any gauges the
+    front end reports (e.g. GUI queue depth). Updates are O(1) and thread-safe.
+    """
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self.lock:
+            self.started = time.monotonic()
+            self.commands: Dict[str, Dict[str, Any]] = {}
+            self.lock_wait = LatencyHistogram()
+            self.bytes_in = 0
+            self.bytes_out = 0
+            self.gauges: Dict[str, float] = {}
+            self._last_rate = (self.started, 0, 0)  # (time, bytes_in, bytes_out) at the last snapshot()
+
+    def add_rx(self, n:int) -> None:
+        with self.lock:
+            self.bytes_in += n
+
+    def add_tx(self, n:int) -> None:
+        with self.lock:
+            self.bytes_out += n
+
+    def set_gauge(self, name:str, value:float) -> None:
+        with self.lock:
+            self.gauges[name] = value
+
+    def record_lock_wait(self, wait_s:float) -> None:
+        with self.lock:
+            self.lock_wait.add(wait_s)
+
+    def record_command(self, response:ATResponse) -> None:
+        """Adds a completed (or timed out) command's latencies to its per-command entry"""
+        if response.cached:
+            return
+        with self.lock:
+            entry = self.commands.get(response.command)
+            if entry is None:
+                entry = {"count": 0, "errors": 0, "timeouts": 0,
+                         "first_byte": LatencyHistogram(), "final": LatencyHistogram()}
+                self.commands[response.command] = entry
+            entry["count"] += 1
+            if response.timed_out:
+                entry["timeouts"] += 1
+            elif not response.ok:
+                entry["errors"] += 1
+            if response.first_byte_s is not None:
+                entry["first_byte"].add(response.first_byte_s)
+            if response.latency_s is not None:
+                entry["final"].add(response.latency_s)
+
+    def snapshot(self) -> dict:
+        """Returns every counter as a JSON-serializable dictionary
+
+        rx_bytes_per_s and tx_bytes_per_s are averaged over the time since the previous snapshot.
+        """
+        with self.lock:
+            now = time.monotonic()
+            last_t, last_in, last_out = self._last_rate
+            elapsed = max(now - last_t, 1e-9)
+            self._last_rate = (now, self.bytes_in, self.bytes_out)
+            return {
+                "uptime_s": now - self.started,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "rx_bytes_per_s": (self.bytes_in - last_in) / elapsed,
+                "tx_bytes_per_s": (self.bytes_out - last_out) / elapsed,
+                "lock_wait": self.lock_wait.to_dict(),
+                "gauges": dict(self.gauges),
+                "commands": {cmd_s: {"count": e["count"], "errors": e["errors"], "timeouts": e["timeouts"],
+                                     "first_byte": e["first_byte"].to_dict(), "final": e["final"].to_dict()}
+                             for cmd_s, e in self.commands.items()},
+            }
+
+def export_stats(stats:Dict[str, SessionStats], filename:str) -> None:
+    """Writes the stats of one or more sessions to a .json or .csv file
+
+    JSON holds every counter; CSV has one row per (port, metric, command) latency histogram.
+
+    Args:
+        stats (Dict[str, SessionStats]): Stats by port
+        filename (str): Output path; the format follows the extension
+    """
+    snapshots = {port: s.snapshot() for port, s in stats.items()}
+    if not filename.lower().endswith(".csv"):
+        with open(filename, "w") as f:
+            json.dump(snapshots, f, indent=2)
+        return
+    fields = ["count", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms"]
+    with open(filename, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["port", "metric", "command", "errors", "timeouts"] + fields)
+        for port, snap in snapshots.items():
+            writer.writerow([port, "lock_wait", "", "", ""] + [snap["lock_wait"][k] for k in fields])
+            for cmd_s, entry in snap["commands"].items():
+                for metric in ("first_byte", "final"):
+                    writer.writerow([port, metric, cmd_s, entry["errors"], entry["timeouts"]]
+                                    + [entry[metric][k] for k in fields])
+
+class SignalHistory():
+    """Per-device time series of signal quality and registration, parsed from %CESQ, +CESQ, +CEREG and %XMONITOR
+
+    Samples go into fixed-size ring buffers (one column per field, plus a time.time() column), so a
+    day-long drive test uses the same memory as a short one and the oldest samples are overwritten.
+    Columns are NumPy arrays when NumPy is installed (plots are then decimated with vectorized
+    reductions) and array.array otherwise. A measurement missing from a line is NaN; the registration
+    state and cell ID carry their last known value forward.
+
+    Args:
+        capacity (int): Samples kept before the oldest are overwritten
+    """
+    def __init__(self, capacity:int=SIGNAL_HISTORY_POINTS) -> None:
+        self.capacity = capacity
+        self.lock = threading.Lock()    # Samples arrive on the reader thread; plots read on the GUI thread
+        self.count = 0  # Samples ever added; the next one goes to index count % capacity
+        self.latest: Dict[str, float] = {}  # Last known value of each field
+        names = ("time",) + SIGNAL_FIELDS
+        if np is not None:
+            self.columns = {name: np.full(capacity, np.nan) for name in names}
+        else:
+            self.columns = {name: array("d", [math.nan]) * capacity for name in names}
+
+    def __len__(self) -> int:
+        return min(self.count, self.capacity)
+
+    def on_line(self, line:str, solicited:bool) -> None:
+        """Reader subscriber: adds a sample for every signal or registration line, URC or response"""
+        if line.startswith(SIGNAL_PREFIXES):
+            sample = parse_signal(line)
+            if sample:
+                self.add(sample)
+
+    def add(self, sample:Dict[str, float], stamp:float=None) -> None:
+        """Appends one sample (a dict of some of SIGNAL_FIELDS) taken at stamp (time.time(); now if None)"""
+        with self.lock:
+            self.latest.update(sample)
+            i = self.count % self.capacity
+            self.columns["time"][i] = time.time() if stamp is None else stamp
+            for name in SIGNAL_FIELDS:
+                value = sample.get(name)
+                if value is None and name in SIGNAL_STATES:
+                    value = self.latest.get(name)
+                self.columns[name][i] = math.nan if value is None else value
+            self.count += 1
+
+    def clear(self) -> None:
+        with self.lock:
+            self.count = 0
+            self.latest.clear()
+
+    def series(self, names:Collection[str]=None, since:float=None) -> Dict[str, Any]:
+        """Returns columns in chronological order (NumPy arrays, or array.array without NumPy)
+
+        Args:
+            names (Collection[str]): Fields to return besides "time"; all of SIGNAL_FIELDS if None
+            since (float): Only samples taken at or after this time.time()
+        """
+        names = ("time",) + tuple(SIGNAL_FIELDS if names is None else names)
+        with self.lock:
+            n = len(self)
+            head = self.count % self.capacity if self.count > self.capacity else 0
+            out = {}
+            for name in names:
+                column = self.columns[name]
+                if head:
+                    out[name] = np.concatenate((column[head:], column[:head])) if np is not None else column[head:] + column[:head]
+                else:
+                    out[name] = column[:n]
+        if since is not None and n:
+            first = int(np.searchsorted(out["time"], since)) if np is not None else bisect.bisect_left(out["time"], since)
+            out = {name: column[first:] for name, column in out.items()}
+        return out
+
+    def decimate(self, name:str, buckets:int, since:float=None) -> List[Tuple[float, float, float]]:
+        """Min/max decimation of one field for plotting
+
+        The time span is cut into buckets of equal width, and each bucket that holds at least one value
+        is reduced to (bucket start time, minimum, maximum). Drawing a vertical stroke per bucket shows
+        every spike however long the window, at a cost set by the number of buckets (e.g. the plot's
+        width in pixels), not by the number of samples.
+        """
+        data = self.series([name], since)
+        t, v = data["time"], data[name]
+        if not len(t) or buckets < 1:
+            return []
+        t0 = t[0]
+        width = max((t[-1] - t0) / buckets, 1e-9)
+        if np is not None:
+            edges = t0 + width * np.arange(buckets)
+            starts = np.searchsorted(t, edges)
+            ends = np.append(starts[1:], len(t))
+            nonempty = ends > starts
+            starts = starts[nonempty]
+            lo = np.fmin.reduceat(v, starts)
+            hi = np.fmax.reduceat(v, starts)
+            keep = ~np.isnan(lo)
+            return list(zip(edges[nonempty][keep].tolist(), lo[keep].tolist(), hi[keep].tolist()))
+        out: List[Tuple[float, float, float]] = []
+        first = 0
+        for k in range(buckets):
+            start = t0 + width * k
+            last = bisect.bisect_left(t, start + width, first) if k < buckets - 1 else len(t)
+            values = [value for value in v[first:last] if value == value]   # Drop NaNs
+            if values:
+                out.append((start, min(values), max(values)))
+            first = last
+        return out
+
+    def export(self, filename:str, port:str="") -> None:
+        """Writes every sample to a .csv file, or to a .parquet file when pyarrow or pandas is installed
+
+        Raises:
+            ValueError: If a Parquet file is requested and neither pyarrow nor pandas is available
+        """
+        data = self.series()
+        if filename.lower().endswith(".parquet"):
+            columns = {"port": [port] * len(data["time"])}
+            columns.update({name: list(column) for name, column in data.items()})
+            try:
+                import pyarrow, pyarrow.parquet     # Optional; imported only for Parquet export
+                pyarrow.parquet.write_table(pyarrow.table(columns), filename)
+            except ImportError:
+                try:
+                    import pandas
+                except ImportError:
+                    raise ValueError("Parquet export needs pyarrow or pandas; use a .csv file instead")
+                pandas.DataFrame(columns).to_parquet(filename)
+            return
+        with open(filename, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["port", "time", "timestamp"] + list(SIGNAL_FIELDS))
+            for i, stamp in enumerate(data["time"]):
+                row = [port, f"{stamp:.3f}", get_timestamp(when=stamp)[1:-1]]
+                for name in SIGNAL_FIELDS:
+                    value = data[name][i]
+                    row.append("" if value != value else int(value) if name in SIGNAL_STATES else f"{value:g}")
+                writer.writerow(row)
+
+class CommandScheduler(threading.Thread):
+    """Per-device worker that runs queued work by priority, plus recurring polls
+
+    Work is run one item at a time, most urgent first and in submission order within a priority.
+    Long-running work (a script) gives way to more urgent work at every command boundary and during
+    waits by calling run_pending() or sleep() from the worker, so a manual query never waits for a
+    script or a poll cycle to finish. Polls run at PRIORITY_BACKGROUND; polls due within
+    POLL_COALESCE_S of each other are handed to run_polls together so they can share a round trip.
+
+    Args:
+        name (str): Thread name
+        run_polls (Callable[[List[list]], None]): Runs a list of due polls ([token, cmd, interval_s,
+            callback, next_due]) on the worker thread
+    """
+    def __init__(self, name:str, run_polls:Callable[[List[list]], None]) -> None:
+        super().__init__(name=name, daemon=True)
+        self.run_polls = run_polls
+        self.queue: List[tuple] = []    # Heap of (priority, seq, future, fn, args, kwargs)
+        self.polls: Dict[int, list] = {}    # token -> [token, cmd, interval_s, callback, next_due]
+        self._seq = 0
+        self._running: List[int] = []   # Priorities of the work in progress (nested by run_pending)
+        self._stopping = False
+        self._cond = threading.Condition()
+
+    def submit(self, priority:int, fn:Callable, *args, **kwargs) -> Future:
+        future = Future()
+        with self._cond:
+            if self._stopping:
+                raise RuntimeError("cannot submit work to a stopped scheduler")
+            heapq.heappush(self.queue, (priority, self._seq, future, fn, args, kwargs))
+            self._seq += 1
+            self._cond.notify_all()
+        return future
+
+    def add_poll(self, cmd:Any, interval_s:float, callback:Callable) -> int:
+        with self._cond:
+            token = self._seq
+            self._seq += 1
+            self.polls[token] = [token, cmd, interval_s, callback, time.monotonic()]
+            self._cond.notify_all()
+        return token
+
+    def cancel_poll(self, token:int) -> None:
+        with self._cond:
+            self.polls.pop(token, None)
+
+    def stop(self, wait:bool=True) -> None:
+        """Cancels the polls and stops once queued work has finished"""
+        with self._cond:
+            self._stopping = True
+            self.polls.clear()
+            self._cond.notify_all()
+        if wait and self.is_alive() and threading.current_thread() is not self:
+            self.join()
+
+    def _due_polls(self, now:float) -> List[list]:
+        if not self.polls or min(p[4] for p in self.polls.values()) > now:
+            return []
+        return [p for p in self.polls.values() if p[4] <= now + POLL_COALESCE_S]
+
+    def run(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    if self._stopping and not self.queue:
+                        return
+                    now = time.monotonic()
+                    due = self._due_polls(now)
+                    if self.queue and (self.queue[0][0] < PRIORITY_BACKGROUND or not due):
+                        job = heapq.heappop(self.queue)
+                        break
+                    if due:
+                        job = None
+                        for poll in due:    # Reschedule now, skipping cycles missed while busy
+                            poll[4] += poll[2] * max(1, math.ceil((now - poll[4]) / poll[2]))
+                        break
+                    timeout = min(p[4] for p in self.polls.values()) - now if self.polls else None
+                    self._cond.wait(timeout)
+            if job is not None:
+                self._run(job)
+                continue
+            self._running.append(PRIORITY_BACKGROUND)
+            try:
+                self.run_polls(due)
+            except Exception as e:
+                print(f"ERROR: {e}\r\nAttempting to continue...\r\n")
+            finally:
+                self._running.pop()
+
+    def _run(self, job:tuple) -> None:
+        priority, _, future, fn, args, kwargs = job
+        if not future.set_running_or_notify_cancel():
+            return
+        self._running.append(priority)
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            self._running.pop()
+
+    def run_pending(self) -> int:
+        """Runs queued work more urgent than the work in progress; only acts on the worker thread
+
+        Returns:
+            int: Number of items run
+        """
+        if threading.current_thread() is not self or not self._running:
+            return 0
+        count = 0
+        while True:
+            with self._cond:
+                if not self.queue or self.queue[0][0] >= self._running[-1]:
+                    return count
+                job = heapq.heappop(self.queue)
+            self._run(job)
+            count += 1
+
+    def sleep(self, seconds:float) -> None:
+        """Waits for seconds; on the worker, more urgent work submitted meanwhile runs during the wait"""
+        if threading.current_thread() is not self or not self._running:
+            time.sleep(seconds)
+            return
+        deadline = time.monotonic() + seconds
+        while True:
+            self.run_pending()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            with self._cond:
+                if not self.queue or self.queue[0][0] >= self._running[-1]:
+                    self._cond.wait(remaining)
+
+class ATSession():
+    """A connection to one serial modem: the port, its reader thread and the command lock
+
+    Subscribers registered with subscribe() are attached to the reader every time the port is opened,
+    so they survive reconnects.
+
+    Args:
+        port (str): Serial port name (e.g. "COM21" or "/dev/ttyACM0")
+        baudrate (int): Serial baud rate
+        logger (SessionLogger): Optional log sink receiving every TX/RX line
+        flow_control (str): FLOW_NONE, FLOW_RTSCTS or FLOW_XONXOFF
+    """
+    def __init__(self, port:str=None, baudrate:int=DEFAULT_BAUD, logger:"SessionLogger"=None,
+                 flow_control:str=FLOW_NONE) -> None:
+        self.device = serial.Serial()
+        self.device.port = port
+        self.device.baudrate = baudrate
+        self.set_flow_control(flow_control)
+        self.lock = threading.RLock()   # Held for the duration of a command (or a whole script)
+        self.reader: Optional[SerialReader] = None
+        self.logger = logger
+        self.subscribers: List[Callable[[str, bool], None]] = []
+        self.urc_dispatcher = URCDispatcher()   # Register URC handlers with urc_dispatcher.subscribe(...)
+        self.cache = ResponseCache()    # Responses to cacheable commands, cleared on (re)connect
+        self.device_id: Optional[str] = None    # Modem UUID, read on the first cacheable query
+        self.scheduler: Optional[CommandScheduler] = None   # Per-device command queue, see submit()
+        self.stats = SessionStats()     # Latency, lock wait and throughput counters
+        self._lock_depth = 0    # Re-entrant holds of self.lock by its current owner
+        self.recorder: Optional[SessionRecorder] = None     # See start_recording()
+        self.signal = SignalHistory()   # Signal quality and registration, from URCs and responses alike
+
+    def __enter__(self) -> "ATSession":
+        self.open()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    @property
+    def is_open(self) -> bool:
+        return self.device.is_open
+
+    def open(self, port:str=None, baudrate:int=None) -> None:
+        """Opens the serial port and starts its reader
+
+        Raises:
+            serial.SerialException: If the port cannot be opened
+        """
+        if port is not None:
+            self.device.port = port
+        if baudrate is not None:
+            self.device.baudrate = baudrate
+        self.device.timeout = READ_TIMEOUT_S
+        self.cache.clear()
+        self.device_id = None
+        self.device.open()
+        self.reader = SerialReader(self.device, self.urc_dispatcher, self.stats, self.recorder)
+        for callback in self.subscribers:
+            self.reader.subscribe(callback)
+        if self.logger is not None:
+            self.reader.subscribe(self.logger.log_rx)
+        self.reader.subscribe(self.signal.on_line)
+        self.reader.start()
+
+    def close(self) -> None:
+        if self.reader is not None:
+            self.reader.stop()
+            self.reader = None
+        if self.device.is_open:
+            self.device.close()
+        self.cache.clear()
+        self.device_id = None
+
+    def set_flow_control(self, flow_control:str) -> None:
+        """Selects FLOW_NONE, FLOW_RTSCTS or FLOW_XONXOFF, applied at once if the port is open
+
+        Raises:
+            ValueError: If flow_control is not one of FLOW_CONTROLS
+        """
+        if flow_control not in FLOW_CONTROLS:
+            raise ValueError(f"Unknown flow control \"{flow_control}\" (expected one of {', '.join(FLOW_CONTROLS)})")
+        self.device.rtscts = flow_control == FLOW_RTSCTS
+        self.device.xonxoff = flow_control == FLOW_XONXOFF
+
+    @property
+    def flow_control(self) -> str:
+        if self.device.rtscts:
+            return FLOW_RTSCTS
+        return FLOW_XONXOFF if self.device.xonxoff else FLOW_NONE
+
+    @contextmanager
+    def locked(self) -> Iterator[None]:
+        """Holds the command lock, recording how long the outermost acquisition waited for it"""
+        start = time.monotonic()
+        with self.lock:
+            if self._lock_depth == 0:
+                self.stats.record_lock_wait(time.monotonic() - start)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+
+    def submit(self, fn:Callable, *args, priority:int=PRIORITY_NORMAL, **kwargs) -> Future:
+        """Queues fn(*args, **kwargs) on this device's command queue
+
+        Work submitted to one session runs on a single worker thread (see CommandScheduler), most
+        urgent priority first and in order within a priority, so callers (GUI buttons, the session
+        manager) never need a thread of their own per command. A running script lets
+        PRIORITY_INTERACTIVE work in between its commands and during its [WAIT]s.
+
+        Args:
+            priority (int): PRIORITY_INTERACTIVE, PRIORITY_NORMAL or PRIORITY_BACKGROUND
+
+        Returns:
+            Future: The pending result of fn
+        """
+        return self._scheduler().submit(priority, fn, *args, **kwargs)
+
+    def poll(self, cmd:Union[ATCommand, str], interval_s:float, callback:Callable[[ATResponse], None]) -> int:
+        """Sends a command every interval_s seconds (first right away) and passes each response to callback
+
+        Polls run at PRIORITY_BACKGROUND while the port is open. Polls falling due together are sent
+        in one round trip (see send_batch), and a command polled by several callers is sent once.
+
+        Returns:
+            int: A token for cancel_poll()
+        """
+        if isinstance(cmd, str):
+            cmd = ATCommand(cmd)
+        return self._scheduler().add_poll(cmd, interval_s, callback)
+
+    def cancel_poll(self, token:int) -> None:
+        if self.scheduler is not None:
+            self.scheduler.cancel_poll(token)
+
+    def sleep(self, seconds:float) -> None:
+        """Waits without holding the command lock, serving more urgent queued work meanwhile"""
+        if self.scheduler is not None:
+            self.scheduler.sleep(seconds)
+        else:
+            time.sleep(seconds)
+
+    def yield_to_queued(self) -> None:
+        """Runs queued work more urgent than the current work, if called from the command queue"""
+        if self.scheduler is not None:
+            self.scheduler.run_pending()
+
+    def _scheduler(self) -> CommandScheduler:
+        if self.scheduler is None:
+            self.scheduler = CommandScheduler(f"ATSession-{self.device.port}", self._run_polls)
+            self.scheduler.start()
+        return self.scheduler
+
+    def _run_polls(self, polls:List[list]) -> None:
+        """Sends the due polls' commands in one batch, once per distinct command"""
+        if not self.is_open:
+            return
+        commands = {poll[1].cmd_s: poll[1] for poll in polls}
+        responses = dict(zip(commands, self.send_batch(list(commands.values()))))
+        for _, cmd, _, callback, _ in polls:
+            try:
+                callback(responses[cmd.cmd_s])
+            except Exception as e:
+                print(f"ERROR: {e}\r\nAttempting to continue...\r\n")
+
+    def shutdown(self) -> None:
+        """Cancels polls and stops the command queue once queued work has finished"""
+        if self.scheduler is not None:
+            self.scheduler.stop(wait=True)
+            self.scheduler = None
+
+    def subscribe(self, callback:Callable[[str, bool], None]) -> None:
+        """Registers a callback receiving (line, solicited) for every line received while open"""
+        self.subscribers.append(callback)
+        if self.reader is not None:
+            self.reader.subscribe(callback)
+
+    def unsubscribe(self, callback:Callable[[str, bool], None]) -> None:
+        if callback in self.subscribers:
+            self.subscribers.remove(callback)
+        if self.reader is not None:
+            self.reader.unsubscribe(callback)
+
+    def send_command(self, cmd_s:str, timeout_s:float=RESPONSE_TIMEOUT_S, char_delay_s:float=0) -> ATResponse:
+        """Writes a command and waits for its final result code
+
+        Args:
+            cmd_s (str): The command, without line termination
+            timeout_s (float): Maximum time to wait for the final result code
+            char_delay_s (float): If non-zero, write one character at a time with this delay between
+                characters (for modems without flow control). Otherwise the line is written in one call.
+
+        Returns:
+            ATResponse: The response, returned as soon as the final result code arrives
+        """
+        with self.locked():
+            waiter = self.reader.begin_command(cmd_s)
+            try:
+                if self.logger is not None:
+                    self.logger.log("TX", cmd_s)
+                if char_delay_s:
+                    for c in cmd_s:
+                        self._write(c.encode())
+                        time.sleep(char_delay_s)
+                    start = time.monotonic()    # Timeout and latency count from the write ending the line
+                    self._write(("\r\n").encode())
+                else:
+                    start = time.monotonic()    # Timeout and latency count from the write ending the line
+                    self._write(f"{cmd_s}\r\n".encode())
+                response = ATResponse(cmd_s).collect(waiter, timeout_s, start)
+                self.record(response, start)
+                return response
+            finally:
+                self.reader.end_command()
+
+    def send_payload(self, cmd_s:str, payload:Union[bytes, BinaryIO], prompt:str=None, terminator:bytes=b"",
+                     done:str=None, silence_s:float=0, chunk_size:int=PAYLOAD_CHUNK_BYTES,
+                     on_progress:Callable[[int, Optional[int]], None]=None,
+                     timeout_s:float=PAYLOAD_TIMEOUT_S) -> ATResponse:
+        """Streams a large payload to the modem in chunks and waits for the final result code
+
+        With a prompt, cmd_s is sent as a command line and the payload follows once the modem shows the
+        prompt (">" for AT+CMGS, "OK" for Serial LTE Modem data mode). Without one, cmd_s, the payload
+        and the terminator form a single long command line, e.g. a PEM inside the quotes of AT%CMNG.
+
+        Chunks are written back-to-back, each blocking until the driver accepts it, so with RTS/CTS or
+        XON/XOFF (see set_flow_control) the transfer runs at link speed without overrunning the modem.
+        Without flow control, stay within the modem's input buffer or use smaller chunks. The payload
+        itself is never logged, only its size.
+
+        Args:
+            cmd_s (str): The command, without line termination
+            payload (Union[bytes, BinaryIO]): The data, or a binary file opened for reading
+            prompt (str): Text the modem sends when it is ready for the payload; None to send at once
+            terminator (bytes): Written after the payload (e.g. b'"\r\n', b"\x1a" or b"+++")
+            done (str): Prefix of a status report that completes the transfer instead of a final result
+                code (e.g. "#XDATAMODE:"). The report is kept as the last line, and final is "OK" if its
+                value is 0, otherwise "ERROR".
+            silence_s (float): Pause before and after the terminator (Serial LTE Modem's "+++" guard time)
+            chunk_size (int): Bytes per write
+            on_progress (Callable[[int, Optional[int]], None]): Called with (bytes sent, total or None)
+                after every chunk, on the calling thread
+            timeout_s (float): Longest wait for the prompt, for a write blocked by flow control, and for
+                the final result code
+
+        Returns:
+            ATResponse: The response; timed_out is True if any of the waits above expired
+        """
+        if isinstance(payload, (bytes, bytearray, memoryview)):
+            total = len(payload)
+            payload = io.BytesIO(payload)
+        else:
+            try:
+                total = os.fstat(payload.fileno()).st_size - payload.tell()
+            except (OSError, AttributeError, io.UnsupportedOperation):
+                total = None
+        response = ATResponse(cmd_s)
+        with self.locked():
+            waiter = self.reader.begin_command(cmd_s)
+            write_timeout = self.device.write_timeout
+            self.device.write_timeout = timeout_s   # A write held back by flow control for longer fails
+            start = time.monotonic()
+            try:
+                if self.logger is not None:
+                    self.logger.log("TX", f"{cmd_s} <{total if total is not None else '?'} byte payload>")
+                recorder = self.recorder
+                if recorder is not None:
+                    # Tells a replay where the command ends and that the bytes up to the next command line are payload
+                    recorder.record(RECORD_COMMAND, json.dumps({"command": cmd_s, "prompt": prompt, "done": done}).encode())
+                if prompt is not None:
+                    self.reader.expect(prompt)
+                    self._write(f"{cmd_s}\r\n".encode(), RECORD_PAYLOAD)
+                    if not self._await_prompt(waiter, prompt, response, start + timeout_s):
+                        self.record(response, start)
+                        return response
+                else:
+                    self._write(cmd_s.encode(), RECORD_PAYLOAD)
+                sent = 0
+                chunk = memoryview(bytearray(chunk_size))
+                while True:
+                    n = payload.readinto(chunk)
+                    if not n:
+                        break
+                    self._write(chunk[:n], RECORD_PAYLOAD)
+                    sent += n
+                    if on_progress is not None:
+                        on_progress(sent, total)
+                if terminator:
+                    time.sleep(silence_s)
+                    self._write(terminator, RECORD_PAYLOAD)
+                    time.sleep(silence_s)
+                response.collect(waiter, timeout_s, time.monotonic(), done)
+                if done is not None:
+                    response.end_report(done)
+            except serial.SerialTimeoutException:
+                response.timed_out = True   # Flow control held the line for longer than timeout_s
+            finally:
+                self.device.write_timeout = write_timeout
+                self.reader.end_command()
+            self.record(response, start)
+            return response
+
+    def _write(self, data:Union[bytes, memoryview], direction:int=RECORD_TX) -> None:
+        """Writes to the port, counting (and recording, as RECORD_TX or RECORD_PAYLOAD) the bytes"""
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.record(direction, data)   # Before the write, so that the reply can never be recorded first
+        self.device.write(data)
+        self.stats.add_tx(len(data))
+
+    def start_recording(self, filename:str=None) -> str:
+        """Records every byte written and read from now on (see SessionRecorder), until stop_recording()
+
+        Args:
+            filename (str): Output path (default logs/session_<timestamp>.atrec)
+
+        Returns:
+            str: The recording's path
+        """
+        self.stop_recording()
+        if filename is None:
+            os.makedirs(LOG_DIR, exist_ok=True)
+            filename = os.path.join(LOG_DIR, f"session_{get_timestamp(filename_usable=True)}.atrec")
+        self.recorder = SessionRecorder(filename, {"port": self.device.port, "baudrate": self.device.baudrate})
+        if self.reader is not None:
+            self.reader.recorder = self.recorder
+        return filename
+
+    def stop_recording(self) -> None:
+        recorder, self.recorder = self.recorder, None
+        if recorder is not None:
+            if self.reader is not None:
+                self.reader.recorder = None
+            recorder.close()
+
+    def _await_prompt(self, waiter:queue.Queue, prompt:str, response:ATResponse, deadline:float) -> bool:
+        """Waits for send_payload()'s prompt, either as a line of its own or unterminated (PROMPT)
+
+        Returns:
+            bool: True once the prompt arrived; False on a final result code or timeout (response filled in)
+        """
+        while True:
+            try:
+                line = waiter.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                response.timed_out = True
+                return False
+            if line is PROMPT or line == prompt.strip():
+                self.reader.expect(None)
+                return True
+            if response.feed(line):
+                return False    # Refused with a final result code instead of the prompt
+
+    def write_credential(self, sec_tag:int, cred_type:int, content:Union[bytes, BinaryIO],
+                         on_progress:Callable[[int, Optional[int]], None]=None,
+                         timeout_s:float=PAYLOAD_TIMEOUT_S) -> ATResponse:
+        """Stores a credential (e.g. a PEM certificate) in the modem with AT%CMNG=0
+
+        Args:
+            sec_tag (int): Security tag
+            cred_type (int): 0 CA certificate, 1 client certificate, 2 client private key, 3 PSK, ...
+            content (Union[bytes, BinaryIO]): The credential, or a binary file holding it
+        """
+        return self.send_payload(f"AT%CMNG=0,{sec_tag},{cred_type},\"", content, terminator=b"\"\r\n",
+                                 on_progress=on_progress, timeout_s=timeout_s)
+
+    def send_data(self, payload:Union[bytes, BinaryIO], cmd_s:str="AT#XSEND",
+                  on_progress:Callable[[int, Optional[int]], None]=None,
+                  timeout_s:float=PAYLOAD_TIMEOUT_S) -> ATResponse:
+        """Sends a payload through Serial LTE Modem data mode (AT#XSEND, AT#XSENDTO, AT#XFTP=\"put\",...)
+
+        Returns:
+            ATResponse: final is "OK" once SLM reports "#XDATAMODE: 0"; the report itself is the last line
+        """
+        return self.send_payload(cmd_s, payload, prompt="OK", terminator=SLM_DATAMODE_TERMINATOR,
+                                 done="#XDATAMODE:", silence_s=SLM_DATAMODE_SILENCE_S, on_progress=on_progress,
+                                 timeout_s=timeout_s)
+
+    def record(self, response:ATResponse, start:float, commands:List[str]=None) -> Optional[List[ATResponse]]:
+        """Fills in the response's first-byte latency and adds it to the session stats
+
+        Args:
+            response (ATResponse): The reply to one command line
+            start (float): time.monotonic() at which the line was written
+            commands (List[str]): If the line joined several commands, those commands: the reply is
+                split (see split_response) and each part is counted under its own command
+
+        Returns:
+            Optional[List[ATResponse]]: The parts, if commands was given (None, and nothing counted,
+            if a joined line failed)
+        """
+        first_rx = self.reader.first_rx
+        if first_rx:
+            response.first_byte_s = first_rx.popleft() - start  # Replies of pipelined lines arrive in order
+        if commands is None:
+            self.stats.record_command(response)
+            return None
+        parts = split_response(commands, response)
+        for part in parts or []:    # A failed joined line is not counted: send_batch() retries its commands
+            self.stats.record_command(part)
+        return parts
+
+    def identify(self) -> str:
+        """Returns the modem's UUID (AT%XMODEMUUID), querying it once per connection
+
+        Returns:
+            str: The UUID, or "" if the modem did not report one
+        """
+        with self.locked():
+            if self.device_id is None:
+                response = self.send_command(MODEM_UUID_COMMAND)
+                self.device_id = ""
+                if response.ok and response.lines:
+                    self.device_id = response.lines[-1].split(":", 1)[-1].strip()
+                    self.cache.put(self.device.port, self.device_id, response)
+            return self.device_id
+
+    def cached_response(self, cmd:ATCommand) -> Optional[ATResponse]:
+        """Returns the cached response to a cacheable command without touching the port, if there is one"""
+        if not cmd.cacheable or self.device_id is None:
+            return None
+        return self.cache.get(self.device.port, self.device_id, cmd.cmd_s)
+
+    def query(self, cmd:ATCommand) -> ATResponse:
+        """Sends a command, answering cacheable commands from the cache when possible
+
+        Returns:
+            ATResponse: The response; cached is True if no round trip was made
+        """
+        if not cmd.cacheable:
+            return self.send_command(cmd.cmd_s, timeout_s=cmd.timeout_s)
+        with self.locked():
+            device_id = self.identify()
+            response = self.cache.get(self.device.port, device_id, cmd.cmd_s)
+            if response is None:
+                response = self.send_command(cmd.cmd_s, timeout_s=cmd.timeout_s)
+                self.cache.put(self.device.port, device_id, response, cmd.cache_ttl_s)
+            return response
+
+    def run_script(self, script:"ATScript", on_send:Callable[[str], None]=None,
+                   on_response:Callable[[ATResponse], None]=None) -> List[ATResponse]:
+        """Runs every line of a script, advancing as soon as each command completes
+
+        The command lock is held per command (or [GROUP]), not for the whole script, and never during
+        [WAIT]. Run from the command queue (submit()), more urgent queued work such as a manual query
+        runs between commands and during waits.
+
+        Args:
+            script (ATScript): A script whose commands have been extracted
+            on_send (Callable[[str], None]): Called with each command (or [WAIT] line) before it runs
+            on_response (Callable[[ATResponse], None]): Called with each command's response
+
+        Returns:
+            List[ATResponse]: One response per command, in order
+        """
+        responses = []
+        char_delay_s = script.delay_s if script.paced else 0
+        group: Optional[List[str]] = None   # Commands between [GROUP] and [ENDGROUP]
+        for cmd in script.commands:
+            if cmd == "[GROUP]":
+                group = []
+                continue
+            if cmd == "[ENDGROUP]":
+                cmds, group = group or [], None
+                self.yield_to_queued()
+                if char_delay_s:
+                    # Paced scripts target modems without flow control: never pipeline them
+                    with self.locked():
+                        batch = [self.send_command(c, timeout_s=script.timeout_s, char_delay_s=char_delay_s) for c in cmds]
+                else:
+                    batch = self.send_batch([ATCommand(c, timeout_s=script.timeout_s) for c in cmds])
+                for c, response in zip(cmds, batch):
+                    if on_send is not None:
+                        on_send(c)
+                    responses.append(response)
+                    if on_response is not None:
+                        on_response(response)
+                continue
+            if group is not None:
+                group.append(cmd)
+                continue
+            if on_send is not None:
+                on_send(cmd)
+            if "[WAIT]" in cmd:
+                self.sleep(int(cmd.split("[WAIT]")[1].strip()))
+                continue
+            self.yield_to_queued()
+            response = self.send_command(cmd, timeout_s=script.timeout_s, char_delay_s=char_delay_s)
+            responses.append(response)
+            if on_response is not None:
+                on_response(response)
+        return responses
+
+    def send_batch(self, commands:List[ATCommand], mode:str=BATCH_CONCAT) -> List[ATResponse]:
+        """Sends several commands in one round trip and splits the reply into one response per command
+
+        BATCH_PIPELINE writes every command line back-to-back in a single write and tells the replies
+        apart by their final result codes, so the modem never waits on the host between commands.
+        BATCH_CONCAT also joins consecutive read/test commands into one line ("AT+CEREG?;+CFUN?") and
+        splits that reply by response prefix; other commands are pipelined. If a concatenated line
+        fails, its commands are re-sent one per line so each gets its own final result code, before
+        any later line is written (each concatenated line therefore ends a write).
+
+        Cacheable commands are answered from the cache when possible, as in query(). Pipelining relies
+        on the modem buffering input while it executes the previous command, so use flow control on
+        modems that might drop characters.
+
+        Args:
+            commands (List[ATCommand]): The commands, in execution order
+            mode (str): BATCH_PIPELINE or BATCH_CONCAT
+
+        Returns:
+            List[ATResponse]: One response per command, in order
+        """
+        with self.locked():
+            device_id = self.identify() if any(cmd.cacheable for cmd in commands) else None
+            responses = [self.cached_response(cmd) for cmd in commands]
+            pending = [cmd for cmd, response in zip(commands, responses) if response is None]
+            units = batch_units(pending, mode)
+            sent = []
+            segment = []
+            for i, unit in enumerate(units):
+                segment.append(unit)
+                if len(unit) == 1 and i + 1 < len(units):
+                    continue
+                # A concatenated line ends the write: if it fails, its commands are retried one per line
+                # before any later line is sent, so the batch still runs in the given order
+                for unit, result in zip(segment, self._send_units(segment)):
+                    sent.extend(result if result is not None else
+                                [retried[0] for retried in self._send_units([[cmd] for cmd in unit])])
+                segment = []
+            sent = iter(sent)
+            for i, cmd in enumerate(commands):
+                if responses[i] is None:
+                    responses[i] = next(sent)
+                    if cmd.cacheable:
+                        self.cache.put(self.device.port, device_id, responses[i], cmd.cache_ttl_s)
+            return responses
+
+    def _send_units(self, units:List[List[ATCommand]]) -> List[Optional[List[ATResponse]]]:
+        """Writes one command line per unit in a single write, then collects each line's reply in turn
+
+        Returns:
+            List[Optional[List[ATResponse]]]: Per unit, one response per command, or None if a
+            concatenated line failed and could not be split
+        """
+        if not units:
+            return []
+        lines = [concat_commands([cmd.cmd_s for cmd in unit]) for unit in units]
+        waiter = self.reader.begin_command(*lines)
+        try:
+            if self.logger is not None:
+                for line in lines:
+                    self.logger.log("TX", line)
+            start = time.monotonic()    # The first line's latency counts from the write...
+            self._write("".join(f"{line}\r\n" for line in lines).encode())
+            results = []
+            timed_out = False
+            for unit, line in zip(units, lines):
+                response = ATResponse(line)
+                commands = [cmd.cmd_s for cmd in unit]
+                if timed_out:
+                    # Replies can no longer be attributed once one line has gone unanswered
+                    response.timed_out = True
+                    results.append(split_response(commands, response))
+                    continue
+                response.collect(waiter, max(cmd.timeout_s for cmd in unit), start)
+                results.append(self.record(response, start, commands))
+                timed_out = response.timed_out
+                if not timed_out and self.reader.final_rx:
+                    start = self.reader.final_rx.popleft()  # ...each later one's from the previous final result code
+            return results
+        finally:
+            self.reader.end_command()
+
+
+class SessionManager():
+    """Pool of ATSessions, one per port, for driving many modems in parallel
+
+    Each session has its own connection, reader and command queue (ATSession.submit), so work sent
+    to different devices runs concurrently while work for the same device stays in order.
+
+    Args:
+        baudrate (int): Default baud rate for sessions opened by the manager
+        log_dir (str): If set, each session logs to its own subdirectory of log_dir
+        flow_control (str): Flow control for sessions opened by the manager (see ATSession.set_flow_control)
+    """
+    def __init__(self, baudrate:int=DEFAULT_BAUD, log_dir:str=None, flow_control:str=FLOW_NONE) -> None:
+        self.baudrate = baudrate
+        self.log_dir = log_dir
+        self.flow_control = flow_control
+        self.sessions: Dict[str, ATSession] = {}
+
+    def __enter__(self) -> "SessionManager":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close_all()
+
+    def open(self, port:str, baudrate:int=None) -> ATSession:
+        """Opens (or returns the already open) session for a port
+
+        Raises:
+            serial.SerialException: If the port cannot be opened
+        """
+        session = self.sessions.get(port)
+        if session is None:
+            logger = None
+            if self.log_dir is not None:
+                logger = SessionLogger(directory=os.path.join(self.log_dir, re.sub(r"[^\w.-]", "_", port)))
+                logger.start()
+            session = ATSession(port, baudrate or self.baudrate, logger=logger, flow_control=self.flow_control)
+        if not session.is_open:
+            try:
+                session.open()
+            except Exception:
+                if port not in self.sessions and session.logger is not None:
+                    session.logger.stop()
+                raise
+        self.sessions[port] = session
+        return session
+
+    def open_all(self, ports:List[str]) -> Dict[str, Exception]:
+        """Opens a session for every port, in parallel
+
+        Returns:
+            Dict[str, Exception]: The error for each port that could not be opened
+        """
+        errors = {}
+        with ThreadPoolExecutor(max_workers=max(1, len(ports))) as pool:
+            futures = {port: pool.submit(self.open, port) for port in ports}
+        for port, future in futures.items():
+            if future.exception() is not None:
+                errors[port] = future.exception()
+        return errors
+
+    def get(self, port:str) -> Optional[ATSession]:
+        return self.sessions.get(port)
+
+    def close(self, port:str) -> None:
+        session = self.sessions.pop(port, None)
+        if session is not None:
+            session.close()
+            session.shutdown()
+            session.stop_recording()
+            if session.logger is not None:
+                session.logger.stop()
+
+    def close_all(self) -> None:
+        for port in list(self.sessions):
+            self.close(port)
+
+    def map(self, fn:Callable[[ATSession], Any], ports:List[str]=None) -> Dict[str, Future]:
+        """Queues fn(session) on every (or the given) open session
+
+        Returns:
+            Dict[str, Future]: The pending result for each port
+        """
+        ports = list(self.sessions) if ports is None else ports
+        return {port: self.sessions[port].submit(fn, self.sessions[port]) for port in ports}
+
+    def gather(self, futures:Dict[str, Future]) -> Dict[str, Union[Any, Exception]]:
+        """Waits for every future from map(); failed devices map to their exception"""
+        results = {}
+        for port, future in futures.items():
+            try:
+                results[port] = future.result()
+            except Exception as e:
+                results[port] = e
+        return results
+
+    def run_script(self, script:"ATScript", ports:List[str]=None) -> Dict[str, Union[List[ATResponse], Exception]]:
+        """Runs a script on every (or the given) open session concurrently
+
+        Returns:
+            Dict[str, Union[List[ATResponse], Exception]]: Responses (or the failure) per port
+        """
+        return self.gather(self.map(lambda session: session.run_script(script), ports))
+
+    def send_commands(self, commands:List[ATCommand], ports:List[str]=None) -> Dict[str, Union[List[ATResponse], Exception]]:
+        """Sends the same commands, in order, to every (or the given) open session concurrently
+
+        Returns:
+            Dict[str, Union[List[ATResponse], Exception]]: Responses (or the failure) per port
+        """
+        def send_all(session:ATSession) -> List[ATResponse]:
+            return [session.query(cmd) for cmd in commands]
+        return self.gather(self.map(send_all, ports))
+
+class LineStore():
+    """Indexed in-memory store of every logged line, for fast filtering of long sessions
+
+    Line texts are kept back to back in one bytearray (each followed by a newline) with an array of
+    start offsets, so substring and regex searches run over the whole buffer at C speed and hits are
+    mapped back to line numbers by bisection. Timestamps, directions and URC/response names are kept
+    in parallel arrays, with posting lists of line numbers per direction and per name.
+    """
+    def __init__(self) -> None:
+        self.lock = threading.Lock()    # Held while appending and while searching the buffer
+        self.data = bytearray()
+        self.offsets = array("Q")   # Start offset of each line in self.data
+        self.stamps = array("d")    # time.time() of each line
+        self.directions = bytearray()   # Index into DIRECTIONS of each line
+        self.name_ids = array("H")  # 1 + index into self.names of each line's "+NAME"; 0 for none
+        self.names: List[str] = []
+        self.name_index: Dict[str, int] = {}
+        self.postings: Dict[str, array] = {}    # Direction or name -> line numbers, ascending
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def append(self, direction:str, text:str, stamp:float=None) -> int:
+        """Adds a line and returns its line number
+
+        Args:
+            direction (str): One of DIRECTIONS
+            text (str): The line, without line termination
+            stamp (float): time.time() at which the line was sent or received; now if None
+        """
+        name = urc_name(text)
+        encoded = text.replace("\n", " ").encode("utf-8", errors="replace") + b"\n"
+        with self.lock:
+            n = len(self.offsets)
+            self.offsets.append(len(self.data))
+            self.data += encoded
+            self.stamps.append(time.time() if stamp is None else stamp)
+            self.directions.append(DIRECTIONS.index(direction) if direction in DIRECTIONS else DIRECTIONS.index("INFO"))
+            self.postings.setdefault(direction, array("I")).append(n)
+            if name is None:
+                self.name_ids.append(0)
+            else:
+                if name not in self.name_index:
+                    self.names.append(name)
+                    self.name_index[name] = len(self.names)
+                self.name_ids.append(self.name_index[name])
+                self.postings.setdefault(name, array("I")).append(n)
+            return n
+
+    def line(self, n:int) -> Tuple[float, str, str]:
+        """Returns (stamp, direction, text) of line n"""
+        with self.lock:
+            start = self.offsets[n]
+            end = self.offsets[n + 1] if n + 1 < len(self.offsets) else len(self.data)
+            return (self.stamps[n], DIRECTIONS[self.directions[n]], self.data[start:end - 1].decode("utf-8", errors="replace"))
+
+    def search(self, text:str="", direction:str=None, name:str=None, regex:bool=False,
+               start:int=0, stop:int=None, candidates:Collection[int]=None) -> array:
+        """Returns the numbers of the lines matching every given criterion, in ascending order
+
+        Args:
+            text (str): Substring (or regular expression, if regex) the line must contain; "" for any
+            direction (str): Only lines with this direction ("TX", "RX", "URC", "INFO")
+            name (str): Only lines whose name is this "+NAME"/"%NAME"/"#NAME" (e.g. "+CEREG")
+            regex (bool): Treat text as a regular expression (Python syntax), matched within one line
+            start (int): First line number to consider
+            stop (int): Line number to stop before; the current end of the store if None
+            candidates (Collection[int]): Only consider these lines (e.g. the matches of a broader filter)
+
+        Returns:
+            array: Matching line numbers
+
+        Raises:
+            re.error: If regex is True and text is not a valid expression
+        """
+        pattern = re.compile(text.encode("utf-8"), re.MULTILINE) if regex and text else None
+        needle = text.encode("utf-8") if text and not regex else None
+        matches = array("I")
+        with self.lock:
+            stop = len(self.offsets) if stop is None else min(stop, len(self.offsets))
+            if start >= stop:
+                return matches
+            dir_code = DIRECTIONS.index(direction) if direction in DIRECTIONS else None
+            name_id = self.name_index.get(name, -1) if name else None
+            if name_id == -1:
+                return matches
+
+            def keep(n:int) -> bool:
+                return ((dir_code is None or self.directions[n] == dir_code)
+                        and (name_id is None or self.name_ids[n] == name_id))
+
+            if candidates is not None or (needle is None and pattern is None):
+                if candidates is None:
+                    # No text: walk the shortest posting list instead of every line
+                    key = name if name else direction
+                    postings = self.postings.get(key) if key else None
+                    if postings is not None:
+                        candidates = postings[bisect.bisect_left(postings, start):bisect.bisect_left(postings, stop)]
+                    else:
+                        candidates = range(start, stop) if key is None else ()
+                for n in candidates:
+                    if start <= n < stop and keep(n) and self._contains(n, needle, pattern):
+                        matches.append(n)
+                return matches
+
+            end = self.offsets[stop] if stop < len(self.offsets) else len(self.data)
+            pos = self.offsets[start]
+            while pos < end:
+                if pattern is not None:
+                    hit = pattern.search(self.data, pos, end)
+                    found = hit.start() if hit else -1
+                else:
+                    found = self.data.find(needle, pos, end)
+                if found < 0:
+                    break
+                n = bisect.bisect_right(self.offsets, found, matches[-1] if matches else start) - 1
+                # A match running into the next line (e.g. through "\s") only counts if the line matches alone
+                if keep(n) and (pattern is None or b"\n" not in hit.group() or self._contains(n, None, pattern)):
+                    matches.append(n)
+                # Resume at the next line so each line is reported once
+                pos = self.offsets[n + 1] if n + 1 < len(self.offsets) else end
+            return matches
+
+    def _contains(self, n:int, needle:Optional[bytes], pattern:Optional[re.Pattern]) -> bool:
+        if needle is None and pattern is None:
+            return True
+        start = self.offsets[n]
+        end = (self.offsets[n + 1] if n + 1 < len(self.offsets) else len(self.data)) - 1   # Without the newline
+        if pattern is not None:
+            return pattern.search(self.data, start, end) is not None
+        return self.data.find(needle, start, end) >= 0
+
+class LineFilter():
+    """The lines of a LineStore matching one filter, kept up to date incrementally
+
+    update() only examines lines appended since the previous call, and narrow() derives a stricter
+    filter from this one's matches instead of rescanning the store.
+
+    Args:
+        store (LineStore): The store to filter
+        text (str): Substring or regular expression to match; "" for any
+        direction (str): Only lines with this direction; None for any
+        name (str): Only lines with this "+NAME"; None for any
+        regex (bool): Treat text as a regular expression
+    """
+    def __init__(self, store:LineStore, text:str="", direction:str=None, name:str=None, regex:bool=False) -> None:
+        self.store = store
+        self.text = text
+        self.direction = direction
+        self.name = name
+        self.regex = regex
+        self.matches = array("I")
+        self.scanned = 0    # Lines of the store already examined
+
+    def update(self) -> int:
+        """Examines newly appended lines and returns how many of them match"""
+        stop = len(self.store)
+        found = self.store.search(self.text, self.direction, self.name, self.regex, start=self.scanned, stop=stop)
+        self.matches.extend(found)
+        self.scanned = stop
+        return len(found)
+
+    def narrow(self, text:str="", direction:str=None, name:str=None, regex:bool=False) -> "LineFilter":
+        """Returns an up-to-date filter for new criteria, reusing this filter's matches when they are a superset"""
+        narrowed = LineFilter(self.store, text, direction, name, regex)
+        superset = (not self.regex and not regex and self.text in text
+                    and self.direction in (None, direction) and self.name in (None, name)
+                    and len(self.matches) * 8 < self.scanned)  # Otherwise the buffer scan is faster
+        if superset:
+            narrowed.matches = self.store.search(text, direction, name, regex, stop=self.scanned, candidates=self.matches)
+            narrowed.scanned = self.scanned
+        narrowed.update()
+        return narrowed
+
+class RawCapture():
+    """Captures a port's raw byte stream (e.g. the nRF91 modem trace UART) to a file
+
+    Bytes are read straight into a preallocated ring buffer (readinto on a memoryview, no per-line
+    decoding) by one thread and written from the ring to the capture file by another, so a slow disk
+    never stalls the port. If the ring fills up, the reader waits for the writer and the wait is
+    counted in stalls; bytes are only lost if the OS serial buffer overflows meanwhile.
+
+    Args:
+        port (str): Serial port name
+        baudrate (int): Serial baud rate (the nRF9160 DK trace UART runs at 1000000)
+        filename (str): Capture file, overwritten; one is created under LOG_DIR if None
+        ring_bytes (int): Size of the ring buffer
+    """
+    def __init__(self, port:str, baudrate:int=1000000, filename:str=None, ring_bytes:int=CAPTURE_RING_BYTES) -> None:
+        self.device = serial.Serial()
+        self.device.port = port
+        self.device.baudrate = baudrate
+        self.filename = filename or os.path.join(LOG_DIR, f"capture_{get_timestamp(filename_usable=True)}.bin")
+        self.ring = bytearray(ring_bytes)
+        self.view = memoryview(self.ring)
+        self.head = 0       # Total bytes read (write position is head % len(ring))
+        self.tail = 0       # Total bytes written to the file
+        self.stalls = 0     # Times the reader had to wait for the writer
+        self.started = 0.0
+        self.error: Optional[Exception] = None
+        self.file: Optional[BinaryIO] = None    # Opened by start()
+        self._cond = threading.Condition()
+        self._stop_event = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    @property
+    def running(self) -> bool:
+        return any(t.is_alive() for t in self._threads)
+
+    def start(self) -> None:
+        """Opens the port and the capture file and starts capturing
+
+        Raises:
+            serial.SerialException: If the port cannot be opened
+            OSError: If the capture file cannot be created
+        """
+        directory = os.path.dirname(self.filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.device.timeout = READ_TIMEOUT_S
+        self.device.open()
+        try:
+            self.file = open(self.filename, "wb", buffering=0)
+        except OSError:
+            self.device.close()
+            raise
+        self.started = time.monotonic()
+        self._threads = [threading.Thread(target=self._read_loop, daemon=True, name="RawCapture-read"),
+                         threading.Thread(target=self._write_loop, daemon=True, name="RawCapture-write")]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self) -> None:
+        """Stops reading, writes out everything captured so far and closes the port and file"""
+        self._stop_event.set()
+        with self._cond:
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        if self.device.is_open:
+            self.device.close()
+        if self.file is not None and not self.file.closed:
+            self.file.close()
+
+    def _readinto(self) -> Callable[[memoryview], Optional[int]]:
+        """Returns a function reading from the port directly into a buffer
+
+        On POSIX the port's descriptor is read with FileIO.readinto after select(), which fills the
+        ring in place; elsewhere pyserial's readinto is used.
+        """
+        try:
+            fd = self.device.fileno()
+        except (AttributeError, io.UnsupportedOperation, serial.SerialException):
+            return self.device.readinto
+        raw = io.FileIO(fd, "rb", closefd=False)
+        def readinto(buffer:memoryview) -> Optional[int]:
+            ready, _, _ = select.select([fd], [], [], READ_TIMEOUT_S)
+            return raw.readinto(buffer) if ready else 0
+        return readinto
+
+    def _read_loop(self) -> None:
+        readinto = self._readinto()
+        size = len(self.ring)
+        try:
+            while not self._stop_event.is_set():
+                with self._cond:
+                    while self.head - self.tail >= size and not self._stop_event.is_set():
+                        self.stalls += 1
+                        self._cond.wait(READ_TIMEOUT_S)
+                    free = size - (self.head - self.tail)
+                start = self.head % size
+                end = min(size, start + free, start + CAPTURE_READ_BYTES)
+                n = readinto(self.view[start:end])
+                if n:
+                    with self._cond:
+                        self.head += n
+                        self._cond.notify_all()
+        except (serial.SerialException, OSError, ValueError, TypeError) as e:
+            if not self._stop_event.is_set():
+                self.error = e
+                print(f"Raw capture stopped: {e}")
+        finally:
+            self._stop_event.set()
+            with self._cond:
+                self._cond.notify_all()
+
+    def _write_loop(self) -> None:
+        size = len(self.ring)
+        try:
+            while True:
+                with self._cond:
+                    while self.head == self.tail and not self._stop_event.is_set():
+                        self._cond.wait(READ_TIMEOUT_S)
+                    head = self.head
+                    if head == self.tail and self._stop_event.is_set():
+                        break
+                start = self.tail % size
+                end = min(size, start + (head - self.tail))
+                # The file is unbuffered, so a write may take only part of the slice: the rest goes next time round
+                written = self.file.write(self.view[start:end]) or 0
+                with self._cond:
+                    self.tail += written
+                    self._cond.notify_all()
+        except (OSError, ValueError) as e:
+            self.error = e
+            print(f"Raw capture stopped: {e}")
+            self._stop_event.set()  # Nothing drains the ring any more, so the reader must not wait for room
+            with self._cond:
+                self._cond.notify_all()
+
+    def snapshot(self, n:int=256) -> Tuple[int, bytes]:
+        """Returns (offset, data) for the most recent n captured bytes, e.g. for a hex view"""
+        size = len(self.ring)
+        with self._cond:
+            head = self.head
+            n = min(n, head, size)
+        start = head - n
+        first = start % size
+        data = bytes(self.view[first:first + n]) if first + n <= size else bytes(self.view[first:]) + bytes(self.view[:first + n - size])
+        return start, data
+
+    def stats(self) -> Dict[str, float]:
+        elapsed = max(time.monotonic() - self.started, 1e-9) if self.started else 0
+        return {
+            "bytes": self.head,
+            "written": self.tail,
+            "buffered": self.head - self.tail,
+            "bytes_per_s": self.head / elapsed if elapsed else 0.0,
+            "stalls": self.stalls,
+        }
+
+class SessionRecorder():
+    """Appends a session's raw TX/RX chunks, with monotonic timestamps, to a compact indexed binary file
+
+    Layout: RECORD_MAGIC, a length-prefixed JSON description (port, baud rate, wall-clock start), then
+    one RECORD_HEADER (seconds since start, direction, length) plus the raw bytes per chunk.
+    close() appends an index of (time, offset) pairs taken every RECORD_INDEX_INTERVAL_S and a
+    RECORD_TRAILER, so a Recording can seek into a multi-hour trace without reading all of it. Chunks
+    are flushed to disk within RECORD_FLUSH_INTERVAL_S, so a file cut short by a crash is still readable
+    up to about then: its index is rebuilt by scanning.
+
+    Args:
+        filename (str): Output path
+        meta (dict): Extra JSON-serializable description stored in the header
+    """
+    def __init__(self, filename:str, meta:dict=None) -> None:
+        self.filename = filename
+        self.started = time.monotonic()
+        self.lock = threading.Lock()    # Chunks arrive from the reader thread and the command thread
+        self.records = 0
+        self.duration_s = 0.0
+        self.index_t = array("d")
+        self.index_offset = array("Q")
+        self._next_index = 0.0
+        self._flush_timer: Optional[threading.Timer] = None
+        header = json.dumps({**(meta or {}), "started": time.time()}).encode()
+        self.file = open(filename, "wb", buffering=RECORD_BUFFER_BYTES)
+        self.file.write(RECORD_MAGIC + struct.pack("<I", len(header)) + header)
+        self.offset = len(RECORD_MAGIC) + 4 + len(header)
+
+    def record(self, direction:int, data:Union[bytes, memoryview]) -> None:
+        """Appends one chunk; chunks longer than 65535 bytes are split"""
+        if not data:
+            return
+        view = memoryview(data)
+        with self.lock:
+            if self.file is None:
+                return
+            t = time.monotonic() - self.started
+            if t >= self._next_index:
+                self.index_t.append(t)
+                self.index_offset.append(self.offset)
+                self._next_index = t + RECORD_INDEX_INTERVAL_S
+            for i in range(0, len(view), 0xFFFF):
+                part = view[i:i + 0xFFFF]
+                self.file.write(RECORD_HEADER.pack(t, direction, len(part)))
+                self.file.write(part)
+                self.offset += RECORD_HEADER.size + len(part)
+            self.records += 1
+            self.duration_s = t
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(RECORD_FLUSH_INTERVAL_S, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def flush(self) -> None:
+        """Writes buffered chunks to disk (called by a timer at most RECORD_FLUSH_INTERVAL_S after a chunk)"""
+        with self.lock:
+            self._flush_timer = None
+            if self.file is not None:
+                self.file.flush()
+
+    def close(self) -> None:
+        """Writes the index and trailer and closes the file"""
+        with self.lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if self.file is None:
+                return
+            for t, offset in zip(self.index_t, self.index_offset):
+                self.file.write(RECORD_INDEX.pack(t, offset))
+            self.file.write(RECORD_TRAILER.pack(self.offset, len(self.index_t), self.duration_s, RECORD_INDEX_MAGIC))
+            self.file.close()
+            self.file = None
+
+class Recording():
+    """Reads a file written by SessionRecorder
+
+    Args:
+        filename (str): The recording
+
+    Raises:
+        ValueError: If the file is not a session recording
+    """
+    def __init__(self, filename:str) -> None:
+        self.filename = filename
+        self.index_t = array("d")
+        self.index_offset = array("Q")
+        with open(filename, "rb") as f:
+            if f.read(len(RECORD_MAGIC)) != RECORD_MAGIC:
+                raise ValueError(f"{filename} is not a session recording")
+            (length,) = struct.unpack("<I", f.read(4))
+            self.meta: dict = json.loads(f.read(length))
+            self.data_start = len(RECORD_MAGIC) + 4 + length
+            if not self._read_index(f):
+                self._scan(f)
+
+    def _read_index(self, f) -> bool:
+        size = f.seek(0, os.SEEK_END)
+        if size - self.data_start < RECORD_TRAILER.size:
+            return False
+        f.seek(size - RECORD_TRAILER.size)
+        index_offset, count, duration_s, magic = RECORD_TRAILER.unpack(f.read(RECORD_TRAILER.size))
+        if magic != RECORD_INDEX_MAGIC or index_offset + count * RECORD_INDEX.size + RECORD_TRAILER.size != size:
+            return False
+        f.seek(index_offset)
+        for t, offset in RECORD_INDEX.iter_unpack(f.read(count * RECORD_INDEX.size)):
+            self.index_t.append(t)
+            self.index_offset.append(offset)
+        self.data_end = index_offset
+        self.duration_s = duration_s
+        return True
+
+    def _scan(self, f) -> None:
+        """Rebuilds the index of a recording that was never closed, up to its last complete chunk"""
+        f.seek(self.data_start)
+        offset = self.data_start
+        next_index = 0.0
+        t = 0.0
+        while True:
+            header = f.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                break
+            chunk_t, _, length = RECORD_HEADER.unpack(header)
+            if len(f.read(length)) < length:
+                break
+            t = chunk_t
+            if t >= next_index:
+                self.index_t.append(t)
+                self.index_offset.append(offset)
+                next_index = t + RECORD_INDEX_INTERVAL_S
+            offset += RECORD_HEADER.size + length
+        self.data_end = offset
+        self.duration_s = t
+
+    def records(self, start_s:float=0.0) -> Iterator[Tuple[float, int, bytes]]:
+        """Yields (seconds since start, direction (RECORD_TX, RECORD_RX, ...), data) for every chunk from start_s on"""
+        i = bisect.bisect_right(self.index_t, start_s) - 1
+        offset = self.index_offset[i] if i >= 0 else self.data_start
+        with open(self.filename, "rb", buffering=RECORD_BUFFER_BYTES) as f:
+            f.seek(offset)
+            while offset < self.data_end:
+                t, direction, length = RECORD_HEADER.unpack(f.read(RECORD_HEADER.size))
+                data = f.read(length)
+                offset += RECORD_HEADER.size + length
+                if t >= start_s:
+                    yield t, direction, data
+
+class ReplayDevice():
+    """Stands in for serial.Serial under a SerialReader, returning a Recording's RX chunks on schedule
+
+    Every other chunk is handed to on_tx (on the reader's thread) at its place in the stream. A read
+    returns one whole recorded chunk whatever size is asked for, or b"" after at most READ_TIMEOUT_S so
+    that the reader can be stopped; finished is set once every chunk has been returned.
+
+    Args:
+        recording (Recording): The recording to play
+        speed (float): Playback speed relative to the recording (1 = real time); None or 0 for as fast as possible
+        start_s (float): Recorded time to start from
+        on_tx (Callable[[float, int, bytes], None]): Called with (recorded time, direction, data) for every
+            chunk that was written rather than received (RECORD_TX, RECORD_PAYLOAD, RECORD_COMMAND)
+    """
+    def __init__(self, recording:Recording, speed:Optional[float]=1.0, start_s:float=0.0,
+                 on_tx:Callable[[float, int, bytes], None]=None) -> None:
+        self.records = recording.records(start_s)
+        self.speed = speed
+        self.on_tx = on_tx
+        self.now = start_s      # Recorded time of the last chunk played
+        self.in_waiting = 0
+        self.is_open = True
+        self.finished = threading.Event()
+        self._next: Optional[Tuple[float, int, bytes]] = None
+        self._origin: Optional[Tuple[float, float]] = None  # (time.monotonic(), recorded time) of the first chunk
+
+    def read(self, size:int=1) -> bytes:
+        while self.is_open:
+            if self._next is None:
+                self._next = next(self.records, None)
+                if self._next is None:
+                    self.finished.set()
+                    time.sleep(READ_TIMEOUT_S)
+                    return b""
+            t, direction, data = self._next
+            if self.speed:
+                if self._origin is None:
+                    self._origin = (time.monotonic(), t)
+                wait = self._origin[0] + (t - self._origin[1]) / self.speed - time.monotonic()
+                if wait > 0:
+                    time.sleep(min(wait, READ_TIMEOUT_S))
+                    if wait > READ_TIMEOUT_S:
+                        return b""
+            self._next = None
+            self.now = t
+            if direction == RECORD_RX:
+                return data
+            if self.on_tx is not None:
+                self.on_tx(t, direction, data)
+        return b""
+
+    def close(self) -> None:
+        self.is_open = False
+
+class Replay():
+    """Plays a recording back through a session's response parser, URC dispatcher, subscribers and logger
+
+    A SerialReader runs on a ReplayDevice, so received lines take the same path as in a live session:
+    URC handlers fire, subscribers (e.g. the GUI monitor), the session log and the signal history (with
+    the recorded timestamps) see every line, and the reply to each recorded command is parsed into an
+    ATResponse, counted in the session stats with its recorded latency and passed to on_response.
+    As in send_batch(), the reply to a joined line is split into one response per command. Payloads
+    (RECORD_PAYLOAD) are skipped, and commands still unanswered when the next one was written count
+    as timed out. Nothing is ever written to the session's port.
+
+    Args:
+        session (ATSession): Supplies the URC dispatcher, subscribers, logger and stats
+        recording (Union[str, Recording]): The recording, or its path
+        speed (float): 1 for real time, N for N times faster, None or 0 for as fast as possible
+        on_tx (Callable[[str], None]): Called with each recorded command line
+        on_response (Callable[[ATResponse], None]): Called with each parsed response
+    """
+    def __init__(self, session:"ATSession", recording:Union[str, Recording], speed:Optional[float]=1.0,
+                 on_tx:Callable[[str], None]=None, on_response:Callable[[ATResponse], None]=None) -> None:
+        self.session = session
+        self.recording = recording if isinstance(recording, Recording) else Recording(recording)
+        self.speed = speed
+        self.on_tx = on_tx
+        self.on_response = on_response
+        self.device: Optional[ReplayDevice] = None
+        self.reader: Optional[SerialReader] = None
+        self.responses = 0
+        self._tx = bytearray()  # Recorded TX bytes not yet forming a complete line
+        self._pending: deque = deque()  # [ATResponse, commands, start, prompt, done] per line awaiting its final result code
+
+    @property
+    def position_s(self) -> float:
+        return self.device.now if self.device is not None else 0.0
+
+    def start(self, start_s:float=0.0) -> None:
+        self.device = ReplayDevice(self.recording, self.speed, start_s, on_tx=self._on_tx)
+        self.reader = SerialReader(self.device, self.session.urc_dispatcher, self.session.stats)
+        for callback in self.session.subscribers:
+            self.reader.subscribe(callback)
+        if self.session.logger is not None:
+            self.reader.subscribe(self.session.logger.log_rx)
+        self.reader.subscribe(self._on_signal)
+        self.reader.subscribe(self._on_line)
+        self.reader.start()
+
+    def wait(self, timeout_s:float=None) -> bool:
+        """Waits for the end of the recording, then stops; returns False if still playing after timeout_s"""
+        if not self.device.finished.wait(timeout_s):
+            return False
+        self.stop()
+        return True
+
+    def stop(self) -> None:
+        if self.device is not None:
+            self.device.close()
+        if self.reader is not None:
+            self.reader.stop()
+
+    def _on_tx(self, t:float, direction:int, data:bytes) -> None:
+        if direction == RECORD_PAYLOAD:
+            return
+        if direction == RECORD_COMMAND:
+            try:
+                spec = json.loads(data)
+            except ValueError as e:
+                print(f"ERROR: {e}\r\nAttempting to continue...\r\n")
+                return
+            self._begin(t, [spec["command"]], spec.get("prompt"), spec.get("done"))
+            return
+        self._tx.extend(data)
+        lines = []
+        while True:
+            end = min((i for i in (self._tx.find(b"\r"), self._tx.find(b"\n")) if i >= 0), default=-1)
+            if end < 0:
+                break
+            line = self._tx[:end].decode("utf-8", errors="replace").strip()
+            del self._tx[:end + 1]
+            if line:
+                lines.append(line)
+        if lines:
+            self._begin(t, lines)
+
+    def _begin(self, t:float, lines:List[str], prompt:str=None, done:str=None) -> None:
+        # Commands are only written once the previous ones are answered (pipelined lines go in one
+        # write), so lines still waiting now never got their final result code: they timed out
+        while self._pending:
+            response, commands, *_ = self._pending.popleft()
+            response.timed_out = True
+            self._finish(response, commands)
+        self.reader.begin_command(*lines)
+        if prompt is not None:
+            self.reader.expect(prompt)
+        for line in lines:
+            if self.session.logger is not None:
+                self.session.logger.log("TX", line)
+            if self.on_tx is not None:
+                self.on_tx(line)
+            self._pending.append([ATResponse(line), split_commands(line), t, prompt, done])
+
+    def _finish(self, response:ATResponse, commands:List[str]) -> None:
+        # Like ATSession.record(): a joined line is counted per command, and a failed one not at all
+        # (send_batch() re-sent its commands one per line, and those lines follow in the recording)
+        for part in split_response(commands, response) or []:
+            self.session.stats.record_command(part)
+            self.responses += 1
+            if self.on_response is not None:
+                self.on_response(part)
+
+    def _on_signal(self, line:str, solicited:bool) -> None:
+        # Like SignalHistory.on_line, but stamped with the time the line was originally received
+        if line.startswith(SIGNAL_PREFIXES):
+            sample = parse_signal(line)
+            if sample:
+                self.session.signal.add(sample, self.recording.meta.get("started", 0) + self.device.now)
+
+    def _on_line(self, line:str, solicited:bool) -> None:
+        if not solicited or not self._pending:
+            return
+        entry = self._pending[0]
+        response, commands, start, prompt, done = entry
+        now = self.device.now
+        if response.first_byte_s is None:
+            response.first_byte_s = now - start
+        if prompt is not None and line == prompt.strip():
+            entry[3] = None     # send_payload()'s prompt, not the final result code
+            self.reader.expect(None)
+            return
+        if done is not None and line.startswith(done):
+            response.final = line
+            response.final_stamp = get_timestamp()
+            response.end_report(done)
+        elif not response.feed(line):
+            return
+        self._pending.popleft()
+        response.latency_s = now - start
+        if self._pending:
+            self._pending[0][2] = max(self._pending[0][2], now)     # A pipelined line's reply follows this one
+        self._finish(response, commands)
+        if not self._pending:
+            self.reader.end_command()
+
+class BridgeClient():
+    """One connection to a SessionBridge: its socket, unsent output and commands still queued"""
+    def __init__(self, sock:socket.socket, name:str) -> None:
+        self.sock = sock
+        self.name = name    # "127.0.0.1:50712", or "unix" for Unix socket clients
+        self.out = bytearray()  # Received lines not yet sent to the client, at most the bridge's buffer_bytes
+        self.inbuf = bytearray()    # Command bytes not yet forming a complete line
+        self.events = 0     # Selector events currently registered
+        self.pending = 0    # Commands queued on the session and not yet answered
+        self.skipped = 0    # Lines not forwarded since the buffer filled (BRIDGE_SLOW_SKIP)
+        self.closing: Optional[str] = None  # Reason to disconnect, set by any thread
+
+class SessionBridge(threading.Thread):
+    """Shares one open session with local clients over TCP (or a Unix socket)
+
+    Every line the session receives (responses and URCs alike, whoever sent the command) is forwarded
+    to every client. Each complete line a client sends is queued as a command on the session's command
+    queue (see ATSession.submit), so clients, the GUI, scripts and polls never interleave on the port.
+
+    The reader thread only appends to a client's bounded output buffer and never waits on a socket: all
+    socket I/O runs on the bridge's own thread. A client whose buffer is full is disconnected
+    (BRIDGE_SLOW_DISCONNECT) or misses lines until it catches up (BRIDGE_SLOW_SKIP), and a client with
+    BRIDGE_MAX_PENDING commands queued is not read from until some are answered.
+
+    Args:
+        session (ATSession): The session to share
+        address (str): "host:port" (e.g. "127.0.0.1:7700"), a port number, or "unix:/path/to/socket"
+        policy (str): BRIDGE_SLOW_DISCONNECT or BRIDGE_SLOW_SKIP
+        buffer_bytes (int): Output buffered per client
+        on_command (Callable[[str, ATResponse], None]): Called with (client name, response) for every
+            client command, on the command queue's thread
+        on_client (Callable[[str, str], None]): Called with (client name, event) when a client
+            connects ("connected") or leaves (the reason), on the bridge's thread
+    """
+    def __init__(self, session:"ATSession", address:str=f"{BRIDGE_HOST}:{BRIDGE_PORT}",
+                 policy:str=BRIDGE_SLOW_DISCONNECT, buffer_bytes:int=BRIDGE_CLIENT_BUFFER_BYTES,
+                 on_command:Callable[[str, ATResponse], None]=None, on_client:Callable[[str, str], None]=None) -> None:
+        super().__init__(daemon=True)
+        if policy not in (BRIDGE_SLOW_DISCONNECT, BRIDGE_SLOW_SKIP):
+            raise ValueError(f"Unknown slow client policy \"{policy}\"")
+        self.session = session
+        self.address = str(address)
+        self.policy = policy
+        self.buffer_bytes = buffer_bytes
+        self.on_command = on_command
+        self.on_client = on_client
+        self.clients: Dict[socket.socket, BridgeClient] = {}
+        self.disconnected = 0   # Clients dropped for falling behind
+        self.lock = threading.Lock()    # Guards client buffers, shared by the reader and bridge threads
+        self.selector = selectors.DefaultSelector()
+        self.server: Optional[socket.socket] = None
+        self._wake_r, self._wake_w = socket.socketpair()    # Wakes the bridge thread when output is queued
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        self._wake_pending = False
+        self._stop_event = threading.Event()
+
+    def start(self) -> None:
+        """Starts listening, then serving clients on the bridge's thread
+
+        Raises:
+            OSError: If the address cannot be bound
+            ValueError: If the address is malformed
+        """
+        if self.address.startswith("unix:"):
+            path = self.address[len("unix:"):]
+            if not hasattr(socket, "AF_UNIX"):
+                raise ValueError("Unix sockets are not available on this platform")
+            if os.path.exists(path):
+                os.remove(path)     # A socket file left over from a previous run
+            self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.server.bind(path)
+        else:
+            host, _, port = self.address.rpartition(":")
+            self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.server.bind((host or BRIDGE_HOST, int(port)))
+        self.server.listen()
+        self.server.setblocking(False)
+        if not self.address.startswith("unix:"):
+            self.address = "{}:{}".format(*self.server.getsockname()[:2])   # Resolves port 0
+        self.selector.register(self.server, selectors.EVENT_READ)
+        self.selector.register(self._wake_r, selectors.EVENT_READ)
+        self.session.subscribe(self._on_line)
+        super().start()
+
+    def stop(self) -> None:
+        self.session.unsubscribe(self._on_line)
+        self._stop_event.set()
+        self._wake()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout=2)
+
+    def _on_line(self, line:str, solicited:bool) -> None:
+        # Runs on the reader thread: queue the line for every client, never block
+        data = f"{line}\r\n".encode("utf-8", errors="replace")
+        with self.lock:
+            for client in self.clients.values():
+                if client.closing is not None:
+                    continue
+                if len(client.out) + len(data) > self.buffer_bytes:
+                    if self.policy == BRIDGE_SLOW_DISCONNECT:
+                        client.closing = f"too slow ({len(client.out)} bytes unsent)"
+                    else:
+                        client.skipped += 1
+                    continue
+                if client.skipped:
+                    client.out += f"[bridge] {client.skipped} lines skipped\r\n".encode()
+                    client.skipped = 0
+                client.out += data
+            if self._wake_pending or not self.clients:
+                return
+            self._wake_pending = True
+        self._wake()
+
+    def _wake(self) -> None:
+        try:
+            self._wake_w.send(b"\0")
+        except (BlockingIOError, OSError):
+            pass    # Already awake (full) or shutting down
+
+    def run(self) -> None:
+        try:
+            while not self._stop_event.is_set():
+                for key, events in self.selector.select(timeout=READ_TIMEOUT_S):
+                    if key.fileobj is self.server:
+                        self._accept()
+                    elif key.fileobj is self._wake_r:
+                        try:
+                            while self._wake_r.recv(4096):
+                                pass
+                        except (BlockingIOError, OSError):
+                            pass
+                    else:
+                        client = self.clients.get(key.fileobj)
+                        if client is not None and events & selectors.EVENT_READ:
+                            self._read(client)
+                with self.lock:
+                    self._wake_pending = False
+                for client in list(self.clients.values()):
+                    self._flush(client)
+        except Exception as e:
+            print(f"ERROR: {e}\r\nAttempting to continue...\r\n")
+        finally:
+            for client in list(self.clients.values()):
+                self._drop(client, "bridge stopped")
+            self.selector.close()
+            self.server.close()
+            if self.address.startswith("unix:"):
+                try:
+                    os.remove(self.address[len("unix:"):])
+                except OSError:
+                    pass
+            self._wake_r.close()
+            self._wake_w.close()
+
+    def _accept(self) -> None:
+        try:
+            sock, peer = self.server.accept()
+        except (BlockingIOError, OSError):
+            return
+        if len(self.clients) >= BRIDGE_MAX_CLIENTS:
+            sock.close()
+            return
+        sock.setblocking(False)
+        name = f"{peer[0]}:{peer[1]}" if isinstance(peer, tuple) else "unix"
+        client = BridgeClient(sock, name)
+        with self.lock:
+            self.clients[sock] = client
+        self._update(client)
+        self._notify(name, "connected")
+
+    def _read(self, client:BridgeClient) -> None:
+        try:
+            data = client.sock.recv(4096)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as e:
+            client.closing = str(e)
+            return
+        if not data:
+            client.closing = "disconnected"
+            return
+        client.inbuf += data
+        while True:
+            end = min((i for i in (client.inbuf.find(b"\r"), client.inbuf.find(b"\n")) if i >= 0), default=-1)
+            if end < 0:
+                break
+            line = client.inbuf[:end].decode("utf-8", errors="replace").strip()
+            del client.inbuf[:end + 1]
+            if line:
+                with self.lock:     # pending is decremented on the command queue's thread, see _done()
+                    client.pending += 1
+                try:
+                    future = self.session.submit(self._send, client, line)
+                except RuntimeError as e:   # The session's command queue has been shut down
+                    with self.lock:
+                        client.pending -= 1
+                    client.closing = str(e)
+                    return
+                future.add_done_callback(lambda f, client=client: self._done(client))
+        if len(client.inbuf) > BRIDGE_MAX_LINE:
+            client.closing = f"line longer than {BRIDGE_MAX_LINE} bytes"
+
+    def _send(self, client:BridgeClient, cmd_s:str) -> ATResponse:
+        # Runs on the session's command queue
+        if not self.session.is_open:
+            response = ATResponse(cmd_s)
+            response.feed("ERROR")
+            with self.lock:
+                client.out += b"ERROR\r\n"  # Nothing reaches the port; only the sender is told
+            self._wake()
+        else:
+            response = self.session.send_command(cmd_s)
+        if self.on_command is not None:
+            try:
+                self.on_command(client.name, response)
+            except Exception as e:
+                print(f"ERROR: {e}\r\nAttempting to continue...\r\n")
+        return response
+
+    def _done(self, client:BridgeClient) -> None:
+        with self.lock:
+            client.pending -= 1
+        self._wake()    # It may be read from again (see BRIDGE_MAX_PENDING)
+
+    def _flush(self, client:BridgeClient) -> None:
+        """Sends what the socket accepts without blocking, then closes the client if it has to go"""
+        if client.closing is not None:
+            self._drop(client, client.closing)
+            return
+        with self.lock:
+            if client.out:
+                try:
+                    sent = client.sock.send(client.out)
+                    del client.out[:sent]
+                except (BlockingIOError, InterruptedError):
+                    pass
+                except OSError as e:
+                    client.closing = str(e)
+        if client.closing is not None:
+            self._drop(client, client.closing)
+            return
+        self._update(client)
+
+    def _update(self, client:BridgeClient) -> None:
+        """Registers for reads unless the client has too many commands queued, and for writes while output is pending"""
+        with self.lock:
+            events = (selectors.EVENT_READ if client.pending < BRIDGE_MAX_PENDING else 0) \
+                   | (selectors.EVENT_WRITE if client.out else 0)
+        if events == client.events:
+            return
+        if not client.events:
+            self.selector.register(client.sock, events)
+        elif not events:
+            self.selector.unregister(client.sock)
+        else:
+            self.selector.modify(client.sock, events)
+        client.events = events
+
+    def _drop(self, client:BridgeClient, reason:str) -> None:
+        with self.lock:
+            self.clients.pop(client.sock, None)
+        if client.events:
+            self.selector.unregister(client.sock)
+            client.events = 0
+        client.sock.close()
+        if reason.startswith("too slow"):
+            self.disconnected += 1
+        self._notify(client.name, reason)
+
+    def _notify(self, name:str, event:str) -> None:
+        if self.on_client is not None:
+            try:
+                self.on_client(name, event)
+            except Exception as e:
+                print(f"ERROR: {e}\r\nAttempting to continue...\r\n")
+
+class PortWatcher(threading.Thread):
+    """Background serial port enumerator that caches the port list and reports hotplug events
+
+    Enumeration (which can take hundreds of milliseconds on some systems) only ever runs on this
+    thread; readers use the cached list. Subscribers are called from this thread after every poll
+    with the ports added and removed since the previous one (usually both empty).
+
+    Args:
+        interval_s (float): Time between enumerations
+    """
+    def __init__(self, interval_s:float=PORT_POLL_INTERVAL_S) -> None:
+        super().__init__(daemon=True)
+        self.interval_s = interval_s
+        self.ports: Dict[str, Any] = {}     # Device name -> ListPortInfo, as of the last poll
+        self.subscribers: List[Callable[[List[Any], List[Any]], None]] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+
+    def subscribe(self, callback:Callable[[List[Any], List[Any]], None]) -> None:
+        """Registers a callback receiving (added, removed) lists of ListPortInfo after every poll"""
+        with self._lock:
+            self.subscribers.append(callback)
+
+    def list(self) -> List[str]:
+        """Returns the cached device names, sorted"""
+        with self._lock:
+            return sorted(self.ports)
+
+    def serial_number(self, device:str) -> Optional[str]:
+        """Returns the USB serial number of a cached port, if it has one"""
+        with self._lock:
+            info = self.ports.get(device)
+        return getattr(info, "serial_number", None) if info is not None else None
+
+    def find(self, key:str) -> Optional[str]:
+        """Returns the device name of the cached port with this USB serial number (or name), if present"""
+        with self._lock:
+            if key in self.ports:
+                return key
+            for device, info in self.ports.items():
+                if info.serial_number == key:
+                    return device
+        return None
+
+    def poll(self) -> Tuple[List[Any], List[Any]]:
+        """Enumerates ports now, updates the cache and notifies subscribers
+
+        Returns:
+            Tuple[List[Any], List[Any]]: The ports added and removed since the previous poll
+        """
+        current = {info.device: info for info in serial.tools.list_ports.comports()}
+        with self._lock:
+            previous = self.ports
+            self.ports = current
+            subscribers = list(self.subscribers)
+        added = [info for device, info in current.items() if device not in previous]
+        removed = [info for device, info in previous.items() if device not in current]
+        for callback in subscribers:
+            try:
+                callback(added, removed)
+            except Exception as e:
+                print(f"ERROR: {e}\r\nAttempting to continue...\r\n")
+        return added, removed
+
+    def wake(self) -> None:
+        """Requests an immediate poll (e.g. from a refresh button)"""
+        self._wake.set()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self._wake.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout=self.interval_s + 2)
+
+    def run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"ERROR: {e}\r\nAttempting to continue...\r\n")
+            self._wake.wait(self.interval_s)
+            self._wake.clear()
+
+class AutoReconnect():
+    """Reopens a session when its device comes back after a reset or re-enumeration
+
+    The device is identified by its USB serial number (or by its name for ports without one), so it
+    is found again even if it re-enumerates under a different name. Call remember() after the user
+    opens the session and forget() when they close it; only sessions the user left open are
+    reconnected.
+
+    Args:
+        session (ATSession): The session to keep connected
+        watcher (PortWatcher): Source of hotplug events
+        on_event (Callable[[str, str], None]): Optional callback receiving ("lost"|"reconnected", port)
+    """
+    def __init__(self, session:"ATSession", watcher:PortWatcher, on_event:Callable[[str, str], None]=None) -> None:
+        self.session = session
+        self.watcher = watcher
+        self.on_event = on_event
+        self.enabled = True
+        self.key: Optional[str] = None  # Serial number (or device name) of the device to keep connected
+        self.lost = False
+        watcher.subscribe(self.on_ports)
+
+    def remember(self) -> None:
+        port = self.session.device.port
+        self.key = self.watcher.serial_number(port) or port
+        self.lost = False
+
+    def forget(self) -> None:
+        self.key = None
+        self.lost = False
+
+    def on_ports(self, added:List[Any], removed:List[Any]) -> None:
+        """PortWatcher subscriber: closes the session when its device disappears and reopens it when it returns"""
+        if self.key is None or not self.enabled:
+            return
+        session = self.session
+        reader_died = session.reader is not None and not session.reader.is_alive()
+        if session.is_open and (reader_died or any(info.device == session.device.port for info in removed)):
+            try:
+                with session.locked():
+                    session.close()
+            except (serial.SerialException, OSError):
+                pass    # The device is already gone
+            self.lost = True
+            if self.on_event is not None:
+                self.on_event("lost", session.device.port)
+        if self.lost and not session.is_open:
+            port = self.watcher.find(self.key)
+            if port is None:
+                return
+            try:
+                with session.locked():
+                    session.open(port)
+            except (serial.SerialException, OSError):
+                return  # Not ready yet (e.g. still enumerating); retried on the next poll
+            self.lost = False
+            if self.on_event is not None:
+                self.on_event("reconnected", port)
+
+class SessionLogger(threading.Thread):
+    """Background sink that streams every TX/RX line to an append-only log file
+
+    Callers only enqueue; the thread does all file I/O with buffered writes that are flushed every
+    flush_interval_s, so logging never blocks the serial path. If the queue is full the entry is
+    dropped and counted. Files are rotated by size or age, and closed segments can be gzipped.
+
+    Args:
+        directory (str): Directory in which log segments are created
+        max_bytes (int): Rotate once the current segment reaches this size
+        max_age_s (float): Rotate once the current segment is this old
+        flush_interval_s (float): Maximum time an entry stays in the write buffer
+        compress (bool): Gzip closed segments
+        store (LineStore): Optional index that also receives every line (see the GUI's Log tab)
+    """
+    def __init__(self, directory:str=LOG_DIR, max_bytes:int=LOG_MAX_BYTES, max_age_s:float=LOG_MAX_AGE_S,
+                 flush_interval_s:float=LOG_FLUSH_INTERVAL_S, compress:bool=LOG_COMPRESS, store:LineStore=None) -> None:
+        super().__init__(daemon=True)
+        self.store = store
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+        self.flush_interval_s = flush_interval_s
+        self.compress = compress
+        self.entries = queue.Queue(maxsize=LOG_QUEUE_MAX)
+        self.dropped = 0
+        self.segments: List[str] = []   # Paths of every segment written this session, oldest first
+        self.file = None
+        self.opened_at = 0.0
+        self._flush_request = threading.Event()
+        self._flushed = threading.Event()
+        self._stop_event = threading.Event()
+        self._compressing: List[threading.Thread] = []
+
+    def log(self, direction:str, text:str) -> None:
+        """Enqueues a line for the log without blocking
+
+        Args:
+            direction (str): "TX", "RX", "URC" or "INFO"
+            text (str): The line, without line termination
+        """
+        try:
+            self.entries.put_nowait((time.time(), direction, text))
+        except queue.Full:
+            self.dropped += 1
+
+    def log_rx(self, line:str, solicited:bool) -> None:
+        """SerialReader subscriber that logs every received line"""
+        self.log("RX" if solicited else "URC", line)
+
+    def flush(self, timeout_s:float=2) -> None:
+        """Blocks until everything enqueued so far has been written to disk"""
+        self._flushed.clear()
+        self._flush_request.set()
+        self._flushed.wait(timeout_s)
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout=self.flush_interval_s + 2)
+        for thread in self._compressing:
+            thread.join()
+
+    def run(self) -> None:
+        last_flush = time.monotonic()
+        while True:
+            try:
+                entry = self.entries.get(timeout=self.flush_interval_s)
+            except queue.Empty:
+                entry = None
+            if entry is not None:
+                stamp, direction, text = entry
+                if self.file is None or self._should_rotate():
+                    self._rotate()
+                self.file.write(f"{get_timestamp(when=stamp)} {direction} {text}\n")
+                if self.store is not None:
+                    self.store.append(direction, text, stamp)
+            now = time.monotonic()
+            if self._flush_request.is_set() and self.entries.empty():
+                self._flush()
+                self._flush_request.clear()
+                self._flushed.set()
+            elif now - last_flush >= self.flush_interval_s:
+                self._flush()
+                last_flush = now
+            if self._stop_event.is_set() and self.entries.empty():
+                break
+        if self.dropped and self.file is not None:
+            self.file.write(f"{get_timestamp()} INFO {self.dropped} log line(s) dropped\n")
+        self._close()
+
+    def _flush(self) -> None:
+        if self.file is not None:
+            self.file.flush()
+
+    def _should_rotate(self) -> bool:
+        return (self.file.tell() >= self.max_bytes
+                or time.monotonic() - self.opened_at >= self.max_age_s)
+
+    def _rotate(self) -> None:
+        self._close()
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"atclog_{get_timestamp(filename_usable=True)}_{len(self.segments):03d}.txt")
+        self.file = open(path, "a", encoding="utf-8", buffering=LOG_BUFFER_BYTES)
+        self.opened_at = time.monotonic()
+        self.segments.append(path)
+
+    def _close(self) -> None:
+        if self.file is None:
+            return
+        self.file.close()
+        path = self.file.name
+        self.file = None
+        if self.compress:
+            thread = threading.Thread(target=self._gzip, args=(path,), daemon=True)
+            self._compressing = [t for t in self._compressing if t.is_alive()] + [thread]
+            thread.start()
+
+    def _gzip(self, path:str) -> None:
+        with open(path, "rb") as src, gzip.open(f"{path}.gz", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        self.segments[self.segments.index(path)] = f"{path}.gz"
+        os.remove(path)
+
+    def copy_to(self, file) -> None:
+        """Streams every segment of this session, oldest first, into an open text file"""
+        self.flush()
+        for thread in self._compressing:
+            thread.join()
+        for path in list(self.segments):
+            opener = gzip.open if path.endswith(".gz") else open
+            with opener(path, "rt", encoding="utf-8") as src:
+                shutil.copyfileobj(src, file)
+
+# END - Classes ###################################################################################
+
+####################################################################################################
+######################################## Functions #################################################
+####################################################################################################
+def load_commands(filename:str="atcommands.json") -> List[ATCommand]:
+    """Loads commands from "atcommands.json"
+
+    Args:
+        filename (str): Path to the command definitions
+
+    Returns:
+        List[ATCommand]: A list of ATCommand objects
+    """
+    commands = []
+    with open(filename, 'r') as file:
+        data = json.load(file)
+        for c in data['general']:
+            one_line = (c['response_line_count'] == 1)
+            timeout_s = c.get('timeout_s', RESPONSE_TIMEOUT_S)
+            commands.append(ATCommand(c['command'],c['description'],one_liner=one_line,timeout_s=timeout_s,
+                                      cacheable=c.get('cacheable', False),cache_ttl_s=c.get('cache_ttl_s')))
+    return commands
+
+def load_scripts(directory:str="./scripts") -> List[ATScript]:
+    """Indexes the scripts in a directory by header only; see ScriptLibrary
+
+    Returns:
+        List[ATScript]: Scripts whose commands are parsed on first use (ATScript.ensure_loaded)
+    """
+    library = ScriptLibrary(directory)
+    library.scan()
+    return library.list()
+
+def get_timestamp(filename_usable:bool=False, when:float=None) -> str:
+    ts = dt.datetime.now() if when is None else dt.datetime.fromtimestamp(when)
+    # Contains symbols; used for serial output (not valid file names)
+    if not filename_usable:
+        ts_str = ts.strftime(format="%m%d%Y-%H:%M:%S.%f")[:-3]
+        return (f"[{ts_str}]")
+    # Valid file name; used for logs    
+    elif filename_usable:
+        return ts.strftime("%Y%m%d_%H%M%S")
+
+def remove_ansi_escape_codes(text) -> str:
+    """Used to remove the ANSI escape codes "ESC" (escape) and "[0m" (text color reset)
+
+    Args:
+        text (str): The text to be purged of undesirable symbols
+
+    Returns:
+        str: The newly pruned string
+    """
+    ansi_escape = re.compile(r'\x1b\[[0-9;]*m')
+    return ansi_escape.sub('', text)
+
+def hexdump(data:bytes, offset:int=0, width:int=16) -> str:
+    """Formats bytes as "offset  hex bytes  |ascii|" rows, like hexdump -C"""
+    rows = []
+    for i in range(0, len(data), width):
+        row = data[i:i + width]
+        text = "".join(chr(b) if 32 <= b < 127 else "." for b in row)
+        rows.append(f"{offset + i:08x}  {row.hex(' '):<{width * 3 - 1}}  |{text}|")
+    return "\n".join(rows)
+
+def is_final_result_code(line:str) -> bool:
+    """Checks whether a response line terminates the command that produced it
+
+    Args:
+        line (str): A complete, stripped response line
+
+    Returns:
+        bool: True for "OK", "ERROR", "+CME ERROR: <n>", "+CMS ERROR: <n>", ...
+    """
+    return line in FINAL_RESULT_CODES or line.startswith(FINAL_RESULT_PREFIXES)
+
+def urc_name(line:str) -> Optional[str]:
+    """Returns the name of a "+NAME: ..."/"%NAME: ..."/"#NAME: ..." line (e.g. "+CEREG"), or None"""
+    if not line or line[0] not in "+%#":
+        return None
+    end = line.find(":")
+    return line[:end] if end > 0 else line
+
+def parse_signal(line:str) -> Optional[Dict[str, float]]:
+    """Extracts signal quality and registration fields from a %CESQ, +CESQ, +CEREG or %XMONITOR line
+
+    Returns:
+        Optional[Dict[str, float]]: The SIGNAL_FIELDS present (RSRP in dBm, RSRQ and SNR in dB), or None
+            if the line is not one of these or holds nothing known
+    """
+    name, _, body = line.partition(":")
+    try:
+        fields = next(csv.reader([body.strip()], skipinitialspace=True))
+    except StopIteration:
+        return None
+    raw = body.strip().split(",")
+
+    def index(i:int, offset:float, scale:float=1.0, unknown:int=255) -> Optional[float]:
+        # Modem reports are indices into 3GPP ranges (e.g. RSRP 0..97 -> -140..-43 dBm)
+        if i >= len(fields) or not fields[i].strip().lstrip("-").isdigit():
+            return None
+        value = int(fields[i])
+        return None if value == unknown else offset + value * scale
+
+    def cell(i:int) -> Optional[float]:
+        if i >= len(fields):
+            return None
+        try:
+            value = int(fields[i], 16)
+        except ValueError:
+            return None
+        return None if value == 0xFFFFFFFF else float(value)
+
+    sample = {}
+    if name == "+CESQ":     # <rxlev>,<ber>,<rscp>,<ecno>,<rsrq>,<rsrp>
+        sample = {"rsrq_db": index(4, -20, 0.5), "rsrp_dbm": index(5, -140)}
+    elif name == "%CESQ":   # <rsrp>,<rsrp_threshold_index>,<rsrq>,<rsrq_threshold_index>[,<snr>,<snr_threshold_index>]
+        sample = {"rsrp_dbm": index(0, -140), "rsrq_db": index(2, -20, 0.5), "snr_db": index(4, -24, unknown=127)}
+    elif name == "+CEREG":  # Read response: <n>,<stat>[,...]; notification: <stat>[,<tac>,<ci>,...]
+        first = 1 if len(raw) > 1 and not raw[1].strip().startswith('"') else 0
+        sample = {"reg_status": index(first, 0, unknown=-1), "cell_id": cell(first + 2)}
+    elif name == "%XMONITOR":   # <reg_status>[,<full_name>,<short_name>,<plmn>,<tac>,<AcT>,<band>,<cell_id>,<phys_cell_id>,<EARFCN>,<rsrp>,<snr>,...]
+        sample = {"reg_status": index(0, 0, unknown=-1), "cell_id": cell(7),
+                  "rsrp_dbm": index(10, -140), "snr_db": index(11, -24, unknown=127)}
+    sample = {key: value for key, value in sample.items() if value is not None}
+    return sample or None
+
+def concat_compatible(cmd_s:str) -> bool:
+    """Checks whether a command can be joined with others on one command line
+
+    Only extended read and test commands ("AT+CFUN?", "AT%XSYSTEMMODE=?") qualify: they have no side
+    effects and every information line they produce starts with their response prefix, so a combined
+    reply can be split back into one response per command.
+    """
+    return response_prefix(cmd_s) is not None and cmd_s.strip().endswith("?")
+
+def line_prefixes(line:str) -> frozenset:
+    """Returns the response prefixes expected for a command line, e.g. "AT+CEREG?;+CFUN?" -> {"+CEREG", "+CFUN"}"""
+    parts = line.strip().split(";")
+    prefixes = [response_prefix(parts[0])] + [response_prefix(f"AT{part}") for part in parts[1:]]
+    return frozenset(filter(None, prefixes))
+
+def concat_commands(commands:List[str]) -> str:
+    """Joins commands into one command line, e.g. ["AT+CEREG?", "AT+CFUN?"] -> "AT+CEREG?;+CFUN?" """
+    first, *rest = [cmd_s.strip() for cmd_s in commands]
+    return first + "".join(f";{cmd_s[2:]}" for cmd_s in rest)
+
+def split_commands(line:str) -> List[str]:
+    """Reverses concat_commands() for a line send_batch() joined, e.g. "AT+CEREG?;+CFUN?" -> ["AT+CEREG?", "AT+CFUN?"]
+
+    Any other command line is returned as its only command.
+    """
+    first, *rest = line.strip().split(";")
+    commands = [first] + [f"AT{part}" for part in rest]
+    return commands if rest and all(concat_compatible(cmd_s) for cmd_s in commands) else [line]
+
+def batch_units(commands:List[ATCommand], mode:str=BATCH_CONCAT) -> List[List[ATCommand]]:
+    """Groups commands into the command lines send_batch() will write
+
+    Args:
+        commands (List[ATCommand]): The commands, in execution order
+        mode (str): BATCH_PIPELINE (one command per line) or BATCH_CONCAT
+
+    Returns:
+        List[List[ATCommand]]: One list of commands per command line, in order
+    """
+    units: List[List[ATCommand]] = []
+    for cmd in commands:
+        unit = units[-1] if units else None
+        if (mode == BATCH_CONCAT and unit and concat_compatible(unit[0].cmd_s) and concat_compatible(cmd.cmd_s)
+                and response_prefix(cmd.cmd_s) not in {response_prefix(c.cmd_s) for c in unit}
+                and len(concat_commands([c.cmd_s for c in unit + [cmd]])) <= CONCAT_MAX_LENGTH):
+            unit.append(cmd)
+        else:
+            units.append([cmd])
+    return units
+
+def split_response(commands:List[str], response:ATResponse) -> Optional[List[ATResponse]]:
+    """Splits the reply to a concatenated command line into one response per command
+
+    Each information line goes to the command with the matching response prefix; lines without a
+    known prefix stay with the command before them. Every part shares the line's final result code.
+
+    Args:
+        commands (List[str]): The commands that were joined, in order
+        response (ATResponse): The reply to the joined line
+
+    Returns:
+        Optional[List[ATResponse]]: One response per command, or None if the line failed (the
+        result code does not say which command caused the error)
+    """
+    if len(commands) == 1:
+        response.command = commands[0]
+        return [response]
+    if response.final is not None and not response.ok:
+        return None
+    parts = [ATResponse(cmd_s) for cmd_s in commands]
+    by_prefix = {response_prefix(cmd_s): part for cmd_s, part in zip(commands, parts)}
+    target = parts[0]
+    for line, stamp in zip(response.lines, response.stamps):
+        target = by_prefix.get(urc_name(line), target)
+        target.lines.append(line)
+        target.stamps.append(stamp)
+    for part in parts:
+        part.final = response.final
+        part.final_stamp = response.final_stamp
+        part.latency_s = response.latency_s
+        part.first_byte_s = response.first_byte_s
+        part.timed_out = response.timed_out
+    return parts
+
+def response_prefix(cmd_s:str) -> Optional[str]:
+    """Returns the information-response prefix a command is expected to produce
+
+    Args:
+        cmd_s (str): A command such as "AT+CEREG?" or "AT%XMONITOR"
+
+    Returns:
+        Optional[str]: e.g. "+CEREG" or "%XMONITOR"; None for basic commands like "ATI"
+    """
+    match = re.match(r"AT([+%#][A-Z0-9]+)", cmd_s.strip(), re.IGNORECASE)
+    return match.group(1).upper() if match else None
@@ -1,29 +1,42 @@
 # Devon White, PPD 2024
 # AT Commander - Send commands quickly over serial
 
+import sys
+if __name__ == "__main__" and len(sys.argv) > 1:
+    # Headless command-line mode: skip the GUI entirely (see cli.py)
+    import cli
+    sys.exit(cli.main())
+
+import time
+startup_marks = [("start", time.perf_counter())]   # (stage, time.perf_counter()) for report_startup()
+
 import tkinter as tk
 from tkinter import *
 from tkinter import font, ttk
 import tkinter.filedialog
-from tkinter.filedialog import asksaveasfile
-import serial
+from tkinter.filedialog import asksaveasfile, asksaveasfilename
+from tkinter.simpledialog import askinteger
 from typing import Union, Tuple, List, Optional, Callable
 from colors import Colors
+from monitor import MonitorQueue, MonitorScrollback
+from engine import (ATCommand, ATResponse, ATScript, ATSession, AutoReconnect, LineFilter, LineStore, PortWatcher,
+                    RawCapture, Replay, ScriptLibrary, SessionBridge, SessionLogger, SignalHistory, BRIDGE_HOST,
+                    BRIDGE_PORT, DEFAULT_BAUD, DIRECTIONS, FLOW_CONTROLS, LOG_DIR, PAYLOAD_TIMEOUT_S, PRIORITY_INTERACTIVE,
+                    export_stats, hexdump, get_timestamp, load_commands, remove_ansi_escape_codes)
 
 import serial.tools
 import serial.tools.list_ports
 import math, time, json
-import datetime as dt
 import threading
+import queue
 import re
 import os
-import PIL
-from PIL import Image, ImageTk
+import atexit
+startup_marks.append(("imports", time.perf_counter()))
 
 DIM_X = 1280
 DIM_Y = 720
 
-serial_lock = threading.Lock()
 enable_trace = False
 # cmd_thread = threading.Thread()
 # script_thread = threading.Thread()
@@ -34,10 +47,32 @@ root.geometry(f"{DIM_X}x{DIM_Y}")
 
 BAUD_OPTIONS    = [115200, 9600]
 DEFAULT_PORT    = "Select Port"
-DEFAULT_BAUD    = 115200
 BUTTON_WIDTH    = 15    # Width is the horizontal measurement, in this context
 PADDING_X       = 2
 PADDING_Y       = 2
+SCRIPT_SCAN_INTERVAL_MS = 2000  # Interval at which ./scripts is checked for new or changed files
+MONITOR_TICK_MS = 30    # Interval at which queued monitor lines are rendered
+STATS_REFRESH_MS = 1000     # Interval at which the Stats tab is redrawn (while it is visible)
+LOG_VIEW_ROWS   = 30        # Rows rendered by the Log tab's virtualized view
+LOG_REFRESH_MS  = 500       # Interval at which the Log tab picks up new lines (while it is visible)
+LOG_FILTER_DEBOUNCE_MS = 150    # Typing pause before the Log tab's filter is applied
+CAPTURE_BAUD_OPTIONS = [1000000, 115200]    # The nRF9160 DK modem trace UART runs at 1 Mbaud
+CAPTURE_REFRESH_MS = 500    # Interval at which the Capture tab's counters and hex view are redrawn
+CAPTURE_HEX_BYTES = 512     # Most recent bytes shown in the hex view
+PORT_EVENTS_POLL_MS = 250   # Interval at which hotplug events from the port watcher are applied to the GUI
+LAYOUT_DEBOUNCE_MS = 100    # Resize pause before the Commands/Scripts button grids are laid out again
+PALETTE_FILTER_DEBOUNCE_MS = 100    # Typing pause before the command palette's filter is applied
+REPLAY_SPEEDS   = ["1x", "10x", "100x", "max"]  # Replay speeds relative to the recording
+REPLAY_REFRESH_MS = 250     # Interval at which the replay position is shown
+SIGNAL_REFRESH_MS = 1000    # Interval at which the Signal tab's plot is redrawn (while it is visible)
+BRIDGE_REFRESH_MS = 1000    # Interval at which the bridge's client count is shown
+SIGNAL_PLOT_HEIGHT = 240    # Height of the Signal tab's plot in pixels
+SIGNAL_WINDOWS  = {"15 min": 15 * 60, "1 h": 60 * 60, "6 h": 6 * 60 * 60, "24 h": 24 * 60 * 60, "All": None}
+ICON_SIZE       = 30        # Toolbar icons are scaled to ICON_SIZE x ICON_SIZE pixels...
+ICON_CACHE_DIR  = os.path.join("assets", ".cache")  # ...and cached here until the source PNG changes
+
+monitor = MonitorQueue()    # Lines waiting for drain_monitor()
+
 TOOLBAR_FONT    = font.Font(root=root, family="Consolas", size=8)
 LABEL_FONT      = font.Font(root=root, family="Consolas", size=12)
 MONITOR_FONT    = font.Font(root=root, family="Consolas", size=12)
@@ -99,7 +134,13 @@ TOGGLE_CNF = {
 }
 
 root.config(background=ROOT_BG)
-nRF9160 = serial.Serial()
+line_store = LineStore()    # Every logged line, indexed for the Log tab
+session_logger = SessionLogger(store=line_store)
+session = ATSession(logger=session_logger)   # The serial device (nRF9160) driven by the GUI
+port_events = queue.Queue()     # Hotplug and reconnect events for drain_port_events(), from the watcher thread
+port_watcher = PortWatcher()    # Enumerates serial ports in the background
+port_watcher.subscribe(lambda added, removed: (added or removed) and port_events.put(("ports", added, removed)))
+auto_reconnect = AutoReconnect(session, port_watcher, on_event=lambda event, port: port_events.put((event, port)))
 
 # NOTEBOOK/TABS CONFIGURATION
 tab_style = ttk.Style()
@@ -140,41 +181,61 @@ class SerialPowerSwitch(tk.Button):
     def toggle(self):
         """Toggles the connection to the serial device
         """
-        global nRF9160      # Serial device
-
         # If the connection is open, attempt to close it
-        if nRF9160.is_open:
+        if session.is_open:
             try:
-                nRF9160.close()
-                serial_monitor.insert(tk.END, f"Closed connection to PORT={port_svar.get()}, BAUD={baud_ivar.get()}.\r\n")
+                auto_reconnect.forget()
+                session.close()
+                monitor_notice(f"Closed connection to PORT={port_svar.get()}, BAUD={baud_ivar.get()}.")
                 self.is_on = False
-            except:
-                serial_monitor.insert(tk.END, "Failed to close serial device.\r\n")
+            except Exception as e:
+                monitor_notice("Failed to close serial device.")
                 print(e)
                 self.is_on = True
                 return
         
         # Else if the connection is closed, attempt to open it
         else:
-            nRF9160.port = port_svar.get()
-            nRF9160.baudrate = baud_ivar.get()
-            nRF9160.timeout = 3
             try:
-                nRF9160.open()
-                serial_monitor.insert(tk.END, f"Connected: PORT={port_svar.get()}, BAUD={baud_ivar.get()}.\r\n")
+                session.open(port_svar.get(), baud_ivar.get())
+                auto_reconnect.remember()
+                monitor_notice(f"Connected: PORT={port_svar.get()}, BAUD={baud_ivar.get()}.")
                 self.is_on = True
             except Exception as e:
-                serial_monitor.insert(tk.END, "Failed to open serial device, please check your connection and settings.\r\n")
+                monitor_notice("Failed to open serial device, please check your connection and settings.")
                 print(e)
                 self.is_on = False
                 return
 
-        # Recolor button to match the status of the connection
+        self.show(self.is_on)
+
+    def show(self, is_on:bool) -> None:
+        """Recolors the button to match the status of the connection"""
+        self.is_on = is_on
         if self.is_on:
             self.configure(bg="light green", text="On")
         else:
             self.configure(bg="red", text="Off")
 
+class AutoReconnectSwitch(tk.Button):
+    """A custom button used to toggle reconnecting when the device re-enumerates
+
+    Args:
+        master: The master container of the button
+        **kwargs:   Any additional arguments belonging to the parent class tk.Button
+    """
+    def __init__(self, master=None, **kwargs):
+        super().__init__(master, command=self.toggle, **kwargs)
+        self.configure(width=10, relief="raised", bg="lightgreen", text="On")
+
+    def toggle(self):
+        """Toggles whether the session is reopened when its device comes back"""
+        auto_reconnect.enabled = not auto_reconnect.enabled
+        if auto_reconnect.enabled:
+            self.configure(bg="light green", text="On")
+        else:
+            self.configure(bg="red", text="Off")
+
 class LiveTraceSwitch(tk.Button):
     """A custom button used to toggle live modem tracing
 
@@ -190,29 +251,28 @@ class LiveTraceSwitch(tk.Button):
         self.configure(width=self.width, relief="raised", bg="lightgreen", text="On")
     
     def toggle(self):
-        """Toggles the connection to the serial device
+        """Toggles whether unsolicited messages are shown in the serial monitor
         """
         self.is_on = not self.is_on
         # Recolor button to match the status of the connection
         if self.is_on:
             self.configure(bg="light green", text="On")
             self.enable_trace = True
-            self.serial_thread = threading.Thread(target=self.live_trace, daemon=True)
-            self.serial_thread.start()
         else:
             self.configure(bg="red", text="Off")
             self.enable_trace = False
-            self.serial_thread = None
-
-    def live_trace(self):
-        global nRF9160
-        while self.enable_trace:
-            if nRF9160.is_open:
-                with serial_lock:
-                    if nRF9160.in_waiting > 0:
-                        data = remove_ansi_escape_codes(nRF9160.readline().decode('utf-8').strip())
-                        if data:
-                            serprint(data)
+
+    def show_unsolicited(self, line:str, solicited:bool) -> None:
+        """SerialReader subscriber that prints unsolicited lines while tracing is enabled
+
+        Args:
+            line (str): The line received from the serial device
+            solicited (bool): True if the line belongs to a pending command's response
+        """
+        if self.enable_trace and not solicited:
+            data = remove_ansi_escape_codes(line)
+            if data:
+                serprint(data)
 
 class Tooltip:
     def __init__(self, widget: Widget, text) -> None:
@@ -243,14 +303,6 @@ class Tooltip:
             self.tooltip_window.destroy()
             self.tooltip_window = None
 
-class ATCommand():
-    def __init__(self, command:str, hint:str=None, ignore:str=None, one_liner:bool=False) -> None:
-        self.cmd_s    = command   # The command to be sent
-        self.hint_s   = hint      # Tooltip shown on mouse hover
-        self.ignore_s = ignore    # Responses to ignore after sending command
-        self.one_liner  = one_liner # Indicates that the response should only be one line
-
-
 class ATButton(tk.Button):
     """A special button used to control the transmission of AT commands
     """
@@ -260,64 +312,240 @@ class ATButton(tk.Button):
         self.config(text=f"{at_command.cmd_s}",font=LABEL_FONT,width=BUTTON_WIDTH)
         self.tooltip = Tooltip(self, at_command.hint_s)
 
+    def set_command(self, at_command:ATCommand) -> None:
+        """Rebinds the button to another command (see CommandPalette)"""
+        if at_command is not self.at_command:
+            self.at_command = at_command
+            self.config(text=f"{at_command.cmd_s}")
+            self.tooltip.text = at_command.hint_s
+
     def submit_cmd(self) -> None:
         # print(f"{self.winfo_width()}x{self.winfo_height()}\r\n")  # DEBUG
-        # Running "submit_cmd" in separate thread to prevent blocking the main thread
-        cmd_thread = threading.Thread(target=self.send_at_cmd,args=(self.at_command,), daemon=True)
-        cmd_thread.start()
+        # Answer cacheable commands immediately, without waiting behind queued work
+        response = session.cached_response(self.at_command) if session.is_open else None
+        if response is not None:
+            serprint(f"{get_timestamp()} -> {self.at_command.cmd_s}")
+            self.print_response(self.at_command, response)
+            return
+        # Queue "send_at_cmd" on the device's command queue to prevent blocking the main thread
+        session.submit(self.send_at_cmd, self.at_command, priority=PRIORITY_INTERACTIVE)
 
     def send_at_cmd(self, cmd: ATCommand) -> None:
-        global nRF9160
-        if nRF9160 is not None:
-            with serial_lock:
-                if nRF9160.is_open:
-                    stamps = []
+        if session is not None:
+            if session.is_open:
+                serprint(f"{get_timestamp()} -> {cmd.cmd_s}")
+                try:
+                    response = session.query(cmd)
+                except Exception as e:
+                    print(f"ERROR: {e}\r\nAttempting to continue...\r\n")
+                    return
+                self.print_response(cmd, response)
+
+            elif port_svar.get() != "Select Port":
+                serprint(f"{get_timestamp()} Error: Serial Device \"{port_svar.get()}\" is not open.")
+            else:
+                serprint(f"{get_timestamp()} Error: Please select a serial port.")
+
+    @staticmethod
+    def print_response(cmd: ATCommand, response: ATResponse) -> None:
+        if response.cached:
+            lines = [f"{get_timestamp()} <- {line} (cached)" for line in response.lines]
+        else:
+            lines = [f"{stamp} <- {line}" for stamp, line in zip(response.stamps, response.lines)]
+
+        # Command returns one line
+        if cmd.one_liner:
+            if lines:
+                serprint(lines[-1])
+
+        # Command returns multiple lines
+        else:
+            for line in lines:
+                # If command has a specific ignore rule
+                if not cmd.ignore_s or not cmd.ignore_s in line:
+                    serprint(line)
+
+        if response.timed_out:
+            serprint(f"{get_timestamp()} Error: No final result code for {cmd.cmd_s} within {cmd.timeout_s} s")
+        elif not response.ok:
+            serprint(f"{response.final_stamp} <- {response.final}")
+
+class ATGroupButton(tk.Button):
+    """Sends a group of AT commands in one round trip (see ATSession.send_batch)
+
+    Args:
+        master (Widget): Parent widget
+        commands (Callable): Returns the commands to send, evaluated when the button is pressed
+        text (str): Button label
+    """
+    def __init__(self, master:Tk, commands:Callable[[], List[ATCommand]], text:str="Run All") -> None:
+        super().__init__(master=master, command=self.submit_group)
+        self.commands = commands
+        self.config(text=text,font=LABEL_FONT,width=BUTTON_WIDTH)
+        self.tooltip = Tooltip(self, "Send every command shown on this tab, pipelined into one round trip")
+
+    def submit_group(self) -> None:
+        # Queue "send_group" on the device's command queue to prevent blocking the main thread
+        session.submit(self.send_group, self.commands(), priority=PRIORITY_INTERACTIVE)
+
+    def send_group(self, commands:List[ATCommand]) -> None:
+        if session is not None:
+            if session.is_open:
+                try:
+                    responses = session.send_batch(commands)
+                except Exception as e:
+                    print(f"ERROR: {e}\r\nAttempting to continue...\r\n")
+                    return
+                for cmd, response in zip(commands, responses):
                     serprint(f"{get_timestamp()} -> {cmd.cmd_s}")
-                    nRF9160.write(f"{cmd.cmd_s}\r\n".encode())
-                    try:
-                        response = nRF9160.read_all().decode()
-                        while not "OK" in response and not "ERROR" in response:
-                            response = nRF9160.read_all().decode()
-                            stamps.append(get_timestamp())
-
-                        lines = response.split("\n")
-                        for i in range(len(lines)-2):
-                            lines[i] = f"{stamps[i]} <- {lines[i]}"
-                        prev_line = lines[0]
-
-                        # Command returns one line
-                        if cmd.one_liner:
-                            for line in lines:
-                                if line.strip() in "OK":
-                                    serprint(prev_line)
-                                    break
-                                prev_line = line
-
-                        # Command returns multiple lines
-                        else:
-                            for line in lines:
-                                # If command has a specific ignore rule
-                                if cmd.ignore_s:
-                                    if not cmd.ignore_s in line and not "OK" in line:
-                                        serprint(line)
-                                # Else if the response has not finished
-                                elif not "OK" in line:
-                                    serprint(line)
-
-                                # If the command returned an error
-                                if "ERROR" in line:
-                                    break
-                                # If the command finished returning a response
-                                if "OK" in line:
-                                    break
-
-                    except Exception as e:
-                        print(f"ERROR: {e}\r\nAttempting to continue...\r\n")
-
-                elif port_svar.get() != "Select Port":
-                    serprint(f"{get_timestamp()} Error: Serial Device \"{port_svar.get()}\" is not open.")
-                else:
-                    serprint(f"{get_timestamp()} Error: Please select a serial port.")
+                    ATButton.print_response(cmd, response)
+
+            elif port_svar.get() != "Select Port":
+                serprint(f"{get_timestamp()} Error: Serial Device \"{port_svar.get()}\" is not open.")
+            else:
+                serprint(f"{get_timestamp()} Error: Please select a serial port.")
+
+class CommandPalette():
+    """Virtualized, searchable grid of AT command buttons
+
+    Only as many ATButtons as fit in the tab are created; scrolling and filtering rebind them to other
+    commands rather than creating, gridding or destroying widgets, so the cost of a redraw does not
+    depend on the size of the catalog. Every word typed in the filter must appear in a command's name
+    or description; while the text is only being extended, the previous matches are narrowed instead
+    of rescanning the catalog. Layout is recomputed once resizing pauses.
+
+    Args:
+        master (Widget): Parent frame (the Commands tab)
+        commands (List[ATCommand]): The full command catalog
+    """
+    def __init__(self, master, commands:List[ATCommand]) -> None:
+        self.commands = commands
+        self.haystacks = [f"{c.cmd_s}\n{c.hint_s or ''}".lower() for c in commands]
+        self.matches: List[int] = list(range(len(commands)))   # Indices into self.commands
+        self.query = ""         # Filter text that produced self.matches
+        self.top = 0            # First rendered row
+        self.rows = 0
+        self.columns = 0
+        self.buttons: List[ATButton] = []
+        self._filter_job = None
+        self._layout_job = None
+
+        bar = tk.Frame(master)
+        bar.pack(side=tk.TOP, fill=X)
+        self.filter_svar = StringVar()
+        Label(bar, text="Filter", font=LABEL_FONT).pack(side=tk.LEFT, padx=PADDING_X)
+        self.entry = Entry(bar, textvariable=self.filter_svar, font=LABEL_FONT, width=40)
+        self.entry.pack(side=tk.LEFT, padx=PADDING_X)
+        self.entry.bind("<Return>", lambda event: self.submit_first())
+        self.group_button = ATGroupButton(bar, commands=self.matched_commands)
+        self.group_button.pack(side=tk.LEFT, padx=PADDING_X, pady=PADDING_Y)
+        self.count_label = Label(bar, font=LABEL_FONT)
+        self.count_label.pack(side=tk.LEFT, padx=PADDING_X)
+        self.filter_svar.trace_add("write", lambda *args: self.schedule_filter())
+
+        body = tk.Frame(master)
+        body.pack(side=tk.TOP, fill=BOTH, expand=True)
+        self.scrollbar = ttk.Scrollbar(body, command=self.yview)
+        self.scrollbar.pack(side=tk.RIGHT, fill=Y)
+        self.grid_frame = tk.Frame(body)
+        self.grid_frame.pack(side=tk.LEFT, fill=BOTH, expand=True)
+        self.grid_frame.grid_propagate(False)   # The pool is sized to the frame, never the other way around
+        self.grid_frame.bind("<Configure>", self.schedule_layout)
+        self.bind_wheel(self.grid_frame)
+        self.count_label.config(text=f"{len(self.matches)} of {len(self.commands)} commands")
+
+    def bind_wheel(self, widget:Widget) -> None:
+        widget.bind("<MouseWheel>", lambda event: self.yview("scroll", -int(event.delta / 120), "units"))
+        widget.bind("<Button-4>", lambda event: self.yview("scroll", -1, "units"))
+        widget.bind("<Button-5>", lambda event: self.yview("scroll", 1, "units"))
+
+    def matched_commands(self) -> List[ATCommand]:
+        return [self.commands[i] for i in self.matches]
+
+    def schedule_layout(self, event=None) -> None:
+        if self._layout_job is not None:
+            self.grid_frame.after_cancel(self._layout_job)
+        self._layout_job = self.grid_frame.after(LAYOUT_DEBOUNCE_MS, self.layout)
+
+    def layout(self) -> None:
+        """Sizes the button pool to the frame; does nothing unless the number of rows or columns changed"""
+        self._layout_job = None
+        if not self.commands:
+            return
+        if not self.buttons:
+            self.buttons.append(ATButton(master=self.grid_frame, at_command=self.commands[0]))
+            self.bind_wheel(self.buttons[0])
+        cell_w = self.buttons[0].winfo_reqwidth() + 2 * PADDING_X
+        cell_h = self.buttons[0].winfo_reqheight() + 2 * PADDING_Y
+        columns = max(1, self.grid_frame.winfo_width() // cell_w)
+        rows = max(1, self.grid_frame.winfo_height() // cell_h)
+        if (rows, columns) == (self.rows, self.columns):
+            return
+        self.rows, self.columns = rows, columns
+        while len(self.buttons) < rows * columns:
+            button = ATButton(master=self.grid_frame, at_command=self.commands[0])
+            self.bind_wheel(button)
+            self.buttons.append(button)
+        for button in self.buttons[rows * columns:]:
+            button.destroy()
+        del self.buttons[rows * columns:]
+        for i, button in enumerate(self.buttons):
+            button.grid(row=i // columns, column=i % columns, padx=PADDING_X, pady=PADDING_Y)
+        self.render()
+
+    def schedule_filter(self) -> None:
+        if self._filter_job is not None:
+            self.entry.after_cancel(self._filter_job)
+        self._filter_job = self.entry.after(PALETTE_FILTER_DEBOUNCE_MS, self.apply_filter)
+
+    def apply_filter(self) -> None:
+        self._filter_job = None
+        query = self.filter_svar.get().lower()
+        words = query.split()
+        # Extending the text can only remove matches, so only the previous matches need checking
+        candidates = self.matches if self.query and query.startswith(self.query) else range(len(self.commands))
+        self.matches = [i for i in candidates if all(word in self.haystacks[i] for word in words)]
+        self.query = query
+        self.top = 0
+        self.render()
+
+    def submit_first(self) -> None:
+        """Sends the first match (Return in the filter box)"""
+        if self._filter_job is not None:
+            self.entry.after_cancel(self._filter_job)
+            self.apply_filter()
+        if self.matches and self.buttons:
+            self.top = 0
+            self.render()
+            self.buttons[0].submit_cmd()
+
+    def yview(self, *args) -> None:
+        """Scrollbar/mouse-wheel command: moves the window of rendered rows"""
+        total_rows = -(-len(self.matches) // max(1, self.columns))
+        if args[0] == "moveto":
+            self.top = int(float(args[1]) * total_rows)
+        elif args[0] == "scroll":
+            self.top += int(args[1]) * (self.rows if args[2] == "pages" else 1)
+        self.render()
+
+    def render(self) -> None:
+        total = len(self.matches)
+        self.count_label.config(text=f"{total} of {len(self.commands)} commands")
+        if not self.buttons or not self.columns:
+            return
+        total_rows = -(-total // self.columns)
+        self.top = max(0, min(self.top, total_rows - self.rows))
+        first = self.top * self.columns
+        for i, button in enumerate(self.buttons):
+            if first + i < total:
+                button.set_command(self.commands[self.matches[first + i]])
+                button.grid()
+            else:
+                button.grid_remove()
+        if total_rows:
+            self.scrollbar.set(self.top / total_rows, min(1.0, (self.top + self.rows) / total_rows))
+        else:
+            self.scrollbar.set(0.0, 1.0)
 
 class ToolbarButton(tk.Button):
     def __init__(self, master:Tk, command:Callable=None, hint:str="<Missing Tooltip>", icon:str=None) -> None:
@@ -326,61 +554,10 @@ class ToolbarButton(tk.Button):
         self.tooltip = Tooltip(self, hint)
         self.icon_image = None
         if icon:
-            icon_path = icon
-            icon_image = Image.open(icon_path)
-            resized_image = icon_image.resize((30, 30), Image.Resampling.LANCZOS)
-            # new_image = save_icon_image
-            photo = ImageTk.PhotoImage(resized_image)
+            photo = load_icon(icon)
             self.config(image=photo)
             self.icon_image = photo
 
-class ATScript():
-    def __init__(self, filename:str, delay_s:float=.175) -> None:
-        self.filename = filename
-        self.delay_s = delay_s
-        self.commands = []
-        self.name = None
-        self.desc = None
-
-    def extract_commands(self) -> None:
-        # Keywords
-        KW_NAME = "[NAME]"
-        KW_DESC = "[DESC]"
-        KW_STRT = "[START]"
-        KW_STOP = "[END]"
-        KW_WAIT = "[WAIT]"
-        running = False
-        with open(self.filename, "r") as f:
-            for line in f.readlines():
-                if line.strip():
-                    if line.strip()[0] != "//":
-                        if not running:
-                            if KW_NAME in line:
-                                line_no_cmnt = line.split("//")[0]
-                                self.name = line_no_cmnt.split(KW_NAME)[1].strip().strip("\"")
-                            elif KW_DESC in line:
-                                line_no_cmnt = line.split("//")[0]
-                                self.desc = line_no_cmnt.split(KW_DESC)[1].strip().strip("\"")
-                            elif KW_STRT in line:
-                                running = True
-                        elif running:
-                            if not KW_STOP in line:
-                                line_no_cmnt = line.split("//")[0]
-                                final = line_no_cmnt.strip()
-                                print(final)
-                                self.commands.append(final)
-                            else:
-                                running = False
-                                break
-
-    def print_info(self) -> None:
-        print(f"Name: {self.name}")
-        print(f"Desc: {self.desc}")
-        print(f"Commands:")
-        for cmd in self.commands:
-            print(f"\t{cmd}")
-
-    
 class ATScriptButton(tk.Button):
     def __init__(self, master:Tk, script:ATScript) -> None:
         super().__init__(master=master, command=self.run_script)
@@ -389,46 +566,240 @@ class ATScriptButton(tk.Button):
         self.tooltip = Tooltip(self, script.desc)
 
     def run_script(self) -> None:
-        # Running "run_script" in separate thread to prevent blocking the main thread
-        self.script_thread = threading.Thread(target=self.send_commands,args=(self.script,), daemon=True)
-        self.script_thread.start()
+        # Queue "send_commands" on the device's command queue to prevent blocking the main thread
+        session.submit(self.send_commands, self.script)
 
     def send_commands(self, script: ATScript) -> None:
-        global nRF9160
-        if nRF9160 is not None:
-            with serial_lock:
-                if nRF9160.is_open:
-                    for cmd in script.commands:
-                        if "[WAIT]" in cmd:
-                            wait_time = int(cmd.split("[WAIT]")[1].strip())
-                            serial_monitor.insert(tk.END, f"{get_timestamp()} -> Waiting for {wait_time} seconds... ")
-                            start_index = serial_monitor.index('insert')
-                            s_line, s_char = start_index.split(".")
-                            for i in range(wait_time):
-                                serial_monitor.replace(f"{s_line}.{s_char}", f"{s_line}.{int(s_char)+3}", f"{wait_time - i}")
-                                time.sleep(1)
-                            serial_monitor.replace(f"{s_line}.{s_char}", f"{s_line}.{int(s_char)+3}", f"{wait_time} seconds elapsed.\r\n")
-                        else:
-                            serprint(f"{get_timestamp()} -> {cmd}")
-                            for c in cmd:
-                                print(c)
-                                nRF9160.write(c.encode())
-                                time.sleep(script.delay_s)
-                            nRF9160.write(("\r\n").encode())
-                            time.sleep(1)
-                            # nRF9160.write(f"{cmd}\r\n".encode())
-                            try:
-                                response = nRF9160.read_all().decode()
-                            except Exception as e:
-                                print(e)
-                                pass
-                            if response:
-                                serprint(response, response=True)
-
-                elif port_svar.get() != "Select Port":
-                    serprint(f"{get_timestamp()} Error: Serial Device \"{port_svar.get()}\" is not open.")
-                else:
-                    serprint(f"{get_timestamp()} Error: Please select a serial port.")
+        if session is not None:
+            if session.is_open:
+                try:
+                    script.ensure_loaded()
+                    session.run_script(script, on_send=self.print_command, on_response=self.print_response)
+                except Exception as e:
+                    print(e)
+
+            elif port_svar.get() != "Select Port":
+                serprint(f"{get_timestamp()} Error: Serial Device \"{port_svar.get()}\" is not open.")
+            else:
+                serprint(f"{get_timestamp()} Error: Please select a serial port.")
+
+    def print_command(self, cmd:str) -> None:
+        if "[WAIT]" in cmd:
+            wait_time = int(cmd.split("[WAIT]")[1].strip())
+            serprint(f"{get_timestamp()} -> Waiting for {wait_time} seconds...")
+        else:
+            serprint(f"{get_timestamp()} -> {cmd}")
+
+    def print_response(self, response:ATResponse) -> None:
+        if response.lines or response.final:
+            serprint(response.text(), response=True)
+        if response.timed_out:
+            serprint(f"{get_timestamp()} Error: No final result code for {response.command} within {self.script.timeout_s} s")
+
+
+class LogView():
+    """Virtualized, filterable view of the session's LineStore
+
+    Only the rows that fit in the widget are rendered: the scrollbar is mapped onto the list of
+    matching line numbers, so filtering and scrolling cost the same for a hundred lines or a million.
+    Filters are applied after a short typing pause and narrow the previous matches when possible.
+
+    Args:
+        master (Widget): Parent frame (the Log tab)
+        store (LineStore): The lines to show
+        rows (int): Number of rows rendered
+    """
+    COLORS = {"TX": "light blue", "RX": "white", "URC": LIGHT_ORANGE, "INFO": GRAY}
+
+    def __init__(self, master, store:LineStore, rows:int=LOG_VIEW_ROWS) -> None:
+        self.store = store
+        self.rows = rows
+        self.filter = LineFilter(store)
+        self.top = 0            # Index into self.filter.matches of the first rendered row
+        self.follow = True      # Keep the newest matches in view as lines arrive
+        self._debounce = None
+
+        bar = tk.Frame(master)
+        bar.pack(side=tk.TOP, fill=X)
+        self.text_svar = StringVar()
+        self.direction_svar = StringVar(value="All")
+        self.name_svar = StringVar(value="All")
+        self.regex_ivar = IntVar(value=0)
+        Label(bar, text="Filter", font=LABEL_FONT).pack(side=tk.LEFT, padx=PADDING_X)
+        Entry(bar, textvariable=self.text_svar, font=LABEL_FONT, width=40).pack(side=tk.LEFT, padx=PADDING_X)
+        OptionMenu(bar, self.direction_svar, "All", *DIRECTIONS).pack(side=tk.LEFT, padx=PADDING_X)
+        self.name_box = ttk.Combobox(bar, textvariable=self.name_svar, values=["All"], width=14,
+                                     state="readonly", postcommand=self.update_names)
+        self.name_box.pack(side=tk.LEFT, padx=PADDING_X)
+        Checkbutton(bar, text="Regex", variable=self.regex_ivar).pack(side=tk.LEFT, padx=PADDING_X)
+        self.count_label = Label(bar, font=LABEL_FONT)
+        self.count_label.pack(side=tk.LEFT, padx=PADDING_X)
+        for var in (self.text_svar, self.direction_svar, self.name_svar, self.regex_ivar):
+            var.trace_add("write", lambda *args: self.schedule_filter())
+
+        body = tk.Frame(master)
+        body.pack(side=tk.TOP, fill=BOTH, expand=True)
+        self.scrollbar = ttk.Scrollbar(body, command=self.yview)
+        self.scrollbar.pack(side=tk.RIGHT, fill=Y)
+        self.widget = Text(body, height=rows, wrap=NONE, fg=WHITE, bg=GRAY_1, font=MONITOR_FONT, state=tk.DISABLED)
+        self.widget.pack(side=tk.LEFT, fill=BOTH, expand=True)
+        for direction, color in self.COLORS.items():
+            self.widget.tag_config(direction, foreground=color)
+        self.widget.bind("<MouseWheel>", lambda event: self.yview("scroll", -int(event.delta / 120) * 3, "units"))
+        self.widget.bind("<Button-4>", lambda event: self.yview("scroll", -3, "units"))
+        self.widget.bind("<Button-5>", lambda event: self.yview("scroll", 3, "units"))
+
+    def update_names(self) -> None:
+        self.name_box.config(values=["All"] + sorted(self.store.names))
+
+    def schedule_filter(self) -> None:
+        if self._debounce is not None:
+            self.widget.after_cancel(self._debounce)
+        self._debounce = self.widget.after(LOG_FILTER_DEBOUNCE_MS, self.apply_filter)
+
+    def apply_filter(self) -> None:
+        self._debounce = None
+        direction = self.direction_svar.get()
+        name = self.name_svar.get()
+        try:
+            self.filter = self.filter.narrow(self.text_svar.get(),
+                                             None if direction == "All" else direction,
+                                             None if name == "All" else name,
+                                             bool(self.regex_ivar.get()))
+        except re.error as e:
+            self.count_label.config(text=f"Invalid expression: {e}")
+            return
+        self.follow = True
+        self.render()
+
+    def refresh(self) -> None:
+        """Picks up lines appended since the last call, redrawing only if the view follows the end"""
+        if self.filter.update() and self.follow:
+            self.render()
+        else:
+            self.count_label.config(text=f"{len(self.filter.matches)} of {len(self.store)} lines")
+
+    def yview(self, *args) -> None:
+        """Scrollbar/mouse-wheel command: moves the window of rendered rows"""
+        total = len(self.filter.matches)
+        if args[0] == "moveto":
+            self.top = int(float(args[1]) * total)
+        elif args[0] == "scroll":
+            self.top += int(args[1]) * (self.rows if args[2] == "pages" else 1)
+        self.top = max(0, min(self.top, total - self.rows))
+        self.follow = self.top >= total - self.rows
+        self.render()
+
+    def render(self) -> None:
+        matches = self.filter.matches
+        total = len(matches)
+        if self.follow:
+            self.top = max(0, total - self.rows)
+        self.widget.config(state=tk.NORMAL)
+        self.widget.delete("1.0", tk.END)
+        for n in matches[self.top:self.top + self.rows]:
+            stamp, direction, text = self.store.line(n)
+            self.widget.insert(tk.END, f"{get_timestamp(when=stamp)} {direction:<4} {text}\n", direction)
+        self.widget.config(state=tk.DISABLED)
+        if total:
+            self.scrollbar.set(self.top / total, min(1.0, (self.top + self.rows) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+        self.count_label.config(text=f"{total} of {len(self.store)} lines")
+
+class SignalView():
+    """Live plot of one field of a SignalHistory on a Tk Canvas
+
+    Each refresh asks the history for min/max-decimated buckets, one per pixel column, and draws them
+    as a single polyline, so redrawing a day of samples costs the same as redrawing a minute and
+    short drops in signal are never averaged away.
+
+    Args:
+        master (Widget): Parent frame (the Signal tab)
+        history (SignalHistory): The samples to plot
+    """
+    FIELDS = {"RSRP (dBm)": "rsrp_dbm", "RSRQ (dB)": "rsrq_db", "SNR (dB)": "snr_db",
+              "Registration": "reg_status", "Cell ID": "cell_id"}
+    MARGIN_X = 60   # Pixels left of the plot for the value labels
+    MARGIN_Y = 20   # Pixels above and below the plot for the time labels
+
+    def __init__(self, master, history:SignalHistory) -> None:
+        self.history = history
+        bar = tk.Frame(master)
+        bar.pack(side=tk.TOP, fill=X)
+        self.field_svar = StringVar(value=next(iter(self.FIELDS)))
+        self.window_svar = StringVar(value=next(iter(SIGNAL_WINDOWS)))
+        Label(bar, text="Plot", font=LABEL_FONT).pack(side=tk.LEFT, padx=PADDING_X)
+        OptionMenu(bar, self.field_svar, *self.FIELDS).pack(side=tk.LEFT, padx=PADDING_X)
+        OptionMenu(bar, self.window_svar, *SIGNAL_WINDOWS).pack(side=tk.LEFT, padx=PADDING_X)
+        tk.Button(bar, text="Export...", font=LABEL_FONT, width=BUTTON_WIDTH, command=self.export).pack(side=tk.LEFT, padx=PADDING_X, pady=PADDING_Y)
+        tk.Button(bar, text="Clear", font=LABEL_FONT, width=BUTTON_WIDTH, command=self.clear).pack(side=tk.LEFT, padx=PADDING_X, pady=PADDING_Y)
+        self.latest_label = Label(bar, font=LABEL_FONT)
+        self.latest_label.pack(side=tk.LEFT, padx=PADDING_X)
+        for var in (self.field_svar, self.window_svar):
+            var.trace_add("write", lambda *args: self.render())
+        self.canvas = Canvas(master, height=SIGNAL_PLOT_HEIGHT, bg=GRAY_1, highlightthickness=0)
+        self.canvas.pack(side=tk.TOP, fill=X, padx=PADDING_X, pady=PADDING_Y)
+        self.canvas.bind("<Configure>", lambda event: self.render())
+
+    def clear(self) -> None:
+        self.history.clear()
+        self.render()
+
+    def export(self) -> None:
+        ts = get_timestamp(filename_usable=True)
+        filename = asksaveasfilename(confirmoverwrite=True,
+                                     defaultextension=".csv",
+                                     initialfile=f"atcsignal_{ts}",
+                                     filetypes=[("CSV files", "*.csv"), ("Parquet files", "*.parquet")])
+        if filename:
+            try:
+                self.history.export(filename, str(session.device.port))
+            except (OSError, ValueError) as e:
+                print(f"ERROR: {e}\r\nAttempting to continue...\r\n")
+
+    def render(self) -> None:
+        latest = self.history.latest
+        self.latest_label.config(text="    ".join(f"{label} {latest[name]:g}" for label, name in self.FIELDS.items()
+                                                   if name in latest and name != "cell_id")
+                                      + (f"    Cell {int(latest['cell_id']):08X}" if "cell_id" in latest else ""))
+        canvas = self.canvas
+        canvas.delete("plot")
+        width, height = canvas.winfo_width(), canvas.winfo_height()
+        plot_w, plot_h = width - self.MARGIN_X - PADDING_X, height - 2 * self.MARGIN_Y
+        if plot_w < 2 or plot_h < 2:
+            return
+        window_s = SIGNAL_WINDOWS[self.window_svar.get()]
+        now = time.time()
+        since = now - window_s if window_s else None
+        buckets = self.history.decimate(self.FIELDS[self.field_svar.get()], plot_w, since)
+        if not buckets:
+            canvas.create_text(width // 2, height // 2, text="No samples yet (poll AT+CESQ, AT%XMONITOR or enable "
+                               "%CESQ/+CEREG notifications)", fill=GRAY, font=LABEL_FONT, tags="plot")
+            return
+        t0 = since if since is not None else buckets[0][0]
+        t1 = now if since is not None else max(buckets[-1][0], t0 + 1)
+        lo = min(bucket[1] for bucket in buckets)
+        hi = max(bucket[2] for bucket in buckets)
+        if hi - lo < 1:
+            lo, hi = lo - 0.5, hi + 0.5
+        def x(t:float) -> float:
+            return self.MARGIN_X + (t - t0) / (t1 - t0) * plot_w
+        def y(value:float) -> float:
+            return self.MARGIN_Y + (hi - value) / (hi - lo) * plot_h
+        for value in (lo, (lo + hi) / 2, hi):
+            canvas.create_line(self.MARGIN_X, y(value), self.MARGIN_X + plot_w, y(value), fill=GRAY_0, dash=(2, 4), tags="plot")
+            canvas.create_text(self.MARGIN_X - PADDING_X, y(value), text=f"{value:.6g}", anchor=tk.E, fill=DARK_WHITE,
+                               font=LABEL_FONT, tags="plot")
+        for t, anchor in ((t0, tk.NW), (t1, tk.NE)):
+            canvas.create_text(x(t), self.MARGIN_Y + plot_h + 2, text=get_timestamp(when=t)[10:-5], anchor=anchor,
+                               fill=DARK_WHITE, font=LABEL_FONT, tags="plot")
+        coords = []
+        for t, low, high in buckets:     # One vertical stroke per bucket, joined into a single line item
+            coords += (x(t), y(high), x(t), y(low))
+        if len(coords) == 4:
+            coords += (coords[0] + 1, coords[3])
+        canvas.create_line(*coords, fill=LIGHT_ORANGE, tags="plot")
 
 
 # END - Custom Classes ############################################################################
@@ -436,112 +807,76 @@ class ATScriptButton(tk.Button):
 ####################################################################################################
 ######################################## Functions #################################################
 ####################################################################################################
+def load_icon(path:str, size:int=ICON_SIZE) -> PhotoImage:
+    """Returns a toolbar icon scaled to size x size pixels
+
+    Scaled copies are kept in ICON_CACHE_DIR and only regenerated (with PIL) when the source PNG is
+    newer than its copy, so a normal launch loads ready-made PNGs with Tk alone and never imports PIL.
+
+    Args:
+        path (str): Source PNG
+        size (int): Width and height of the icon
+    """
+    cached = os.path.join(ICON_CACHE_DIR, f"{os.path.splitext(os.path.basename(path))[0]}_{size}x{size}.png")
+    try:
+        fresh = os.path.getmtime(cached) >= os.path.getmtime(path)
+    except OSError:
+        fresh = False
+    if not fresh:
+        try:
+            from PIL import Image     # Imported lazily; only needed when the cache is stale
+            os.makedirs(ICON_CACHE_DIR, exist_ok=True)
+            Image.open(path).resize((size, size), Image.Resampling.LANCZOS).save(f"{cached}.tmp", format="PNG")
+            os.replace(f"{cached}.tmp", cached)
+        except (ImportError, OSError) as e:
+            # No PIL (or no write access): fall back to Tk's integer subsampling of the source
+            print(f"ERROR: {e}\r\nAttempting to continue...\r\n")
+            image = PhotoImage(file=path)
+            factor = max(1, image.width() // size)
+            return image.subsample(factor, factor)
+    return PhotoImage(file=cached)
+
 def get_devices() -> List[str]:
-    devices = serial.tools.list_ports.comports()
-    port_list = []
-    for dev in devices:
-        port_list.append(dev.name)
-    return port_list
+    """Returns the port watcher's cached port list (enumeration runs on the watcher's thread)"""
+    return port_watcher.list()
 
 def serprint(msg: str, response = False) -> None:
-    """Prints a string to the serial monitor widget with specified color.
+    """Queues a string for the serial monitor widget with specified color.
+
+    Safe to call from any thread: lines are rendered in batches on the Tk main loop by
+    drain_monitor(). If the queue stays full for MONITOR_PUT_TIMEOUT_S the line is dropped
+    and counted rather than stalling the caller.
 
     Args:
         msg (str): The message to be printed.
-        color (str): The color in which the message should be displayed.
+        response (bool): Print as a device response (white, indented) instead of light blue.
     """
-    color = "light blue" if not response else "white"
-    # Configure the tag for the specified color
-    serial_monitor.tag_config(color, foreground=color)
-    lines = msg.split("\n")
-    # Insert the message with the specified color tag
-    if response:
-        lines = msg.splitlines()
-        last_line = lines[-1]
-        while last_line.strip() == "" or last_line.strip() == "CLI>":
-            lines.pop()
-            last_line = lines[-1]
-        
-        first_line = lines[0]
-        while first_line.strip() == "":
-            lines.reverse()
-            lines.pop()
-            lines.reverse()
-            first_line = lines[0]
+    monitor.put(msg, response)
 
-        
-        # new_lines = []
-        # for i in range(len(lines)):
-        #     curr_line = lines[i]
-        #     next_line = lines[(i+1)%len(lines)]
-        #     new_lines.append(curr_line)
-        #     if curr_line.strip() == "":
-        #         while next_line.strip() == "":
-        #             i += 1
-        #             next_line = lines[(i+1)%len(lines)]
-        # lines = new_lines
-                    
-
-    prev_blank = False  # Previous line was blank - used to eradicate double new lines
-    for line in lines:
-        line = remove_ansi_escape_codes(line)
-        valid = True
-        # if (line.strip() == "") and (prev_blank == True):
-        #     valid = False
-        # if line.strip() != "":
-        #     prev_blank = False
-        # else:
-        #     prev_blank = True
-        if valid:
-            if response:
-                serial_monitor.insert(tk.END, " > ")
-            serial_monitor.insert(tk.END, f"{line}\r\n")
-            serial_monitor.tag_add(color, f"{float(serial_monitor.index(tk.END)) - 1:.1f}", tk.END)
-    
-    if response:
-        serial_monitor.insert(tk.END, "")
-    # Scroll to the end to keep the latest text in view
-    serial_monitor.see(tk.END)
+def monitor_notice(msg: str) -> None:
+    """Queues an uncolored status line (connection changes, etc.) for the serial monitor and log
 
-def load_commands() -> List[ATCommand]:
-    """Loads commands from "atcommands.json"
+    Mostly called on the Tk thread, which is the one draining the queue, so it never waits for room:
+    if the queue is full the line is dropped and counted (it still reaches the log).
+    """
+    session_logger.log("INFO", msg)
+    monitor.put_notice(msg)
+
+def drain_monitor() -> None:
+    """Renders queued serprint() lines into serial_monitor, then reschedules itself.
 
-    Returns:
-        List[ATCommand]: A list of ATCommand objects
+    Consecutive lines with the same color are joined so each batch costs one insert per color run
+    and at most a single scroll to the end. Lines are inserted through the monitor's scrollback.
     """
-    commands = []
-    with open("atcommands.json", 'r') as file:
-        data = json.load(file)
-        for c in data['general']:
-            one_line = (c['response_line_count'] == 1)
-            commands.append(ATCommand(c['command'],c['description'],one_liner=one_line))
-    return commands
-
-def get_timestamp(filename_usable:bool=False) -> str:
-    ts = dt.datetime.now()
-    # Contains symbols; used for serial output (not valid file names)
-    if not filename_usable:
-        ts_str = ts.strftime(format="%m%d%Y-%H:%M:%S.%f")[:-3]
-        return (f"[{ts_str}]")
-    # Valid file name; used for logs    
-    elif filename_usable:
-        return ts.strftime("%Y%m%d_%H%M%S")
+    runs = monitor.drain()
+    if runs:
+        scrollback.append(runs)
+    session.stats.set_gauge("monitor_queue", monitor.qsize())
+    root.after(MONITOR_TICK_MS, drain_monitor)
 
 def disable_typing(event) -> str:
     return "break"
 
-def remove_ansi_escape_codes(text) -> str:
-    """Used to remove the ANSI escape codes "ESC" (escape) and "[0m" (text color reset)
-
-    Args:
-        text (str): The text to be purged of undesirable symbols
-
-    Returns:
-        str: The newly pruned string
-    """
-    ansi_escape = re.compile(r'\x1b\[[0-9;]*m')
-    return ansi_escape.sub('', text)
-
 def on_copy():
     # Because Ctrl+C is not working natively for some dumb reason
     root.clipboard_clear()                                                        # Clear the clipboard
@@ -550,20 +885,19 @@ def on_copy():
 def on_enter():
     command = serial_input.get("1.0",tk.END)
     serial_input.delete("1.0", tk.END)
-    hub_write(command)
+    # Typed commands go ahead of queued scripts and polls, and never block the main thread
+    session.submit(hub_write, command, priority=PRIORITY_INTERACTIVE)
 
 def hub_write(text:str) -> None:
+    if not session.is_open:
+        serprint(f"{get_timestamp()} Error: Please connect to a serial device.")
+        return
     serprint(f"{get_timestamp()} -> {text.strip()}")
-    for c in text:
-        nRF9160.write(c.encode())
-        time.sleep(script.delay_s)
-    nRF9160.write(("\r\n").encode())
-    time.sleep(1)
     try:
-        response = nRF9160.read_all().decode()
+        response = session.send_command(text.strip()).text()
     except Exception as e:
         print(e)
-        pass
+        response = None
     if response:
         serprint(response, response=True)
 
@@ -583,22 +917,164 @@ def load_settings() -> Tuple[Union[str,None], int]:
 
     return port, baudrate
 
-def load_scripts() -> List[ATScript]:
-    directory = "./scripts"
-    scripts = []
-    for filename in os.listdir(directory):
-        f = os.path.join(directory, filename)
-        if os.path.isfile(f):
-            scripts.append(ATScript(f))
-    for script in scripts:
-        script.extract_commands()
-        # script.print_info()
-
-    # except:
-    #     print("./scripts/* could not be opened or is missing. No scripts will be loaded")
-    #     pass
+def upload_file(kind:str) -> None:
+    """Asks for a file and streams it to the modem on the session's command queue
 
-    return scripts
+    Args:
+        kind (str): "credential" (AT%CMNG, asks for the security tag and type) or "data" (Serial LTE
+            Modem data mode via AT#XSEND)
+    """
+    if not session.is_open:
+        serprint(f"{get_timestamp()} Error: Please connect to a serial device.")
+        return
+    filename = tkinter.filedialog.askopenfilename(title="Credential" if kind == "credential" else "Data mode payload")
+    if not filename:
+        return
+    args = ()
+    if kind == "credential":
+        sec_tag = askinteger("Credential", "Security tag:", parent=root, minvalue=0)
+        if sec_tag is None:
+            return
+        cred_type = askinteger("Credential", "Type (0 CA cert, 1 client cert, 2 private key, 3 PSK):",
+                               parent=root, minvalue=0, maxvalue=6, initialvalue=0)
+        if cred_type is None:
+            return
+        args = (sec_tag, cred_type)
+    session.submit(send_file, filename, kind, *args)
+
+def send_file(filename:str, kind:str, *args) -> None:
+    """Streams a file for upload_file(), reporting progress in quarters (runs on the command queue)"""
+    name = os.path.basename(filename)
+    reported = [0]
+    def on_progress(sent:int, total:Optional[int]) -> None:
+        if total and sent * 4 // total > reported[0]:
+            reported[0] = sent * 4 // total
+            monitor_notice(f"{get_timestamp()} {name}: {sent} of {total} bytes sent")
+    start = time.perf_counter()
+    try:
+        with open(filename, "rb") as f:
+            if kind == "credential":
+                serprint(f"{get_timestamp()} -> AT%CMNG=0,{args[0]},{args[1]},<{name}>")
+                response = session.write_credential(args[0], args[1], f, on_progress=on_progress)
+            else:
+                serprint(f"{get_timestamp()} -> AT#XSEND <{name}>")
+                response = session.send_data(f, on_progress=on_progress)
+    except Exception as e:
+        print(f"ERROR: {e}\r\nAttempting to continue...\r\n")
+        return
+    ATButton.print_response(ATCommand(response.command, timeout_s=PAYLOAD_TIMEOUT_S), response)
+    if response.ok:
+        elapsed = time.perf_counter() - start
+        monitor_notice(f"{get_timestamp()} {name}: {os.path.getsize(filename)} bytes in {elapsed:.1f} s")
+
+def add_poll() -> None:
+    """Polls the command in the Settings tab's poll box at the selected interval, printing each response"""
+    cmd = ATCommand(poll_svar.get().strip())
+    try:
+        interval_s = float(poll_interval_svar.get())
+    except ValueError:
+        interval_s = 0
+    if not cmd.cmd_s or interval_s <= 0:
+        serprint(f"{get_timestamp()} Error: Please enter a command and an interval in seconds.")
+        return
+    def on_response(response:ATResponse) -> None:
+        serprint(f"{get_timestamp()} -> {cmd.cmd_s} (poll)")
+        ATButton.print_response(cmd, response)
+    poll_tokens.append(session.poll(cmd, interval_s, on_response))
+    poll_count.config(text=f"{len(poll_tokens)} active")
+    monitor_notice(f"{get_timestamp()} Polling {cmd.cmd_s} every {interval_s:g} s")
+
+def clear_polls() -> None:
+    for token in poll_tokens:
+        session.cancel_poll(token)
+    poll_tokens.clear()
+    poll_count.config(text="0 active")
+
+def toggle_recording() -> None:
+    """Starts or stops recording the session's raw traffic for replay"""
+    if session.recorder is not None:
+        filename, records = session.recorder.filename, session.recorder.records
+        session.stop_recording()
+        record_button.config(text="Record")
+        monitor_notice(f"{get_timestamp()} Recording stopped: {records} chunks saved to {filename}")
+        return
+    try:
+        filename = session.start_recording()
+    except OSError as e:
+        serprint(f"{get_timestamp()} Error: Could not start recording: {e}")
+        return
+    record_button.config(text="Stop Recording")
+    monitor_notice(f"{get_timestamp()} Recording to {filename}")
+
+def toggle_replay() -> None:
+    """Plays a recording into the serial monitor at the selected speed, or stops the one playing"""
+    global replay
+    if replay is not None:
+        replay.stop()
+        return
+    filename = tkinter.filedialog.askopenfilename(title="Session recording", initialdir=LOG_DIR,
+                                                  filetypes=[("Session recordings", "*.atrec"), ("All files", "*")])
+    if not filename:
+        return
+    speed = replay_speed_svar.get()
+    try:
+        replay = Replay(session, filename, None if speed == "max" else float(speed.rstrip("x")),
+                        on_tx=lambda line: serprint(f"{get_timestamp()} -> {line}"),
+                        on_response=lambda response: ATButton.print_response(ATCommand(response.command), response))
+    except (OSError, ValueError) as e:
+        serprint(f"{get_timestamp()} Error: Could not replay \"{filename}\": {e}")
+        return
+    monitor_notice(f"{get_timestamp()} Replaying {os.path.basename(filename)} "
+                   f"({replay.recording.duration_s:.1f} s recorded on {replay.recording.meta.get('port')}) at {speed}")
+    replay.start()
+    replay_button.config(text="Stop")
+    root.after(REPLAY_REFRESH_MS, refresh_replay)
+
+def toggle_bridge() -> None:
+    """Shares the session on the address in the Settings tab's bridge box, or stops sharing it"""
+    global bridge
+    if bridge is not None:
+        bridge.stop()
+        bridge = None
+        bridge_button.config(text="Share")
+        bridge_status.config(text="")
+        monitor_notice(f"{get_timestamp()} Stopped sharing the session")
+        return
+    def on_command(client:str, response:ATResponse) -> None:
+        serprint(f"{get_timestamp()} -> {response.command} (from {client})")
+        ATButton.print_response(ATCommand(response.command), response)
+    def on_client(client:str, event:str) -> None:
+        monitor_notice(f"{get_timestamp()} Bridge client {client}: {event}")
+    try:
+        bridge = SessionBridge(session, bridge_svar.get().strip(), on_command=on_command, on_client=on_client)
+        bridge.start()
+    except (OSError, ValueError) as e:
+        serprint(f"{get_timestamp()} Error: Could not share the session on \"{bridge_svar.get()}\": {e}")
+        bridge = None
+        return
+    bridge_button.config(text="Stop Sharing")
+    monitor_notice(f"{get_timestamp()} Sharing the session on {bridge.address}")
+    root.after(BRIDGE_REFRESH_MS, refresh_bridge)
+
+def refresh_bridge() -> None:
+    """Shows the number of bridge clients while the session is shared"""
+    if bridge is None:
+        return
+    bridge_status.config(text=f"{len(bridge.clients)} clients" + (f", {bridge.disconnected} dropped" if bridge.disconnected else ""))
+    root.after(BRIDGE_REFRESH_MS, refresh_bridge)
+
+def refresh_replay() -> None:
+    """Shows the replay position until it ends or is stopped"""
+    global replay
+    if replay.device.finished.is_set() or not replay.device.is_open:
+        replay.stop()
+        monitor_notice(f"{get_timestamp()} Replay finished: {replay.responses} responses")
+        replay_status.config(text="")
+        replay_button.config(text="Open...")
+        replay = None
+        return
+    replay_status.config(text=f"{replay.position_s:.1f} / {replay.recording.duration_s:.1f} s")
+    root.after(REPLAY_REFRESH_MS, refresh_replay)
 
 def save_log() -> None:
     ts = get_timestamp(filename_usable=True)
@@ -607,35 +1083,65 @@ def save_log() -> None:
                          initialfile=f"atclog_{ts}",
                          filetypes=[("Text files", "*.txt"), ("All files", "*.*")])
     if file is not None:
-        if file.writable():
-            file.writelines(serial_monitor.get(index1=1.0,index2=tk.END).split("\n"))
+        with file:
+            if file.writable():
+                session_logger.copy_to(file)
 
 def refresh_devices() -> None:
+    """Asks the port watcher to re-enumerate now; the menus are updated when its events arrive"""
+    port_watcher.wake()
+
+def update_port_menus(added:List[str], removed:List[str]) -> None:
+    """Adds and removes port menu entries in place, leaving the current selections alone"""
     global port_list
-    global port_menu
     port_list = get_devices()
-    port_menu['menu'].delete(0,tk.END)
-    menu = port_menu["menu"]
-    for port in port_list:
-        menu.add_command(label=port, command=lambda value=port: port_svar.set(value))
-    port_svar.set("Select Port")  # Reset to default
+    for option_menu, svar in ((port_menu, port_svar), (capture_port_menu, capture_port_svar)):
+        if option_menu is None:
+            continue    # Tab not built yet; it starts from the current port_list
+        menu = option_menu["menu"]
+        end = menu.index(tk.END)
+        for i in reversed(range(end + 1 if end is not None else 0)):
+            label = menu.entrycget(i, "label")
+            if label in removed or label == "Select Port":
+                menu.delete(i)
+        for port in added:
+            menu.add_command(label=port, command=lambda value=port, svar=svar: svar.set(value))
+
+def drain_port_events() -> None:
+    """Applies hotplug and reconnect events from the port watcher thread, then reschedules itself"""
+    while True:
+        try:
+            event = port_events.get_nowait()
+        except queue.Empty:
+            break
+        if event[0] == "ports":
+            update_port_menus([info.device for info in event[1]], [info.device for info in event[2]])
+        elif event[0] == "lost":
+            conn_switch.show(False)
+            monitor_notice(f"{get_timestamp()} Connection to {event[1]} lost. Waiting for the device to return...")
+        elif event[0] == "reconnected":
+            port_svar.set(event[1])
+            conn_switch.show(True)
+            monitor_notice(f"{get_timestamp()} Reconnected: PORT={event[1]}, BAUD={baud_ivar.get()}.")
+    root.after(PORT_EVENTS_POLL_MS, drain_port_events)
 
 def print_info() -> None:
     serprint(f"port_list        = {port_list}")
     serprint(f"port_svar        = {port_svar}")
     serprint(f"port_svar.get()  = {port_svar.get()}")
 
-def get_cmd_columns(event=None):
-    root.update_idletasks()  # Ensure all geometry is updated
-    button_width_pixels = command_buttons[0].winfo_reqwidth()  # Get the actual width of the buttons in pixels
-    columns = max(1, int(commands_tab.winfo_width() / button_width_pixels))  # Calculate the number of columns
-
-    for i, button in enumerate(command_buttons):
-        row = i // columns  # Calculate row number
-        col = i % columns   # Calculate column number
-        button.grid(row=row, column=col, padx=PADDING_X, pady=PADDING_Y)
+def schedule_script_columns(event=None) -> None:
+    """Lays out the script buttons once resizing pauses, instead of on every <Configure> event"""
+    global script_layout_job
+    if script_layout_job is not None:
+        root.after_cancel(script_layout_job)
+    script_layout_job = root.after(LAYOUT_DEBOUNCE_MS, get_script_columns)
 
 def get_script_columns(event=None):
+    global script_layout_job
+    script_layout_job = None
+    if not script_buttons:
+        return
     root.update_idletasks()  # Ensure all geometry is updated
     button_width_pixels = script_buttons[0].winfo_reqwidth()  # Get the actual width of the buttons in pixels
     columns = max(1, int(scripts_tab.winfo_width() / button_width_pixels))  # Calculate the number of columns
@@ -645,12 +1151,133 @@ def get_script_columns(event=None):
         col = i % columns   # Calculate column number
         button.grid(row=row, column=col, padx=PADDING_X, pady=PADDING_Y)
 
+def refresh_scripts() -> None:
+    """Rebuilds the script buttons when files in ./scripts are added, changed or removed, then reschedules itself"""
+    if script_library.scan():
+        for button in script_buttons:
+            button.destroy()
+        script_buttons[:] = [ATScriptButton(master=scripts_tab, script=script) for script in script_library.list()]
+        get_script_columns()
+    root.after(SCRIPT_SCAN_INTERVAL_MS, refresh_scripts)
+
+
+def format_stats(snap:dict) -> str:
+    """Renders a SessionStats snapshot as a fixed-width table for the Stats tab"""
+    def ms(value):
+        return "-" if value is None else f"{value:.1f}"
+    lock = snap["lock_wait"]
+    out = [f"Uptime {snap['uptime_s']:.0f} s    "
+           f"RX {snap['bytes_in']} B ({snap['rx_bytes_per_s']:.0f} B/s)    "
+           f"TX {snap['bytes_out']} B ({snap['tx_bytes_per_s']:.0f} B/s)",
+           f"Lock wait: n={lock['count']} p50={ms(lock['p50_ms'])} ms p95={ms(lock['p95_ms'])} ms max={ms(lock['max_ms'])} ms",
+           "Gauges: " + ", ".join(f"{name}={value}" for name, value in snap["gauges"].items()),
+           "",
+           f"{'Command':<24}{'n':>6}{'err':>5}{'t/o':>5}{'1st p50':>9}{'1st p95':>9}{'fin p50':>9}{'fin p95':>9}{'fin max':>9}"]
+    for cmd_s, e in sorted(snap["commands"].items(), key=lambda item: -item[1]["count"]):
+        first, final = e["first_byte"], e["final"]
+        out.append(f"{cmd_s[:23]:<24}{e['count']:>6}{e['errors']:>5}{e['timeouts']:>5}"
+                   f"{ms(first['p50_ms']):>9}{ms(first['p95_ms']):>9}"
+                   f"{ms(final['p50_ms']):>9}{ms(final['p95_ms']):>9}{ms(final['max_ms']):>9}")
+    return "\n".join(out)
+
+def refresh_stats() -> None:
+    """Redraws the Stats tab if it is selected, then reschedules itself"""
+    if notebook.select() == str(stats_tab):
+        stats_text.config(state=tk.NORMAL)
+        stats_text.delete("1.0", tk.END)
+        stats_text.insert(tk.END, format_stats(session.stats.snapshot()))
+        stats_text.config(state=tk.DISABLED)
+    root.after(STATS_REFRESH_MS, refresh_stats)
+
+def refresh_log() -> None:
+    """Feeds new lines to the Log tab if it is selected, then reschedules itself"""
+    if notebook.select() == str(log_tab):
+        log_view.refresh()
+    root.after(LOG_REFRESH_MS, refresh_log)
+
+def refresh_signal() -> None:
+    """Redraws the Signal tab's plot if it is selected, then reschedules itself"""
+    if notebook.select() == str(signal_tab):
+        signal_view.render()
+    root.after(SIGNAL_REFRESH_MS, refresh_signal)
+
+def toggle_capture() -> None:
+    """Starts or stops the raw capture of the port selected on the Capture tab"""
+    global raw_capture
+    if raw_capture is not None and raw_capture.running:
+        raw_capture.stop()
+        monitor_notice(f"{get_timestamp()} Capture stopped: {raw_capture.stats()['bytes']} bytes saved to {raw_capture.filename}")
+        capture_button.config(text="Start Capture")
+        return
+    port = capture_port_svar.get()
+    if port == "Select Port":
+        serprint(f"{get_timestamp()} Error: Please select a port to capture.")
+        return
+    raw_capture = RawCapture(port, capture_baud_ivar.get())
+    try:
+        raw_capture.start()
+    except (serial.SerialException, OSError) as e:
+        serprint(f"{get_timestamp()} Error: Could not capture \"{port}\": {e}")
+        raw_capture = None
+        return
+    capture_button.config(text="Stop Capture")
+    monitor_notice(f"{get_timestamp()} Capturing {port} to {raw_capture.filename}")
+
+def refresh_capture() -> None:
+    """Redraws the Capture tab's counters and hex view if it is selected, then reschedules itself"""
+    if raw_capture is not None and notebook.select() == str(capture_tab):
+        stats = raw_capture.stats()
+        state = "capturing" if raw_capture.running else f"stopped ({raw_capture.error or 'idle'})"
+        capture_status.config(text=f"{state}: {stats['bytes']} bytes, {stats['bytes_per_s'] / 1024:.1f} KiB/s, "
+                                   f"{stats['buffered']} buffered, {stats['stalls']} stalls")
+        if not raw_capture.running and capture_button.cget("text") != "Start Capture":
+            capture_button.config(text="Start Capture")
+        if capture_hex_ivar.get():
+            offset, data = raw_capture.snapshot(CAPTURE_HEX_BYTES)
+            capture_hex.config(state=tk.NORMAL)
+            capture_hex.delete("1.0", tk.END)
+            capture_hex.insert(tk.END, hexdump(data, offset))
+            capture_hex.config(state=tk.DISABLED)
+    root.after(CAPTURE_REFRESH_MS, refresh_capture)
+
+def build_tab(event=None) -> None:
+    """Builds the selected notebook tab the first time it is shown (see lazy_tabs)"""
+    builder = lazy_tabs.pop(notebook.select(), None)
+    if builder is not None:
+        start = time.perf_counter()
+        builder()
+        print(f"{builder.__name__}: {(time.perf_counter() - start) * 1000:.0f} ms")
+
+def report_startup() -> None:
+    """Prints and logs how long each startup stage took, once the window is first idle"""
+    startup_marks.append(("first idle", time.perf_counter()))
+    stages = ", ".join(f"{stage} {(t - startup_marks[i][1]) * 1000:.0f} ms"
+                       for i, (stage, t) in enumerate(startup_marks[1:]))
+    total = (startup_marks[-1][1] - startup_marks[0][1]) * 1000
+    print(f"Startup: {stages} (total {total:.0f} ms)")
+    session_logger.log("INFO", f"Startup: {stages} (total {total:.0f} ms)")
+
+def save_stats() -> None:
+    ts = get_timestamp(filename_usable=True)
+    filename = asksaveasfilename(confirmoverwrite=True,
+                                 defaultextension=".json",
+                                 initialfile=f"atcstats_{ts}",
+                                 filetypes=[("JSON files", "*.json"), ("CSV files", "*.csv")])
+    if filename:
+        try:
+            export_stats({str(session.device.port): session.stats}, filename)
+        except OSError as e:
+            print(f"ERROR: {e}\r\nAttempting to continue...\r\n")
 
 
 ####################################################################################################
 ######################################### WIDGETS ##################################################
 ####################################################################################################
 loaded_port, loaded_baud = load_settings()
+session_logger.start()
+atexit.register(session_logger.stop)
+port_watcher.start()
+atexit.register(port_watcher.stop)
 
 # TOOLBAR ##########################################################################################
 # Buttons
@@ -666,6 +1293,7 @@ tool_refresh.pack(side=tk.LEFT)
 tool_info.pack(side=tk.LEFT)
 tool_settings.pack(side=tk.LEFT)
 tool_export.pack(side=tk.LEFT)
+startup_marks.append(("toolbar", time.perf_counter()))
 # END - TOOLBAR ###################################################################################
 
 
@@ -680,9 +1308,19 @@ notebook.pack(fill='both', padx=2, pady=2)
 settings_tab    = ttk.Frame(notebook)
 commands_tab    = ttk.Frame(notebook)
 scripts_tab     = ttk.Frame(notebook)
+stats_tab       = ttk.Frame(notebook)
+log_tab         = ttk.Frame(notebook)
+signal_tab      = ttk.Frame(notebook)
+capture_tab     = ttk.Frame(notebook)
 notebook.add(settings_tab, text=" Settings ", )
 notebook.add(commands_tab, text=" Commands ")
 notebook.add(scripts_tab, text=" Scripts ")
+notebook.add(stats_tab, text=" Stats ")
+notebook.add(log_tab, text=" Log ")
+notebook.add(signal_tab, text=" Signal ")
+notebook.add(capture_tab, text=" Capture ")
+lazy_tabs = {}  # Tab widget name -> function building its contents the first time it is shown
+notebook.bind("<<NotebookTabChanged>>", build_tab)
 # END - NOTEBOOK #################################################################################
 
 
@@ -691,14 +1329,14 @@ notebook.add(scripts_tab, text=" Scripts ")
 column1 = tk.Frame(settings_tab)
 column1.pack(side=tk.LEFT)
 # COM Port select
-port_list = get_devices()                                       # Get list of serial ports
+port_list = get_devices()                                       # Cached list; filled in by the port watcher
 port_frame = tk.Frame(column1)                                  # Make frame for port selection
 port_frame.pack(side=tk.TOP)                                    # Pack frame into GUI
 port_labl = Label(port_frame, text="Port:", cnf=LABEL_CNF)      #   Label the selection box
 port_labl.pack(side=tk.LEFT)                                    #   Pack the label into the frame
 port_svar = StringVar(root)                                     #   Create a variable to store port selectin
 port_svar.set(loaded_port)                                      #   Default variable to display "Select Port"
-port_menu = OptionMenu(port_frame, port_svar, *port_list)       #   Create drop-down menu listing port options
+port_menu = OptionMenu(port_frame, port_svar, *(port_list or ["Select Port"]))   #   Create drop-down menu listing port options
 port_menu.config(font=LABEL_FONT, cnf=OPTION_CNF)               #   Configure the menu style
 port_menu.pack(side=tk.LEFT)                                    #   Pack menu into frame
 # Baudrate select
@@ -711,6 +1349,16 @@ baud_ivar.set(loaded_baud)                                      #   Set the baud
 baud_menu = OptionMenu(baud_frame, baud_ivar, *BAUD_OPTIONS)    #   Create Drop-down menu listing baud options
 baud_menu.config(font=LABEL_FONT, cnf=OPTION_CNF)               #   Configure the menu style
 baud_menu.pack(side=tk.LEFT)                                    #   Pack menu into frame
+# Flow control select (applied between commands, also while connected)
+flow_frame = tk.Frame(column1)                                  # Make frame for flow control selection
+flow_frame.pack(side=tk.TOP)                                    # Pack frame into GUI
+flow_labl = Label(flow_frame, text="Flow:", cnf=LABEL_CNF)      #   Label the selection box
+flow_labl.pack(side=tk.LEFT)                                    #   Pack the label into the frame
+flow_svar = StringVar(root, value=session.flow_control)         #   Create a variable to store the flow control
+flow_menu = OptionMenu(flow_frame, flow_svar, *FLOW_CONTROLS,
+                       command=lambda value: session.submit(session.set_flow_control, value))
+flow_menu.config(font=LABEL_FONT, cnf=OPTION_CNF)               #   Configure the menu style
+flow_menu.pack(side=tk.LEFT)                                    #   Pack menu into frame
 # Connect button
 conn_frame = tk.Frame(column1)                                      # Make frame for serial connect button
 conn_frame.pack(side=tk.TOP)                                        # Pack frame into GUI
@@ -718,6 +1366,22 @@ conn_labl = Label(conn_frame, text="Connection:", cnf=LABEL_CNF)    #   Label th
 conn_labl.pack(side=tk.LEFT)                                        #   Pack label into the frame
 conn_switch = SerialPowerSwitch(master=conn_frame, font=LABEL_FONT) #   Create toggle switch button
 conn_switch.pack(side=tk.LEFT)        #   Pack button into frame
+# Auto-reconnect button: reopen the port when the device re-enumerates (matched by USB serial number)
+recon_frame = tk.Frame(column1)                                         # Make frame for auto-reconnect button
+recon_frame.pack(side=tk.TOP)                                           # Pack frame into GUI
+recon_labl = Label(recon_frame, text="Reconnect:", cnf=LABEL_CNF)       #   Label the auto-reconnect button
+recon_labl.pack(side=tk.LEFT)                                           #   Pack label into the frame
+recon_switch = AutoReconnectSwitch(master=recon_frame, font=LABEL_FONT) #   Create toggle switch button
+recon_switch.pack(side=tk.LEFT)                                         #   Pack button into frame
+# Bulk uploads: credentials (AT%CMNG) and Serial LTE Modem data mode payloads, streamed in chunks
+upload_frame = tk.Frame(column1)                                        # Make frame for upload buttons
+upload_frame.pack(side=tk.TOP)                                          # Pack frame into GUI
+upload_labl = Label(upload_frame, text="Upload:", cnf=LABEL_CNF)        #   Label the upload buttons
+upload_labl.pack(side=tk.LEFT)                                          #   Pack label into the frame
+upload_cred = tk.Button(upload_frame, text="Credential...", font=LABEL_FONT, command=lambda: upload_file("credential"))
+upload_cred.pack(side=tk.LEFT, padx=PADDING_X, pady=PADDING_Y)
+upload_data = tk.Button(upload_frame, text="Data Mode...", font=LABEL_FONT, command=lambda: upload_file("data"))
+upload_data.pack(side=tk.LEFT, padx=PADDING_X, pady=PADDING_Y)
 # Column 2
 column2 = tk.Frame(settings_tab,background=TAB_ACTIVE_BG)
 column2.pack(side=tk.LEFT, fill=tk.Y)
@@ -729,28 +1393,152 @@ trac_labl = Label(column2,
                   text="Show Unsolicited Messages", cnf=LABEL_CNF)      #   Label the connect button
 trac_labl.pack(side=tk.LEFT)                                            #   Pack label into the frame
 trac_switch = LiveTraceSwitch(master=column2, font=LABEL_FONT)          #   Create toggle switch button
+session.subscribe(trac_switch.show_unsolicited)                         #   Show unsolicited lines from the reader
 trac_switch.pack(side=tk.LEFT,padx=PADDING_X,pady=PADDING_Y)            #   Pack button into frame
+
+# Column 3
+column3 = tk.Frame(settings_tab)
+column3.pack(side=tk.LEFT, fill=tk.Y, padx=PADDING_X)
+
+# Recurring polls: run in the background, after any manual command; polls due together share a round trip
+poll_tokens = []
+poll_frame = tk.Frame(column3)                                          # Make frame for poll controls
+poll_frame.pack(side=tk.TOP)                                            # Pack frame into GUI
+poll_labl = Label(poll_frame, text="Poll:", cnf=LABEL_CNF)              #   Label the poll controls
+poll_labl.pack(side=tk.LEFT)
+poll_svar = StringVar(root, value="AT+CEREG?")                          #   Command to poll
+Entry(poll_frame, textvariable=poll_svar, font=LABEL_FONT, width=14).pack(side=tk.LEFT, padx=PADDING_X)
+poll_interval_svar = StringVar(root, value="10")                        #   Interval in seconds
+Entry(poll_frame, textvariable=poll_interval_svar, font=LABEL_FONT, width=5).pack(side=tk.LEFT, padx=PADDING_X)
+Label(poll_frame, text="s", cnf=LABEL_CNF).pack(side=tk.LEFT)
+tk.Button(poll_frame, text="Add", font=LABEL_FONT, command=add_poll).pack(side=tk.LEFT, padx=PADDING_X)
+tk.Button(poll_frame, text="Clear", font=LABEL_FONT, command=clear_polls).pack(side=tk.LEFT, padx=PADDING_X)
+poll_count = Label(poll_frame, text="0 active", font=LABEL_FONT)
+poll_count.pack(side=tk.LEFT, padx=PADDING_X)
+
+# Session recording, and replay of a recording through the parser into the serial monitor
+replay = None
+record_frame = tk.Frame(column3)                                        # Make frame for record/replay controls
+record_frame.pack(side=tk.TOP, anchor=tk.W, pady=PADDING_Y)             # Pack frame into GUI
+record_button = tk.Button(record_frame, text="Record", font=LABEL_FONT, command=toggle_recording)
+record_button.pack(side=tk.LEFT, padx=PADDING_X)
+Label(record_frame, text="Replay:", cnf=LABEL_CNF).pack(side=tk.LEFT)   #   Label the replay controls
+replay_speed_svar = StringVar(root, value="10x")                        #   Playback speed
+OptionMenu(record_frame, replay_speed_svar, *REPLAY_SPEEDS).pack(side=tk.LEFT, padx=PADDING_X)
+replay_button = tk.Button(record_frame, text="Open...", font=LABEL_FONT, command=toggle_replay)
+replay_button.pack(side=tk.LEFT, padx=PADDING_X)
+replay_status = Label(record_frame, text="", font=LABEL_FONT)
+replay_status.pack(side=tk.LEFT, padx=PADDING_X)
+atexit.register(session.stop_recording)
+
+# Local socket bridge: other programs share this session, their commands queued with the GUI's
+bridge = None
+bridge_frame = tk.Frame(column3)                                        # Make frame for bridge controls
+bridge_frame.pack(side=tk.TOP, anchor=tk.W, pady=PADDING_Y)             # Pack frame into GUI
+Label(bridge_frame, text="Bridge:", cnf=LABEL_CNF).pack(side=tk.LEFT)   #   Label the bridge controls
+bridge_svar = StringVar(root, value=f"{BRIDGE_HOST}:{BRIDGE_PORT}")     #   host:port or unix:PATH
+Entry(bridge_frame, textvariable=bridge_svar, font=LABEL_FONT, width=18).pack(side=tk.LEFT, padx=PADDING_X)
+bridge_button = tk.Button(bridge_frame, text="Share", font=LABEL_FONT, command=toggle_bridge)
+bridge_button.pack(side=tk.LEFT, padx=PADDING_X)
+bridge_status = Label(bridge_frame, text="", font=LABEL_FONT)
+bridge_status.pack(side=tk.LEFT, padx=PADDING_X)
+atexit.register(lambda: bridge.stop() if bridge is not None else None)
+startup_marks.append(("settings tab", time.perf_counter()))
 # END - SETTINGS TAB  #############################################################################
 
 
+# The tabs below are built the first time they are selected (see build_tab)
+
 # COMMANDS TAB ####################################################################################
-# AT Command buttons
-command_buttons = []
-at_commands = load_commands()
-for command in at_commands:
-    command_buttons.append(ATButton(master=commands_tab, at_command=command))
-commands_tab.bind("<Configure>", get_cmd_columns)
+# AT Command palette: filter box, "Run All" for the matches, and a virtualized grid of command buttons
+command_palette: Optional[CommandPalette] = None
+def build_commands_tab() -> None:
+    global command_palette
+    command_palette = CommandPalette(commands_tab, load_commands())
+lazy_tabs[str(commands_tab)] = build_commands_tab
 # END - COMMANDS TAB ##############################################################################
 
 # SCRIPTS TAB #####################################################################################
 # Script buttons
 script_buttons = []
-scripts = load_scripts()
-for script in scripts:
-    script_buttons.append(ATScriptButton(master=scripts_tab, script=script))
-scripts_tab.bind("<Configure>", get_script_columns)
+script_layout_job = None
+script_library = ScriptLibrary()    # Headers only; bodies are parsed when a script is first run
+def build_scripts_tab() -> None:
+    refresh_scripts()
+    scripts_tab.bind("<Configure>", schedule_script_columns)
+lazy_tabs[str(scripts_tab)] = build_scripts_tab
 # END - SCRIPTS TAB ##############################################################################
 
+# STATS TAB #######################################################################################
+# Per-command latencies, lock wait, link throughput and queue depths, exportable as JSON/CSV
+stats_text: Optional[Text] = None
+def build_stats_tab() -> None:
+    global stats_text
+    stats_buttons = tk.Frame(stats_tab)
+    stats_buttons.pack(side=tk.TOP, anchor=tk.W)
+    stats_export = tk.Button(stats_buttons, text="Export...", font=LABEL_FONT, width=BUTTON_WIDTH, command=save_stats)
+    stats_export.pack(side=tk.LEFT, padx=PADDING_X, pady=PADDING_Y)
+    stats_reset = tk.Button(stats_buttons, text="Reset", font=LABEL_FONT, width=BUTTON_WIDTH, command=session.stats.reset)
+    stats_reset.pack(side=tk.LEFT, padx=PADDING_X, pady=PADDING_Y)
+    stats_text = Text(stats_tab, height=12, fg=WHITE, bg=GRAY_1, font=MONITOR_FONT, state=tk.DISABLED)
+    stats_text.pack(side=tk.TOP, fill=X, padx=PADDING_X, pady=PADDING_Y)
+    refresh_stats()
+lazy_tabs[str(stats_tab)] = build_stats_tab
+# END - STATS TAB #################################################################################
+
+# LOG TAB #########################################################################################
+# Indexed, filterable view of every TX/RX/URC line of the session
+log_view: Optional[LogView] = None
+def build_log_tab() -> None:
+    global log_view
+    log_view = LogView(log_tab, line_store)
+    refresh_log()
+lazy_tabs[str(log_tab)] = build_log_tab
+# END - LOG TAB ###################################################################################
+
+# SIGNAL TAB ######################################################################################
+# RSRP/RSRQ/SNR, registration state and cell ID over time, from URCs and command responses alike
+signal_view: Optional[SignalView] = None
+def build_signal_tab() -> None:
+    global signal_view
+    signal_view = SignalView(signal_tab, session.signal)
+    refresh_signal()
+lazy_tabs[str(signal_tab)] = build_signal_tab
+# END - SIGNAL TAB ################################################################################
+
+# CAPTURE TAB #####################################################################################
+# Raw byte capture of a second port (e.g. the modem trace UART) straight to a .bin file
+raw_capture: Optional[RawCapture] = None
+capture_port_menu: Optional[OptionMenu] = None
+capture_port_svar: Optional[StringVar] = None
+atexit.register(lambda: raw_capture.stop() if raw_capture is not None and raw_capture.running else None)
+def build_capture_tab() -> None:
+    global capture_port_svar, capture_port_menu, capture_baud_ivar, capture_button, capture_hex_ivar, capture_status, capture_hex
+    capture_frame = tk.Frame(capture_tab)                                   # Make frame for capture controls
+    capture_frame.pack(side=tk.TOP, anchor=tk.W)                            # Pack frame into GUI
+    capture_port_labl = Label(capture_frame, text="Port:", cnf=LABEL_CNF)   #   Label the port selection
+    capture_port_labl.pack(side=tk.LEFT)
+    capture_port_svar = StringVar(root, value="Select Port")                #   Port to capture
+    capture_port_menu = OptionMenu(capture_frame, capture_port_svar, *(port_list or ["Select Port"]))
+    capture_port_menu.config(font=LABEL_FONT, cnf=OPTION_CNF)
+    capture_port_menu.pack(side=tk.LEFT)
+    capture_baud_ivar = IntVar(root, value=CAPTURE_BAUD_OPTIONS[0])         #   Capture baud rate
+    capture_baud_menu = OptionMenu(capture_frame, capture_baud_ivar, *CAPTURE_BAUD_OPTIONS)
+    capture_baud_menu.config(font=LABEL_FONT, cnf=OPTION_CNF)
+    capture_baud_menu.pack(side=tk.LEFT, padx=PADDING_X)
+    capture_button = tk.Button(capture_frame, text="Start Capture", font=LABEL_FONT, width=BUTTON_WIDTH, command=toggle_capture)
+    capture_button.pack(side=tk.LEFT, padx=PADDING_X, pady=PADDING_Y)
+    capture_hex_ivar = IntVar(root, value=0)                                #   Optional hex view of the newest bytes
+    capture_hex_check = Checkbutton(capture_frame, text="Hex view", variable=capture_hex_ivar, font=LABEL_FONT)
+    capture_hex_check.pack(side=tk.LEFT, padx=PADDING_X)
+    capture_status = Label(capture_tab, text="idle", font=LABEL_FONT, anchor=tk.W)
+    capture_status.pack(side=tk.TOP, fill=X, padx=PADDING_X)
+    capture_hex = Text(capture_tab, height=12, fg=WHITE, bg=GRAY_1, font=MONITOR_FONT, state=tk.DISABLED)
+    capture_hex.pack(side=tk.TOP, fill=X, padx=PADDING_X, pady=PADDING_Y)
+    refresh_capture()
+lazy_tabs[str(capture_tab)] = build_capture_tab
+# END - CAPTURE TAB ###############################################################################
+
 # SERIAL INPUT ##################################################################################
 serial_input.pack(padx=PADDING_X, pady=PADDING_Y)
 serial_input.bind("<Return>", lambda event: on_enter())
@@ -760,8 +1548,17 @@ serial_input.bind("<Return>", lambda event: on_enter())
 serial_monitor.pack(padx=PADDING_X, pady=PADDING_Y)
 serial_monitor.bind("<Key>", disable_typing)
 serial_monitor.bind("<Control-c>", lambda event: on_copy())
+for color in ("light blue", "white"):
+    serial_monitor.tag_config(color, foreground=color)
+scrollback = MonitorScrollback(serial_monitor)
+for sequence in ("<MouseWheel>", "<Button-4>", "<Prior>"):
+    serial_monitor.bind(sequence, lambda event: root.after_idle(scrollback.on_scroll), add="+")
+root.after(MONITOR_TICK_MS, drain_monitor)
+root.after(PORT_EVENTS_POLL_MS, drain_port_events)
+startup_marks.append(("monitor", time.perf_counter()))
 # END - SERIAL MONITOR ############################################################################
 
+root.after_idle(report_startup)
 root.mainloop()
 
 
@@ -0,0 +1,216 @@
+# Devon White, PPD 2024
+# AT Commander - Serial monitor buffering: the cross-thread line queue and the bounded scrollback
+#
+# Kept apart from main.py, which builds its window on import, so benchmark.py can drive the same
+# code against a bare Text widget.
+
+import atexit
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import tkinter as tk
+from array import array
+from collections import deque
+from tkinter import Text
+from typing import List, Tuple
+
+from engine import get_timestamp, remove_ansi_escape_codes
+
+MONITOR_BATCH_MAX = 5000    # Maximum lines rendered per tick
+MONITOR_QUEUE_MAX = 20000   # Lines buffered for the monitor before producers are throttled
+MONITOR_PUT_TIMEOUT_S = 0.05    # How long a producer waits on a full queue before dropping the line
+SCROLLBACK_MAX_LINES = 10000   # Lines kept in the serial monitor before the oldest are spilled to disk
+SCROLLBACK_MAX_CHARS = 2000000 # Approximate memory budget for the serial monitor's text
+SCROLLBACK_PAGE_LINES = 1000   # Spilled lines paged back in per scroll past the top
+
+
+class MonitorQueue():
+    """Lines waiting for the serial monitor, put from any thread and drained in batches on the Tk loop
+
+    Args:
+        maxsize (int): Lines buffered before producers are throttled
+        put_timeout_s (float): How long put() waits on a full queue before dropping the line
+    """
+    def __init__(self, maxsize:int=MONITOR_QUEUE_MAX, put_timeout_s:float=MONITOR_PUT_TIMEOUT_S) -> None:
+        self.queue = queue.Queue(maxsize=maxsize)   # (text, color) lines waiting for drain()
+        self.put_timeout_s = put_timeout_s
+        self.dropped = 0    # Lines dropped since the last drain because the queue was full...
+        self.dropped_total = 0  # ...and since the queue was created
+        self.drop_lock = threading.Lock()
+
+    def put(self, msg:str, response:bool=False) -> None:
+        """Queues a message, one entry per line, waiting at most put_timeout_s for room
+
+        Args:
+            msg (str): The message to be printed.
+            response (bool): Print as a device response (white, indented) instead of light blue.
+        """
+        color = "light blue" if not response else "white"
+        lines = msg.split("\n")
+        if response:
+            lines = msg.splitlines()
+            while lines and (lines[-1].strip() == "" or lines[-1].strip() == "CLI>"):
+                lines.pop()
+            while lines and lines[0].strip() == "":
+                lines.pop(0)
+
+        prefix = " > " if response else ""
+        for line in lines:
+            line = remove_ansi_escape_codes(line)
+            try:
+                self.queue.put((f"{prefix}{line}\r\n", color), timeout=self.put_timeout_s)
+            except queue.Full:
+                self._drop()
+
+    def put_notice(self, msg:str) -> None:
+        """Queues an uncolored status line without ever waiting: it is dropped if the queue is full"""
+        try:
+            self.queue.put_nowait((f"{msg}\r\n", "white"))
+        except queue.Full:
+            self._drop()
+
+    def _drop(self) -> None:
+        with self.drop_lock:
+            self.dropped += 1
+            self.dropped_total += 1
+
+    def drain(self, max_lines:int=MONITOR_BATCH_MAX) -> List[Tuple[List[str], str]]:
+        """Takes up to max_lines queued lines, grouped into runs of consecutive same-colored lines
+
+        A note counting the lines dropped since the last drain is added at the end.
+
+        Returns:
+            List[Tuple[List[str], str]]: (lines, color) pairs, ready for MonitorScrollback.append()
+        """
+        runs = []   # (texts, color) for each run of consecutive same-colored lines
+        for _ in range(max_lines):
+            try:
+                text, color = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if runs and runs[-1][1] == color:
+                runs[-1][0].append(text)
+            else:
+                runs.append(([text], color))
+
+        with self.drop_lock:
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            runs.append(([f"{get_timestamp()} Monitor overloaded: {dropped} line(s) dropped.\r\n"], "white"))
+        return runs
+
+    def qsize(self) -> int:
+        return self.queue.qsize()
+
+
+class MonitorScrollback():
+    """Bounded scrollback for the serial monitor with on-disk spill of evicted lines
+
+    The widget keeps at most max_lines lines (and roughly max_chars characters). Older lines are
+    appended to a spill file and deleted from the widget, so insert cost and memory stay flat for
+    long sessions. Scrolling to the top of the widget pages spilled lines back in, page_lines at a
+    time. While the user is reading paged-in history eviction is deferred, up to twice the limits.
+
+    Args:
+        widget (Text): The serial monitor widget
+        max_lines (int): Maximum number of lines kept in the widget
+        max_chars (int): Approximate memory budget, in characters, for the widget's text
+        page_lines (int): Number of lines paged back in per scroll past the top
+    """
+    def __init__(self, widget:Text, max_lines:int=SCROLLBACK_MAX_LINES, max_chars:int=SCROLLBACK_MAX_CHARS,
+                 page_lines:int=SCROLLBACK_PAGE_LINES) -> None:
+        self.widget = widget
+        self.max_lines = max_lines
+        self.max_chars = max_chars
+        self.page_lines = page_lines
+        self.meta = deque()     # (length, color) of each line currently in the widget
+        self.chars = 0          # Total length of the lines currently in the widget
+        self.top = 0            # Session line number of the first line in the widget
+        self.spilled = 0        # Number of session lines written to the spill file
+        self.page_offsets = array("Q")  # Spill file offset of every page_lines-th line
+        self.spill_dir = tempfile.mkdtemp(prefix="atc_scrollback_")
+        self.spill_file = open(os.path.join(self.spill_dir, "scrollback.txt"), "w+b")
+        atexit.register(self.close)
+
+    def append(self, runs:List[Tuple[List[str], str]]) -> None:
+        """Inserts runs of same-colored lines at the end of the widget and evicts old lines
+
+        Args:
+            runs (List[Tuple[List[str], str]]): (lines, color) pairs; each line ends with a newline
+        """
+        following = self.widget.yview()[1] >= 1.0
+        for texts, color in runs:
+            self.widget.insert(tk.END, "".join(texts), color)
+            for text in texts:
+                self.meta.append((len(text), color))
+                self.chars += len(text)
+        # Only trim paged-in history once the user is back at the live end, unless it grows too far
+        limit = 1 if following else 2
+        if len(self.meta) > limit * self.max_lines or self.chars > limit * self.max_chars:
+            self.evict()
+        if following:
+            # Scroll to the end to keep the latest text in view
+            self.widget.see(tk.END)
+
+    def evict(self) -> None:
+        """Moves the oldest lines from the widget to the spill file until within the limits"""
+        count = 0
+        chars = self.chars
+        while self.meta and (len(self.meta) - count > self.max_lines or chars > self.max_chars):
+            chars -= self.meta[count][0]
+            count += 1
+        if not count:
+            return
+        lines = self.widget.get("1.0", f"{count + 1}.0").split("\n")[:count]
+        self.spill_file.seek(0, os.SEEK_END)
+        for i, line in enumerate(lines):
+            number = self.top + i
+            _, color = self.meta.popleft()
+            if number < self.spilled:
+                continue    # Paged back in earlier; already on disk
+            if number % self.page_lines == 0:
+                self.page_offsets.append(self.spill_file.tell())
+            self.spill_file.write(f"{color}\t{line.rstrip(chr(13))}\n".encode("utf-8", errors="replace"))
+            self.spilled += 1
+        self.widget.delete("1.0", f"{count + 1}.0")
+        self.chars = chars
+        self.top += count
+
+    def page_in(self) -> int:
+        """Reinserts up to page_lines spilled lines above the first line in the widget
+
+        Returns:
+            int: The number of lines paged in
+        """
+        if self.top == 0:
+            return 0
+        first = max(0, self.top - self.page_lines)
+        page = first // self.page_lines
+        self.spill_file.flush()
+        self.spill_file.seek(self.page_offsets[page])
+        for _ in range(first - page * self.page_lines):
+            self.spill_file.readline()
+        records = []
+        for _ in range(self.top - first):
+            color, _, text = self.spill_file.readline().decode("utf-8").rstrip("\n").partition("\t")
+            records.append((f"{text}\r\n", color))
+        for text, color in reversed(records):
+            self.widget.insert("1.0", text, color)
+            self.meta.appendleft((len(text), color))
+            self.chars += len(text)
+        self.top = first
+        return len(records)
+
+    def on_scroll(self, event=None) -> None:
+        """Pages spilled lines back in when the view reaches the top of the widget"""
+        if self.top and self.widget.yview()[0] <= 0.0:
+            count = self.page_in()
+            # Keep the line that was at the top in view
+            self.widget.yview(f"{count + 1}.0")
+
+    def close(self) -> None:
+        if not self.spill_file.closed:
+            self.spill_file.close()
+        shutil.rmtree(self.spill_dir, ignore_errors=True)
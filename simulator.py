@@ -0,0 +1,234 @@
+# Devon White, PPD 2024
+# AT Commander - Virtual nRF9160 modem on a pseudo-terminal (Linux/macOS)
+#
+# Usage:
+#   python simulator.py [--delay 0.01] [--baud 115200] [--urc-interval 5]
+# Prints the pty device name; select it in the GUI or pass it to cli.py/benchmark.py with --port.
+#
+# From Python:
+#   with ModemSimulator(delay_s=0.005) as sim:
+#       session = ATSession(sim.port)
+#       ...
+#       sim.burst("+CEREG: 1,\"0A0B\",\"01020304\",7", count=1000)
+
+import argparse
+import os
+import re
+import select
+import threading
+import time
+from typing import Dict, List, Optional, Tuple, Union
+
+from engine import DEFAULT_BAUD, SLM_DATAMODE_TERMINATOR, is_final_result_code
+
+# Responses of an nRF9160 running modem firmware 1.3.x; "OK" is appended unless the last line is a
+# final result code itself.
+DEFAULT_RESPONSES: Dict[str, List[str]] = {
+    "AT+CGMI":          ["Nordic Semiconductor ASA"],
+    "AT+CGMM":          ["nRF9160-SICA"],
+    "AT+CGMR":          ["mfw_nrf9160_1.3.5"],
+    "AT+CGSN":          ["352656100000000"],
+    "AT+CGSN=1":        ["+CGSN: \"352656100000000\""],
+    "AT%XMODEMUUID":    ["%XMODEMUUID: 25c95751-efa4-4c5c-b0f5-7c5aa4a8a3f0"],
+    "AT%HWVERSION":     ["%HWVERSION: nRF9160 SICA B1A"],
+    "AT%SHORTSWVER":    ["%SHORTSWVER: nrf9160_1.3.5"],
+    "AT%2DID":          ["%2DID: 0x0000000000000000"],
+    "AT%XICCID":        ["%XICCID: 89882806660004909182"],
+    "AT+CNUM":          ["+CNUM: ,\"+1234567890\",145"],
+    "AT+CFUN?":         ["+CFUN: 1"],
+    "AT+CEREG?":        ["+CEREG: 0,1,\"0A0B\",\"01020304\",7"],
+    "AT+CESQ":          ["+CESQ: 99,99,255,255,31,62"],
+    "AT+CEMODE?":       ["+CEMODE: 2"],
+    "AT+COPS?":         ["+COPS: 0,2,\"310410\",7"],
+    "AT+CGDCONT?":      ["+CGDCONT: 0,\"IP\",\"iot.example\",\"10.0.0.2\",0,0"],
+    "AT+CGACT?":        ["+CGACT: 0,1"],
+    "AT%XSYSTEMMODE?":  ["%XSYSTEMMODE: 1,0,1,0"],
+    "AT#XSLMVR":        ["#XSLMVR: \"2.5.0\""],
+}
+
+
+class ModemSimulator(threading.Thread):
+    """A scripted AT modem served on a pseudo-terminal
+
+    Every received command line is answered from a response table, after an optional delay. A line
+    joining several commands with ';' gets their information lines followed by a single final result
+    code, like a real modem. Output can be paced to the byte rate of a real UART, and URC bursts can
+    be injected from any thread with burst(). Credentials written with AT%CMNG=0 (quoted content may
+    span lines) are kept in credentials, and AT#XSEND enters Serial LTE Modem data mode, counting
+    payload bytes until "+++".
+
+    Args:
+        responses (dict): Command -> response lines, merged over DEFAULT_RESPONSES
+        delay_s (float): Time between receiving a command line and starting its response
+        baudrate (int): If set, output is paced to this baud rate (10 bits per byte); otherwise unpaced
+        unknown (str): Final result code for commands missing from the table ("OK" or "ERROR")
+        urc_interval_s (float): If set, emit a +CEREG URC this often while running
+    """
+    def __init__(self, responses:Dict[str, List[str]]=None, delay_s:float=0, baudrate:int=None,
+                 unknown:str="OK", urc_interval_s:float=None) -> None:
+        super().__init__(daemon=True)
+        import pty, tty     # POSIX only; imported here so the module can still be read elsewhere
+        self.responses = dict(DEFAULT_RESPONSES)
+        self.responses.update(responses or {})
+        self.delay_s = delay_s
+        self.baudrate = baudrate
+        self.unknown = unknown
+        self.urc_interval_s = urc_interval_s
+        self.commands_received = 0
+        self.bytes_sent = 0
+        self.credentials: Dict[Tuple[int, int], str] = {}   # (sec_tag, type) -> content, from AT%CMNG=0
+        self.data_mode = False
+        self.data_received = 0  # Payload bytes received in data mode
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+        self._write_lock = threading.Lock()     # Keeps responses and URC bursts from interleaving mid-line
+        self._stop_event = threading.Event()
+
+    def __enter__(self) -> "ModemSimulator":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout=2)
+        for fd in (self.master, self.slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def run(self) -> None:
+        buffer = b""
+        next_urc = time.monotonic() + self.urc_interval_s if self.urc_interval_s else None
+        while not self._stop_event.is_set():
+            if next_urc is not None and time.monotonic() >= next_urc:
+                self.emit([self.responses["AT+CEREG?"][0].replace("+CEREG: 0,", "+CEREG: ", 1)])
+                next_urc += self.urc_interval_s
+            ready, _, _ = select.select([self.master], [], [], 0.05)
+            if not ready:
+                continue
+            try:
+                buffer += os.read(self.master, 4096)
+            except OSError:
+                break
+            while buffer:
+                if self.data_mode:
+                    end = buffer.find(SLM_DATAMODE_TERMINATOR)
+                    if end < 0:
+                        keep = len(SLM_DATAMODE_TERMINATOR) - 1     # A terminator may straddle two reads
+                        self.data_received += max(0, len(buffer) - keep)
+                        buffer = buffer[max(0, len(buffer) - keep):]
+                        break
+                    self.data_received += end
+                    buffer = buffer[end + len(SLM_DATAMODE_TERMINATOR):]
+                    self.data_mode = False
+                    self.emit(["#XDATAMODE: 0"])
+                    continue
+                end = self.line_end(buffer)
+                if end < 0:
+                    break
+                line, buffer = buffer[:end].decode(errors="replace").strip(), buffer[end + 1:]
+                if line:
+                    self.handle(line)
+                if self.data_mode and buffer[:1] == b"\n":
+                    buffer = buffer[1:]     # The rest of the "\r\n" ending AT#XSEND is not payload
+
+    @staticmethod
+    def line_end(buffer:bytes) -> int:
+        """Returns the index of the first line break outside double quotes, or -1"""
+        start = 0
+        while True:
+            end = min((i for i in (buffer.find(b"\r", start), buffer.find(b"\n", start)) if i >= 0), default=-1)
+            if end < 0 or buffer.count(b'"', 0, end) % 2 == 0:
+                return end
+            start = end + 1
+
+    def handle(self, line:str) -> None:
+        """Answers one received command line"""
+        self.commands_received += 1
+        if self.delay_s:
+            time.sleep(self.delay_s)
+        if line.upper() == "AT#XSEND":
+            self.emit(["OK"])
+            self.data_mode = True
+            return
+        credential = re.match(r'AT%CMNG=0,(\d+),(\d+),"(.*)"$', line, re.S | re.I)
+        if credential:
+            self.credentials[(int(credential.group(1)), int(credential.group(2)))] = credential.group(3)
+            self.emit(["OK"])
+            return
+        parts = line.split(";")
+        commands = [parts[0]] + [f"AT{part}" for part in parts[1:]]
+        lines = []
+        final = "OK"
+        for cmd_s in commands:
+            response = self.responses.get(cmd_s.upper())
+            if response is None:
+                if self.unknown != "OK":
+                    final = self.unknown
+                    break
+                continue
+            if response and is_final_result_code(response[-1]):
+                lines.extend(response[:-1])
+                final = response[-1]
+                if final != "OK":
+                    break
+            else:
+                lines.extend(response)
+        self.emit(lines + [final])
+
+    def emit(self, lines:List[str]) -> None:
+        """Writes lines to the host, each framed as "\\r\\n<line>\\r\\n" like the nRF9160"""
+        data = "".join(f"\r\n{line}\r\n" for line in lines).encode()
+        with self._write_lock:
+            if self.baudrate:
+                for i in range(0, len(data), 64):
+                    chunk = data[i:i + 64]
+                    os.write(self.master, chunk)
+                    time.sleep(len(chunk) * 10 / self.baudrate)
+            else:
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(self.master, view):]
+            self.bytes_sent += len(data)
+
+    def burst(self, urc:Union[str, List[str]], count:int=1, interval_s:float=0) -> None:
+        """Emits unsolicited lines, count times, optionally spaced by interval_s
+
+        Args:
+            urc (Union[str, List[str]]): The line(s) to emit, e.g. "+CEREG: 1"
+            count (int): Number of repetitions
+            interval_s (float): Delay between repetitions; 0 writes the whole burst at once
+        """
+        lines = [urc] if isinstance(urc, str) else list(urc)
+        if not interval_s:
+            self.emit(lines * count)
+            return
+        for _ in range(count):
+            self.emit(lines)
+            time.sleep(interval_s)
+
+
+def main(argv:Optional[List[str]]=None) -> int:
+    parser = argparse.ArgumentParser(prog="simulator", description="Serve a virtual nRF9160 on a pty.")
+    parser.add_argument("--delay", type=float, default=0, help="Seconds before each response (default 0)")
+    parser.add_argument("--baud", type=int, default=None, help=f"Pace output to this baud rate, e.g. {DEFAULT_BAUD}")
+    parser.add_argument("--urc-interval", type=float, default=None, help="Emit a +CEREG URC every N seconds")
+    args = parser.parse_args(argv)
+    with ModemSimulator(delay_s=args.delay, baudrate=args.baud, urc_interval_s=args.urc_interval) as sim:
+        print(sim.port, flush=True)
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())